@@ -0,0 +1,28 @@
+"""Index family_child_association.person_id
+
+Revision ID: 0b6d4f2e8a71
+Revises: f18c7a2e95d3
+Create Date: 2026-10-16 18:02:11.304127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b6d4f2e8a71'
+down_revision = 'f18c7a2e95d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The (family_id, person_id) primary key already exists from the initial schema; only the
+    # reverse-lookup index is new. Skip it if a database was already indexed by hand.
+    existing = {ix['name'] for ix in sa.inspect(op.get_bind()).get_indexes('family_child_association')}
+    if 'ix_family_child_association_person_id' not in existing:
+        op.create_index('ix_family_child_association_person_id', 'family_child_association', ['person_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_family_child_association_person_id', table_name='family_child_association')
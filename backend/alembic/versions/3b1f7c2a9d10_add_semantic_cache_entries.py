@@ -0,0 +1,41 @@
+"""Add semantic_cache_entries table for LLM response caching
+
+Revision ID: 3b1f7c2a9d10
+Revises: efee5e6249f6
+Create Date: 2026-10-16 09:12:41.208311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b1f7c2a9d10'
+down_revision = 'efee5e6249f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('semantic_cache_entries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('namespace', sa.String(), nullable=False),
+    sa.Column('key_hash', sa.String(length=64), nullable=False),
+    sa.Column('scope_hash', sa.String(length=64), nullable=False),
+    sa.Column('prompt_text', sa.Text(), nullable=False),
+    sa.Column('embedding', sa.LargeBinary(), nullable=True),
+    sa.Column('response_json', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('namespace', 'key_hash', name='uq_semantic_cache_namespace_key')
+    )
+    op.create_index(op.f('ix_semantic_cache_entries_id'), 'semantic_cache_entries', ['id'], unique=False)
+    op.create_index(op.f('ix_semantic_cache_entries_namespace'), 'semantic_cache_entries', ['namespace'], unique=False)
+    op.create_index(op.f('ix_semantic_cache_entries_scope_hash'), 'semantic_cache_entries', ['scope_hash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_semantic_cache_entries_scope_hash'), table_name='semantic_cache_entries')
+    op.drop_index(op.f('ix_semantic_cache_entries_namespace'), table_name='semantic_cache_entries')
+    op.drop_index(op.f('ix_semantic_cache_entries_id'), table_name='semantic_cache_entries')
+    op.drop_table('semantic_cache_entries')
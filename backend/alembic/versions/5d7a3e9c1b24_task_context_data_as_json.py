@@ -0,0 +1,37 @@
+"""Store agent_tasks.task_context_data as native JSON/JSONB
+
+Revision ID: 5d7a3e9c1b24
+Revises: 8c4e2d91a7f3
+Create Date: 2026-10-16 14:02:31.218644
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '5d7a3e9c1b24'
+down_revision = '8c4e2d91a7f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # SQLite stores JSON as TEXT, so the existing JSON strings are already valid values there
+    # and no table rebuild is needed. Postgres converts them in place to JSONB.
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column('agent_tasks', 'task_context_data',
+                        existing_type=sa.Text(),
+                        type_=postgresql.JSONB(),
+                        existing_nullable=True,
+                        postgresql_using='task_context_data::jsonb')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column('agent_tasks', 'task_context_data',
+                        existing_type=postgresql.JSONB(),
+                        type_=sa.Text(),
+                        existing_nullable=True,
+                        postgresql_using='task_context_data::text')
@@ -0,0 +1,35 @@
+"""Add test_result_cache table for reusing agent test runs
+
+Revision ID: 8c4e2d91a7f3
+Revises: 3b1f7c2a9d10
+Create Date: 2026-10-16 11:40:07.553102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4e2d91a7f3'
+down_revision = '3b1f7c2a9d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('test_result_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('diff_hash', sa.String(length=64), nullable=False),
+    sa.Column('head_sha', sa.String(length=40), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('results', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('diff_hash', 'head_sha', name='uq_test_result_cache_diff_head')
+    )
+    op.create_index(op.f('ix_test_result_cache_id'), 'test_result_cache', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_test_result_cache_id'), table_name='test_result_cache')
+    op.drop_table('test_result_cache')
@@ -0,0 +1,34 @@
+"""Add llm_response_cache table for exact-match LLM responses
+
+Revision ID: a41f6b8d2e57
+Revises: 5d7a3e9c1b24
+Create Date: 2026-10-16 15:21:44.906312
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41f6b8d2e57'
+down_revision = '5d7a3e9c1b24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('llm_response_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('key_hash', sa.String(length=64), nullable=False),
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('response_json', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('key_hash', 'model', name='uq_llm_response_cache_key_model')
+    )
+    op.create_index(op.f('ix_llm_response_cache_id'), 'llm_response_cache', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_llm_response_cache_id'), table_name='llm_response_cache')
+    op.drop_table('llm_response_cache')
@@ -0,0 +1,40 @@
+"""Store the Odyssey plan in agent_tasks.task_plan_data, apart from the phase state
+
+Revision ID: c7e2a5d03f19
+Revises: a41f6b8d2e57
+Create Date: 2026-10-16 16:08:12.537021
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e2a5d03f19'
+down_revision = 'a41f6b8d2e57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('agent_tasks', sa.Column('task_plan_data', sa.JSON().with_variant(postgresql.JSONB(), 'postgresql'), nullable=True))
+    # Move existing plans out of the context so later phase updates stop carrying them
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("UPDATE agent_tasks SET task_plan_data = task_context_data -> 'plan', "
+                   "task_context_data = task_context_data - 'plan' "
+                   "WHERE task_context_data ? 'plan'")
+    elif op.get_bind().dialect.name == 'sqlite':
+        op.execute("UPDATE agent_tasks SET task_plan_data = json_extract(task_context_data, '$.plan'), "
+                   "task_context_data = json_remove(task_context_data, '$.plan') "
+                   "WHERE json_type(task_context_data, '$.plan') IS NOT NULL")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("UPDATE agent_tasks SET task_context_data = jsonb_set(coalesce(task_context_data, '{}'::jsonb), '{plan}', task_plan_data) "
+                   "WHERE task_plan_data IS NOT NULL")
+    elif op.get_bind().dialect.name == 'sqlite':
+        op.execute("UPDATE agent_tasks SET task_context_data = json_set(coalesce(task_context_data, '{}'), '$.plan', json(task_plan_data)) "
+                   "WHERE task_plan_data IS NOT NULL")
+    op.drop_column('agent_tasks', 'task_plan_data')
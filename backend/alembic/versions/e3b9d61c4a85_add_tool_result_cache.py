@@ -0,0 +1,35 @@
+"""Add tool_result_cache table for external tool call results
+
+Revision ID: e3b9d61c4a85
+Revises: c7e2a5d03f19
+Create Date: 2026-10-16 16:47:05.118390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3b9d61c4a85'
+down_revision = 'c7e2a5d03f19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('tool_result_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('key_hash', sa.String(length=64), nullable=False),
+    sa.Column('tool', sa.String(), nullable=False),
+    sa.Column('result_json', sa.Text(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('key_hash')
+    )
+    op.create_index(op.f('ix_tool_result_cache_id'), 'tool_result_cache', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_tool_result_cache_id'), table_name='tool_result_cache')
+    op.drop_table('tool_result_cache')
@@ -0,0 +1,37 @@
+"""Add indexed agent_tasks.prompt_hash
+
+Revision ID: f18c7a2e95d3
+Revises: e3b9d61c4a85
+Create Date: 2026-10-16 17:24:38.660514
+
+"""
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f18c7a2e95d3'
+down_revision = 'e3b9d61c4a85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('agent_tasks', sa.Column('prompt_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_agent_tasks_prompt_hash'), 'agent_tasks', ['prompt_hash'], unique=False)
+    # Backfill existing tasks so their plans can be found for reuse too
+    bind = op.get_bind()
+    agent_tasks = sa.table('agent_tasks', sa.column('id', sa.Integer), sa.column('prompt', sa.Text), sa.column('prompt_hash', sa.String))
+    rows = bind.execute(sa.select(agent_tasks.c.id, agent_tasks.c.prompt)).fetchall()
+    if rows:
+        bind.execute(
+            agent_tasks.update().where(agent_tasks.c.id == sa.bindparam('task_id')).values(prompt_hash=sa.bindparam('hash')),
+            [{'task_id': row.id, 'hash': hashlib.sha256(row.prompt.encode('utf-8')).hexdigest()} for row in rows],
+        )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_agent_tasks_prompt_hash'), table_name='agent_tasks')
+    op.drop_column('agent_tasks', 'prompt_hash')
@@ -1,7 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status, Body
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
-import json
+from typing import List, Dict, Any, Callable, Tuple
 from loguru import logger
 
 from app.core.dependencies import get_db, get_current_admin_user
@@ -9,10 +8,36 @@ from app.db import schemas, crud, models
 from app.services.orchestration_service import AgentOrchestrator
 from app.services.plugin_manager import get_plugin_manager
 from app.services.notification_service import notification_service
+from app.plugins.odyssey_plugin import (
+    ODYSSEY_PHASE_AWAITING_PLAN_REVIEW, ODYSSEY_PHASE_AWAITING_MILESTONE_REVIEW,
+    ODYSSEY_PHASE_EXECUTING_MILESTONE, ODYSSEY_PHASE_FINALIZING,
+)
 from app.core.config import settings, NotificationSettingsModel
 
 router = APIRouter()
 
+
+def _approve_odyssey_plan(task: models.AgentTask, task_context: Dict[str, Any]) -> Tuple[Dict[str, Any], models.TaskStatus]:
+    """Plan approved: start executing the first milestone."""
+    return {"current_phase": ODYSSEY_PHASE_EXECUTING_MILESTONE, "current_milestone_index": 0}, models.TaskStatus.EXECUTING_MILESTONE
+
+
+def _approve_odyssey_milestone(task: models.AgentTask, task_context: Dict[str, Any]) -> Tuple[Dict[str, Any], models.TaskStatus]:
+    """Milestone approved: move on to the next milestone, or finalize after the last one."""
+    current_milestone_idx = task_context.get("current_milestone_index", -1)
+    plan_milestones = (task.task_plan_data or task_context.get("plan") or {}).get("milestones", [])
+    if 0 <= current_milestone_idx < len(plan_milestones) - 1:
+        return {"current_milestone_index": current_milestone_idx + 1, "current_phase": ODYSSEY_PHASE_EXECUTING_MILESTONE}, models.TaskStatus.EXECUTING_MILESTONE
+    return {"current_phase": ODYSSEY_PHASE_FINALIZING}, models.TaskStatus.APPLIED
+
+
+# Odyssey review phase -> approval handler returning (context fields to patch, new task status).
+# Built once at import; a phase missing here can't be approved.
+_ODYSSEY_APPROVAL_HANDLERS: Dict[str, Callable[[models.AgentTask, Dict[str, Any]], Tuple[Dict[str, Any], models.TaskStatus]]] = {
+    ODYSSEY_PHASE_AWAITING_PLAN_REVIEW: _approve_odyssey_plan,
+    ODYSSEY_PHASE_AWAITING_MILESTONE_REVIEW: _approve_odyssey_milestone,
+}
+
 @router.get("/users", response_model=List[schemas.UserPublic])
 def list_all_users_admin(
     db: Session = Depends(get_db),
@@ -134,30 +159,21 @@ def approve_and_process_agent_task(
             commit_hash = orchestrator.apply_and_commit_changes(task, current_user)
             update_data = {"status": models.TaskStatus.APPLIED, "commit_hash": commit_hash}
         elif task.plugin_id == "odyssey_agent":
-             task_context = json.loads(task.task_context_data) if task.task_context_data else {}
+             task_context = task.task_context_data or {}
              current_phase = task_context.get("current_phase")
-             if current_phase == "AWAITING_PLAN_REVIEW":
-                task_context["current_phase"] = "EXECUTING_MILESTONE"
-                task_context["current_milestone_index"] = 0
-                status_update = models.TaskStatus.EXECUTING_MILESTONE
-             elif current_phase == "AWAITING_MILESTONE_REVIEW":
-                 current_milestone_idx = task_context.get("current_milestone_index", -1)
-                 plan_milestones = task_context.get("plan", {}).get("milestones", [])
-                 if 0 <= current_milestone_idx < len(plan_milestones) - 1:
-                     task_context["current_milestone_index"] = current_milestone_idx + 1
-                     task_context["current_phase"] = "EXECUTING_MILESTONE"
-                     status_update = models.TaskStatus.EXECUTING_MILESTONE
-                 else:
-                     task_context["current_phase"] = "FINALIZING"
-                     status_update = models.TaskStatus.APPLIED
-             else:
+             approval_handler = _ODYSSEY_APPROVAL_HANDLERS.get(current_phase)
+             if approval_handler is None:
                  raise HTTPException(status_code=400, detail=f"Odyssey task is in an unexpected phase ('{current_phase}') for an approval action.")
+             # Only these small scalar keys change here; the plan (task_plan_data) is left untouched
+             context_fields, status_update = approval_handler(task, task_context)
+             crud.patch_agent_task_context(db, db_task=task, fields=context_fields)
              update_data = {
                  "status": status_update,
                  "llm_explanation": f"Admin approved {current_phase}. Proceeding to next step...",
-                 "task_context_data": json.dumps(task_context)
              }
-             background_tasks.add_task(orchestrator.execute_task, task_id=task.id)
+             # Approving the last milestone finishes the task; there's nothing left for the plugin to run
+             if status_update != models.TaskStatus.APPLIED:
+                 background_tasks.add_task(orchestrator.execute_task, task_id=task.id)
         else:
             update_data = {"status": models.TaskStatus.APPLIED}
 
@@ -28,29 +28,13 @@ async def upload_new_gedcom_tree( # Renamed for clarity
         )
     
     logger.info(f"User {current_user.email} attempting to upload GEDCOM file: {file.filename}")
-    file_content_bytes = await file.read()
-    
-    try:
-        # Attempt to decode with UTF-8, then fall back to Latin-1 (common for older GEDCOMs)
-        gedcom_string = file_content_bytes.decode('utf-8')
-    except UnicodeDecodeError:
-        try:
-            gedcom_string = file_content_bytes.decode('latin-1')
-            logger.info(f"Successfully decoded '{file.filename}' using latin-1 after UTF-8 failed.")
-        except UnicodeDecodeError:
-            logger.error(f"Failed to decode '{file.filename}' with UTF-8 or Latin-1 for user {current_user.email}.")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, 
-                detail="Could not decode file content. Please ensure it is a valid GEDCOM file with UTF-8 or Latin-1 encoding."
-            )
-
-    if not gedcom_string.strip(): # Check if file content is empty after decoding
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Uploaded GEDCOM file is empty or contains no parsable content.")
-
+    # The upload is parsed straight from its spooled file (UTF-8 with a Latin-1 fallback, see GenealogyService),
+    # rather than being read into one bytes object and a decoded copy first.
+    # An empty or unparsable file surfaces as a ValueError from the service.
     service = GenealogyService(db)
     try:
         new_tree = service.parse_and_store_gedcom(
-            file_content_str=gedcom_string,
+            gedcom_stream=file.file,
             file_name=file.filename,
             owner_id=current_user.id
         )
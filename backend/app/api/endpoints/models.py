@@ -11,6 +11,7 @@ router = APIRouter()
 @router.get("/", response_model=List[schemas.ModelInfo])
 async def list_available_ollama_models_endpoint( # Renamed for clarity
     *,
+    refresh: bool = False, # Skip the short-lived model list cache (e.g. right after pulling a model)
     # This endpoint could be open or restricted.
     # Requiring authentication ensures only logged-in users can see the model list.
     current_user: models.User = Depends(get_current_active_user) 
@@ -20,7 +21,7 @@ async def list_available_ollama_models_endpoint( # Renamed for clarity
     The response includes the server name (nickname from config) and the model name.
     """
     try:
-        models_list = await ollama_service.list_models()
+        models_list = await ollama_service.list_models(use_cache=not refresh)
         if models_list is None: # Should not happen if service is robust
             raise HTTPException(status_code=503, detail="Could not retrieve model list from AI service.")
         return models_list
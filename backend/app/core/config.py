@@ -3,7 +3,7 @@ import secrets
 import yaml
 from pydantic import BaseModel, EmailStr, AnyHttpUrl, Field
 from pydantic_settings import BaseSettings
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
 
 class OllamaServer(BaseModel):
     name: str
@@ -44,6 +44,19 @@ class AppSettings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./data/frankie.db"
     OLLAMA_SERVERS: List[OllamaServer] = [OllamaServer(name="local", url="http://host.docker.internal:11434")]
     INITIAL_USERS: List[InitialUser] = []
+    # Model used by agent plugins ('server_name/model:tag' or 'model:tag').
+    # If unset, the first model found on any configured server is used.
+    AGENT_MODEL: Optional[str] = None
+    # Generation requests in flight per Ollama server; extra requests (e.g. many tasks planning at once) wait their turn
+    OLLAMA_MAX_CONCURRENT_REQUESTS: int = 4
+    # How long Ollama keeps a model loaded after a request (duration string or seconds; -1 pins it),
+    # so tasks arriving minutes apart don't each pay the model-load latency
+    OLLAMA_KEEP_ALIVE: Union[int, str] = "30m"
+    OLLAMA_WARMUP_ON_STARTUP: bool = True # Load the agent model in the background when the app starts
+    OLLAMA_MODELS_CACHE_TTL_SECONDS: float = 30.0 # Reuse the servers' model lists this long when resolving models; 0 disables
+    ODYSSEY_PLAN_TEMPLATES_PATH: str = "config/odyssey_plan_templates.yml" # Goal patterns with ready-made plans; skipped if missing
+    ODYSSEY_REUSE_APPROVED_PLANS: bool = True # Offer the plan of an earlier completed task with the identical prompt instead of re-planning
+    ODYSSEY_MAX_PARALLEL_SUB_STEPS: int = 4 # Sub-steps of a parallel_safe milestone run at most this many at a time
     notifications: NotificationSettingsModel = NotificationSettingsModel() # Nested model for notification settings
 
     # SMTP credentials directly from .env (prefixed or unprefixed as per your .env file)
@@ -53,6 +66,14 @@ class AppSettings(BaseSettings):
     SMTP_PASSWORD: Optional[str] = None # Field(None, env='SMTP_PASS') if env var name differs
     SMTP_SENDER_NAME: str = "Frankie AI Agent"
     
+    # LLM response caching (see app/services/semantic_cache.py)
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_SIMILARITY_THRESHOLD: float = 0.92 # Cosine similarity required for a near-duplicate hit
+    SEMANTIC_CACHE_EMBEDDING_MODEL: str = "all-MiniLM-L6-v2" # sentence-transformers model; exact-match only if not installed
+    LLM_RESPONSE_CACHE_ENABLED: bool = True # Exact-match cache of JSON-mode responses for byte-identical prompts
+    ODYSSEY_PLAN_CACHE_SIMILARITY_THRESHOLD: float = 0.92 # Goal similarity for reusing a previous Odyssey plan
+    TEST_RESULT_CACHE_TTL_SECONDS: int = 86400 # Reuse test results for an identical diff on the same HEAD; 0 disables
+
     # Genealogy API Key Settings directly from .env
     FAMILYSEARCH_DEV_KEY: Optional[str] = None
     ANCESTRY_API_KEY: Optional[str] = None
@@ -1,4 +1,10 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import update, cast, literal
+from sqlalchemy.dialects.postgresql import JSONB, array
+from sqlalchemy.orm import Session, defer
+from sqlalchemy.sql import func
+import orjson
+import hashlib
+from datetime import datetime
 from typing import List, Optional
 
 from app.db import models, schemas
@@ -11,6 +17,11 @@ def get_user(db: Session, user_id: int) -> Optional[models.User]:
 def get_user_by_email(db: Session, email: str) -> Optional[models.User]:
     return db.query(models.User).filter(models.User.email == email).first()
 
+def get_users_by_emails(db: Session, emails: List[str]) -> List[models.User]:
+    if not emails:
+        return []
+    return db.query(models.User).filter(models.User.email.in_(emails)).all()
+
 def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[models.User]:
     return db.query(models.User).offset(skip).limit(limit).all()
 
@@ -58,6 +69,9 @@ def create_family_tree(db: Session, file_name: str, user_id: int) -> models.Fami
     db.refresh(db_tree)
     return db_tree
 
+def get_person_by_id(db: Session, person_id: int) -> Optional[models.Person]:
+    return db.query(models.Person).filter(models.Person.id == person_id).first()
+
 def add_person_to_tree(db: Session, person_data: schemas.PersonBase, tree_id: int) -> models.Person:
     db_person = models.Person(**person_data.dict(), tree_id=tree_id)
     db.add(db_person)
@@ -82,8 +96,11 @@ def get_user_chat_history(db: Session, user_id: int, skip: int = 0, limit: int =
     return db.query(models.ChatHistory).filter(models.ChatHistory.user_id == user_id).order_by(models.ChatHistory.timestamp.desc()).offset(skip).limit(limit).all()
 
 # Agent Tasks
+def hash_task_prompt(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
 def create_agent_task(db: Session, task_in: schemas.AgentTaskCreate, owner_id: int) -> models.AgentTask:
-    db_task = models.AgentTask(**task_in.dict(), owner_id=owner_id)
+    db_task = models.AgentTask(**task_in.dict(), owner_id=owner_id, prompt_hash=hash_task_prompt(task_in.prompt))
     db.add(db_task)
     db.commit()
     db.refresh(db_task)
@@ -92,13 +109,77 @@ def create_agent_task(db: Session, task_in: schemas.AgentTaskCreate, owner_id: i
 def get_agent_task(db: Session, task_id: int) -> Optional[models.AgentTask]:
     return db.query(models.AgentTask).filter(models.AgentTask.id == task_id).first()
 
+def get_agent_task_for_execution(db: Session, task_id: int) -> Optional[models.AgentTask]:
+    """
+    Loads a task for a plugin run without its review output (diff, test log, explanation), which can be large
+    and is only written, not read, while a plugin executes. Any of them is still lazy-loaded if accessed.
+    """
+    return (
+        db.query(models.AgentTask)
+        .options(defer(models.AgentTask.proposed_diff), defer(models.AgentTask.test_results), defer(models.AgentTask.llm_explanation))
+        .filter(models.AgentTask.id == task_id)
+        .first()
+    )
+
+def get_latest_applied_task_plan(db: Session, plugin_id: str, prompt_hash: str, exclude_task_id: Optional[int] = None) -> Optional[dict]:
+    """Returns task_plan_data of the most recent APPLIED task of this plugin with the same prompt, if any."""
+    query = db.query(models.AgentTask.task_plan_data).filter(
+        models.AgentTask.prompt_hash == prompt_hash,
+        models.AgentTask.plugin_id == plugin_id,
+        models.AgentTask.status == models.TaskStatus.APPLIED,
+        models.AgentTask.task_plan_data.isnot(None),
+    )
+    if exclude_task_id is not None:
+        query = query.filter(models.AgentTask.id != exclude_task_id)
+    row = query.order_by(models.AgentTask.id.desc()).first()
+    return row.task_plan_data if row else None
+
 def update_agent_task(db: Session, db_task: models.AgentTask, task_update_data: dict) -> models.AgentTask:
-    for key, value in task_update_data.items():
-        setattr(db_task, key, value)
+    # One UPDATE binding exactly the given columns, bypassing per-attribute unit-of-work tracking.
+    # Pending ORM changes on db_task are flushed first so they can't overwrite these values on commit.
+    if task_update_data:
+        db.flush()
+        db.execute(
+            update(models.AgentTask)
+            .where(models.AgentTask.id == db_task.id)
+            .values(**task_update_data)
+            .execution_options(synchronize_session=False)
+        )
     db.commit()
     db.refresh(db_task)
     return db_task
 
+def patch_agent_task_context(db: Session, db_task: models.AgentTask, fields: dict) -> None:
+    """
+    Sets top-level keys of db_task.task_context_data without committing (the caller commits,
+    typically via update_agent_task). The keys are patched server-side (jsonb_set on Postgres,
+    json_set on SQLite), so flipping e.g. current_phase doesn't rewrite the whole plan; other
+    databases get the rebuilt dict.
+    """
+    if not fields:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        patched = func.coalesce(models.AgentTask.task_context_data, cast(literal("{}"), JSONB))
+        for key, value in fields.items():
+            patched = func.jsonb_set(patched, array([key]), cast(literal(orjson.dumps(value).decode()), JSONB), True)
+    elif dialect == "sqlite":
+        # json_set (unlike json_patch) replaces nested objects such as the plan instead of merging them
+        patched = func.coalesce(models.AgentTask.task_context_data, literal("{}"))
+        for key, value in fields.items():
+            patched = func.json_set(patched, f"$.{key}", func.json(literal(orjson.dumps(value).decode())))
+    else:
+        # A new dict object is required: in-place edits of a JSON column aren't detected by the ORM
+        db_task.task_context_data = {**(db_task.task_context_data or {}), **fields}
+        return
+    db.execute(
+        update(models.AgentTask)
+        .where(models.AgentTask.id == db_task.id)
+        .values(task_context_data=patched)
+        .execution_options(synchronize_session=False)
+    )
+    db.expire(db_task, ["task_context_data"]) # Reloaded on next access instead of flushing a stale copy
+
 # Agent Permissions
 def get_permissions(db: Session, skip: int = 0, limit: int = 100) -> List[models.AgentPermission]:
     return db.query(models.AgentPermission).offset(skip).limit(limit).all()
@@ -119,3 +200,57 @@ def delete_permission(db: Session, permission_id: int) -> Optional[models.AgentP
         db.delete(perm)
         db.commit()
     return perm
+
+# Test Result Cache
+def get_test_result_cache_entry(db: Session, diff_hash: str, head_sha: str) -> Optional[models.CachedTestResult]:
+    return db.query(models.CachedTestResult).filter(
+        models.CachedTestResult.diff_hash == diff_hash,
+        models.CachedTestResult.head_sha == head_sha
+    ).first()
+
+def upsert_test_result_cache_entry(db: Session, diff_hash: str, head_sha: str, status: str, results: Optional[str]) -> models.CachedTestResult:
+    entry = get_test_result_cache_entry(db, diff_hash=diff_hash, head_sha=head_sha)
+    if entry:
+        entry.status = status
+        entry.results = results
+        entry.created_at = func.now() # Restart the TTL
+    else:
+        entry = models.CachedTestResult(diff_hash=diff_hash, head_sha=head_sha, status=status, results=results)
+        db.add(entry)
+    db.commit()
+    db.refresh(entry)
+    return entry
+
+def get_llm_response_cache_entry(db: Session, key_hash: str, model: str) -> Optional[models.LLMResponseCacheEntry]:
+    return db.query(models.LLMResponseCacheEntry).filter(
+        models.LLMResponseCacheEntry.key_hash == key_hash,
+        models.LLMResponseCacheEntry.model == model
+    ).first()
+
+def upsert_llm_response_cache_entry(db: Session, key_hash: str, model: str, response_json: str) -> models.LLMResponseCacheEntry:
+    entry = get_llm_response_cache_entry(db, key_hash=key_hash, model=model)
+    if entry:
+        entry.response_json = response_json
+        entry.created_at = func.now()
+    else:
+        entry = models.LLMResponseCacheEntry(key_hash=key_hash, model=model, response_json=response_json)
+        db.add(entry)
+    db.commit()
+    db.refresh(entry)
+    return entry
+
+def get_tool_result_cache_entry(db: Session, key_hash: str) -> Optional[models.ToolResultCacheEntry]:
+    return db.query(models.ToolResultCacheEntry).filter(models.ToolResultCacheEntry.key_hash == key_hash).first()
+
+def upsert_tool_result_cache_entry(db: Session, key_hash: str, tool: str, result_json: str, expires_at: datetime) -> models.ToolResultCacheEntry:
+    entry = get_tool_result_cache_entry(db, key_hash=key_hash)
+    if entry:
+        entry.result_json = result_json
+        entry.expires_at = expires_at
+        entry.created_at = func.now()
+    else:
+        entry = models.ToolResultCacheEntry(key_hash=key_hash, tool=tool, result_json=result_json, expires_at=expires_at)
+        db.add(entry)
+    db.commit()
+    db.refresh(entry)
+    return entry
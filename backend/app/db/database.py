@@ -1,3 +1,4 @@
+import orjson
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -10,6 +11,10 @@ engine_args = {}
 if settings.DATABASE_URL and settings.DATABASE_URL.startswith("sqlite"):
     engine_args["connect_args"] = {"check_same_thread": False}
 
+# JSON columns (e.g. AgentTask.task_context_data) are (de)serialized with orjson instead of the stdlib json module
+engine_args["json_serializer"] = lambda obj: orjson.dumps(obj).decode()
+engine_args["json_deserializer"] = orjson.loads
+
 engine = create_engine(
     str(settings.DATABASE_URL), **engine_args # Ensure DATABASE_URL is string
 )
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum as DBEnum, Table, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum as DBEnum, Table, Boolean, LargeBinary, UniqueConstraint, JSON, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -54,6 +55,7 @@ class AgentTask(Base):
     __tablename__ = "agent_tasks"
     id = Column(Integer, primary_key=True, index=True)
     prompt = Column(Text, nullable=False)
+    prompt_hash = Column(String(64), nullable=True, index=True) # SHA-256 of prompt, for finding earlier tasks with the same prompt
     plugin_id = Column(String, nullable=False, default="code_modifier")
     target_files = Column(Text, nullable=True)
     status = Column(DBEnum(TaskStatus, name="task_status_enum_v4"), nullable=False, default=TaskStatus.PENDING)
@@ -67,7 +69,12 @@ class AgentTask(Base):
     target_person_id = Column(Integer, ForeignKey("genealogy_persons.id"), nullable=True)
     
     # --- NEW field for Odyssey Plugin state ---
-    task_context_data = Column(Text, nullable=True) # Stores JSON string for plan, current milestone, etc.
+    # Native JSON (JSONB on Postgres) so the driver (de)serializes the plan, current milestone, etc.
+    # and Postgres can patch single keys server-side. In-place edits must be flagged with flag_modified.
+    task_context_data = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
+    # The Odyssey plan is kept apart from the small phase state above: it is written once when planning
+    # finishes, so later phase transitions only touch a few bytes of task_context_data.
+    task_plan_data = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
     
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     owner = relationship("User", back_populates="tasks")
@@ -86,12 +93,16 @@ class AgentPermission(Base):
 
 # --- Genealogy Models ---
 
-# Association Table for the many-to-many relationship between Family and Children (Person)
+# Association Table for the many-to-many relationship between Family and Children (Person).
+# The composite primary key (family_id, person_id) rejects duplicate links and serves lookups by family;
+# the person_id index serves the reverse direction (a person's parent families) without a table scan.
+# GenealogyService's bulk child-link insert relies on both.
 family_child_association = Table(
     'family_child_association',
     Base.metadata,
     Column('family_id', Integer, ForeignKey('genealogy_families.id'), primary_key=True),
-    Column('person_id', Integer, ForeignKey('genealogy_persons.id'), primary_key=True)
+    Column('person_id', Integer, ForeignKey('genealogy_persons.id'), primary_key=True),
+    Index('ix_family_child_association_person_id', 'person_id'),
 )
 
 class FamilyTree(Base):
@@ -168,3 +179,65 @@ class ResearchFinding(Base):
     
     person = relationship("Person", back_populates="findings")
     reviewer = relationship("User", foreign_keys=[reviewed_by_id], back_populates="reviewed_findings")
+
+
+# --- LLM Response Cache Model ---
+class SemanticCacheEntry(Base):
+    """
+    A cached LLM response. `scope_hash` pins the entry to the exact context it was
+    generated for (e.g. target file contents), while `embedding` allows near-duplicate
+    prompts within the same scope to reuse the response.
+    """
+    __tablename__ = "semantic_cache_entries"
+    __table_args__ = (UniqueConstraint("namespace", "key_hash", name="uq_semantic_cache_namespace_key"),)
+    id = Column(Integer, primary_key=True, index=True)
+    namespace = Column(String, nullable=False, index=True) # e.g. "code_modifier"
+    key_hash = Column(String(64), nullable=False)         # SHA-256 of scope + prompt text (exact-match key)
+    scope_hash = Column(String(64), nullable=False, index=True)
+    prompt_text = Column(Text, nullable=False)
+    embedding = Column(LargeBinary, nullable=True)         # float32 vector; NULL if no embedder was available
+    response_json = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class CachedTestResult(Base):
+    """
+    The outcome of running the backend test suite against a proposed diff on a given HEAD commit.
+    Lets identical proposals (e.g. retries) skip re-running pytest.
+    """
+    __tablename__ = "test_result_cache"
+    __table_args__ = (UniqueConstraint("diff_hash", "head_sha", name="uq_test_result_cache_diff_head"),)
+    id = Column(Integer, primary_key=True, index=True)
+    diff_hash = Column(String(64), nullable=False) # SHA-256 of the proposed diff
+    head_sha = Column(String(40), nullable=False)  # Commit the diff was tested against
+    status = Column(String, nullable=False)        # TestStatus value
+    results = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class LLMResponseCacheEntry(Base):
+    """
+    A JSON-mode LLM response keyed by the SHA-256 of its exact rendered prompt (system + prompt) and model.
+    Lets byte-identical requests from any plugin skip the Ollama round-trip.
+    """
+    __tablename__ = "llm_response_cache"
+    __table_args__ = (UniqueConstraint("key_hash", "model", name="uq_llm_response_cache_key_model"),)
+    id = Column(Integer, primary_key=True, index=True)
+    key_hash = Column(String(64), nullable=False) # SHA-256 of the rendered system prompt + prompt
+    model = Column(String, nullable=False)        # 'server/model:tag' identifier the prompt was sent to
+    response_json = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ToolResultCacheEntry(Base):
+    """
+    The result of an external tool call (e.g. a genealogy site search), keyed by the SHA-256 of
+    the tool name and its canonical JSON arguments. Lets repeated lookups skip the network until expires_at.
+    """
+    __tablename__ = "tool_result_cache"
+    id = Column(Integer, primary_key=True, index=True)
+    key_hash = Column(String(64), nullable=False, unique=True) # SHA-256 of tool name + canonical args
+    tool = Column(String, nullable=False)
+    result_json = Column(Text, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,6 +1,6 @@
 from __future__ import annotations # MUST be at the top of the file
-from pydantic import BaseModel, EmailStr, Field, HttpUrl
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field, HttpUrl, model_validator
+from typing import Optional, List, Dict, Any
 from datetime import datetime
 # Import enums directly from models.py where they are defined
 from . import models
@@ -79,7 +79,8 @@ class AgentTask(AgentTaskBase):
     test_results: Optional[str] = None
     target_tree_id: Optional[int] = None
     target_person_id: Optional[int] = None
-    task_context_data: Optional[str] = None
+    task_context_data: Optional[Dict[str, Any]] = None
+    task_plan_data: Optional[Dict[str, Any]] = None
     class Config: from_attributes = True
 
 # --- Agent Permission Schemas ---
@@ -92,6 +93,36 @@ class AgentPermission(AgentPermissionBase):
     created_at: datetime
     class Config: from_attributes = True
 
+# --- Code Modifier LLM Response Schemas ---
+class CodeModification(BaseModel):
+    file_path: str
+    new_code: Optional[str] = None # Full content of the file
+    diff: Optional[str] = None     # Unified diff hunks against the original content
+    @model_validator(mode="after")
+    def check_has_content(self):
+        if self.new_code is None and self.diff is None:
+            raise ValueError(f"Modification for '{self.file_path}' has neither 'new_code' nor 'diff'.")
+        return self
+class CodeModifierLLMResponse(BaseModel):
+    explanation: str = "No explanation provided by LLM."
+    modifications: List[CodeModification] = []
+
+# --- Odyssey Plan Schemas ---
+# The LLM-generated plan, validated in one typed pass; missing descriptive fields fall back to defaults
+class OdysseyMilestone(BaseModel):
+    milestone_id: Optional[str] = None
+    name: str = "N/A"
+    description: str = "N/A"
+    estimated_sub_steps: List[str] = []
+    potential_tools: List[str] = []
+    parallel_safe: bool = False # Sub-steps have no data dependency on each other and may run concurrently
+    selected_tool: Optional[str] = None # Chosen once when the plan is made, so execution never re-picks it
+class OdysseyPlan(BaseModel):
+    project_title: str = "New Project"
+    overall_summary: str = "N/A"
+    clarifying_questions: List[str] = []
+    milestones: List[OdysseyMilestone]
+
 # --- Genealogy Schemas ---
 class PersonBase(BaseModel):
     gedcom_id: str
@@ -1,10 +1,14 @@
 from abc import ABC, abstractmethod
+from functools import cached_property
 from typing import List, Dict, Any # Import Any for flexible dict values
 from app.db.models import Person # Assuming Person model is in app.db.models
 
 class GenealogyTool(ABC):
     """Abstract base class for a tool that searches an external genealogy source."""
 
+    # How long search results are reused from the tool result cache (see app/services/tool_cache.py); 0 disables it
+    result_cache_ttl_seconds: int = 24 * 3600
+
     def __init__(self, api_key: str | None = None):
         self.api_key = api_key
 
@@ -14,11 +18,12 @@ class GenealogyTool(ABC):
         """The unique name of the tool (e.g., 'FamilySearch', 'FindAGrave.com')."""
         pass
 
-    @property
+    @cached_property
     def is_configured(self) -> bool:
         """
         Returns True if the tool has the necessary configuration (e.g., API keys).
         Subclasses requiring API keys MUST override this to check self.api_key or other settings.
+        Evaluated once per tool instance; overrides should also use @cached_property.
         """
         return True # Default for tools not needing specific config like FindAGrave scraper
 
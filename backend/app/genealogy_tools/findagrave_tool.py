@@ -2,9 +2,9 @@ import httpx
 from bs4 import BeautifulSoup
 from ratelimit import limits, sleep_and_retry # Ensure these are installed: pip install ratelimit
 from loguru import logger
-import urllib.parse
 import time # For citation date
 from typing import List, Dict, Any, Optional
+from functools import cached_property
 
 from app.genealogy_tools.base_tool import GenealogyTool
 from app.db.models import Person
@@ -16,7 +16,9 @@ class FindAGraveTool(GenealogyTool):
     An official API, if available, is always preferred.
     """
 
-    @property
+    result_cache_ttl_seconds = 6 * 3600 # Scraped pages change more often than API records
+
+    @cached_property # Read in every log line and cache key; computed once per instance
     def name(self) -> str:
         return "FindAGrave.com"
 
@@ -1,10 +1,16 @@
 import sys
+import asyncio
 import os # Added for constructing paths, especially for Alembic
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
 from loguru import logger
 from alembic.config import Config as AlembicConfig # For running migrations
 from alembic import command as alembic_command    # For running migrations
+from alembic.script import ScriptDirectory         # For resolving the head revision
+from alembic.runtime.migration import MigrationContext # For reading the DB's current revision
 
 from app.api.router import api_router # Main API router
 from app.core.config import settings  # Application settings
@@ -15,6 +21,35 @@ from app.db import crud                # For initial user creation
 # from app.db import models
 from app.services.plugin_manager import PluginManager # Import the PluginManager class
 from app.services import plugin_manager as plugin_manager_module # To set the global instance
+from app.services.ollama_service import ollama_service # For warming up the agent model
+
+# --- Alembic Configuration (built once per process group) ---
+# Paths are relative to this main.py file.
+# Assumes: main.py is in `backend/app/`, alembic.ini is in `backend/`.
+ALEMBIC_INI_PATH = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "alembic.ini"))
+ALEMBIC_SCRIPTS_PATH = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "alembic"))
+
+def _build_alembic_cfg() -> AlembicConfig | None:
+    """
+    Parses alembic.ini once and points it at our scripts and DATABASE_URL.
+    Built at import time so that a preloading server (e.g. gunicorn --preload)
+    shares the parsed config copy-on-write across all worker forks.
+    """
+    if not os.path.exists(ALEMBIC_INI_PATH):
+        return None
+    cfg = AlembicConfig(ALEMBIC_INI_PATH)
+    # Ensure alembic knows where its scripts are, relative to its own config or an absolute path
+    cfg.set_main_option("script_location", ALEMBIC_SCRIPTS_PATH)
+    # Crucially, ensure Alembic uses the DATABASE_URL from our application settings
+    cfg.set_main_option("sqlalchemy.url", str(settings.DATABASE_URL))
+    return cfg
+
+_ALEMBIC_CFG = _build_alembic_cfg()
+try:
+    _SCRIPT_DIR = ScriptDirectory.from_config(_ALEMBIC_CFG) if _ALEMBIC_CFG else None
+except Exception as e: # Missing/invalid scripts directory; on_startup falls back to a plain upgrade
+    logger.warning(f"Could not load Alembic script directory from {ALEMBIC_SCRIPTS_PATH}: {e}")
+    _SCRIPT_DIR = None
 
 # --- Application Initialization ---
 app = FastAPI(
@@ -23,6 +58,26 @@ app = FastAPI(
     description="Frankie AI Web Agent with Self-Optimization and Genealogy Research Capabilities."
 )
 
+# --- Health Probes ---
+# Minimal endpoints for container/orchestrator probes. They are plain Starlette routes
+# placed at the front of the routing table with precomputed responses, so a probe never
+# touches the API routers, dependency injection or the database.
+APP_READY = False # Flipped to True at the end of on_startup
+
+_HEALTH_OK = Response(b'{"status":"ok"}', media_type="application/json")
+_HEALTH_NOT_READY = Response(b'{"status":"starting"}', status_code=503, media_type="application/json")
+
+async def healthz(request: Request) -> Response:
+    """Liveness probe: the process is up and serving requests."""
+    return _HEALTH_OK
+
+async def readyz(request: Request) -> Response:
+    """Readiness probe: startup (migrations, initial users, plugins) has completed."""
+    return _HEALTH_OK if APP_READY else _HEALTH_NOT_READY
+
+app.router.routes.insert(0, Route("/healthz", healthz, methods=["GET"], include_in_schema=False))
+app.router.routes.insert(1, Route("/readyz", readyz, methods=["GET"], include_in_schema=False))
+
 # --- CORS (Cross-Origin Resource Sharing) Middleware ---
 # Configures which origins are allowed to make requests to the backend.
 if settings.BACKEND_CORS_ORIGINS:
@@ -64,28 +119,28 @@ def on_startup():
     - Applies database migrations using Alembic.
     - Creates initial user accounts from the configuration.
     - Initializes the PluginManager to load all agent plugins.
+    - Marks the application as ready for the /readyz probe.
     """
+    global APP_READY
     logger.info(f"Starting up {settings.APP_NAME}...")
     
     # 1. Apply Alembic database migrations
     try:
         logger.info("Attempting to apply database migrations...")
-        # Construct the path to alembic.ini relative to this main.py file.
-        # Assumes: main.py is in `backend/app/`, alembic.ini is in `backend/`.
-        alembic_ini_path = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "alembic.ini"))
-        alembic_scripts_path = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "alembic"))
-
-        if not os.path.exists(alembic_ini_path):
-            logger.error(f"Alembic configuration file not found at: {alembic_ini_path}. Skipping migrations.")
+        if _ALEMBIC_CFG is None:
+            logger.error(f"Alembic configuration file not found at: {ALEMBIC_INI_PATH}. Skipping migrations.")
         else:
-            alembic_cfg = AlembicConfig(alembic_ini_path)
-            # Ensure alembic knows where its scripts are, relative to its own config or an absolute path
-            alembic_cfg.set_main_option("script_location", alembic_scripts_path)
-            # Crucially, ensure Alembic uses the DATABASE_URL from our application settings
-            alembic_cfg.set_main_option("sqlalchemy.url", str(settings.DATABASE_URL))
-            
-            alembic_command.upgrade(alembic_cfg, "head") # Upgrade to the latest migration
-            logger.info("Database migrations applied successfully (or already up to date).")
+            # Compare the DB revision with the cached script head first, so an up-to-date
+            # database doesn't pay for importing the migration env on every boot.
+            current_revision = None
+            if _SCRIPT_DIR is not None:
+                with engine.connect() as connection:
+                    current_revision = MigrationContext.configure(connection).get_current_revision()
+            if _SCRIPT_DIR is not None and current_revision == _SCRIPT_DIR.get_current_head():
+                logger.info(f"Database already at head revision ({current_revision}). No migrations to apply.")
+            else:
+                alembic_command.upgrade(_ALEMBIC_CFG, "head") # Upgrade to the latest migration
+                logger.info("Database migrations applied successfully (or already up to date).")
     except Exception as e:
         logger.error(f"Failed to apply database migrations: {e}", exc_info=True)
         logger.warning("Continuing startup. If this is the first run or models changed, the database might be inconsistent or tables might be missing. Manual migration might be needed.")
@@ -98,10 +153,15 @@ def on_startup():
     try:
         db = SessionLocal()
         logger.info("Checking for and creating initial users if necessary...")
+        # One SELECT for all configured emails; bcrypt hashing (the expensive part of
+        # seeding) only happens for users that actually need to be created.
+        existing_emails = {
+            u.email for u in crud.get_users_by_emails(db, emails=[u.email for u in settings.INITIAL_USERS])
+        }
         for user_data in settings.INITIAL_USERS:
-            existing_user = crud.get_user_by_email(db, email=user_data.email)
-            if not existing_user:
+            if user_data.email not in existing_emails:
                 crud.create_user(db, user=user_data)
+                existing_emails.add(user_data.email)
                 logger.info(f"Created initial user: {user_data.email} with role {user_data.role}")
             else:
                 logger.info(f"Initial user {user_data.email} already exists. Skipping creation.")
@@ -120,9 +180,29 @@ def on_startup():
         logger.error(f"Failed to initialize PluginManager: {e}", exc_info=True)
         # Depending on severity, you might want to sys.exit(1) if plugins are critical for app operation.
     
+    APP_READY = True
     logger.info(f"'{settings.APP_NAME}' startup sequence complete. Application is ready.")
 
 
+_warm_up_task: asyncio.Task | None = None # Referenced so the background warm-up isn't garbage-collected
+
+@app.on_event("startup")
+async def warm_up_ollama():
+    """
+    Loads the agent model on Ollama in the background, so the first agent task after a (re)start
+    doesn't wait for the model to load. Readiness does not wait for it.
+    """
+    global _warm_up_task
+    if settings.OLLAMA_WARMUP_ON_STARTUP:
+        _warm_up_task = asyncio.create_task(ollama_service.warm_up_agent_model())
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Closes the shared Ollama HTTP connection pool."""
+    await ollama_service.aclose()
+
+
 # --- API Router Inclusion ---
 # Includes all routers from app/api/router.py under the /api/v1 prefix
 app.include_router(api_router, prefix=settings.API_V1_STR)
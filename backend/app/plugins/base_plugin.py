@@ -8,6 +8,9 @@ class FrankiePlugin(ABC):
     Each plugin represents a distinct capability or task that the agent can perform.
     """
 
+    # Subclasses that declare their own __slots__ carry no per-instance __dict__
+    __slots__ = ("db", "task")
+
     def __init__(self, db: Session, task: AgentTask):
         """
         Initializes the plugin instance.
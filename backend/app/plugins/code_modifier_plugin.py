@@ -1,22 +1,245 @@
+import io
+import asyncio
 import os
+import re
 import pathlib
+import hashlib
+import functools
+import importlib.util
+import json
+import atexit
+import select
+import threading
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 import tempfile
-import time
 import difflib
-import black # For formatting Python code
-from git import Repo, GitCommandError, InvalidGitRepositoryError, NoSuchPathError
+import shutil
+from datetime import datetime, timedelta, timezone
+import ijson # Incremental JSON parsing of the streamed LLM response
+import orjson
+from git import Git, Repo, GitCommandError, InvalidGitRepositoryError, NoSuchPathError
 from loguru import logger
-from typing import Dict, List, Any # For type hinting
+from typing import Dict, List, Any, Tuple # For type hinting
+try:
+    import pygit2 # Optional: in-process libgit2 for the test worktree, avoiding a git subprocess per operation
+except ImportError:
+    pygit2 = None
 
 from app.plugins.base_plugin import FrankiePlugin
 from app.services.ollama_service import ollama_service
+from app.services.semantic_cache import SemanticCache
 from app.db import models, crud, schemas  # Ensure crud and schemas are imported
 from app.core.config import settings
 
 # Root of the repository that the plugin modifies
 CODEBASE_PATH = settings.CODEBASE_PATH
 
+# File extensions formatted with Prettier (run from the frontend/ directory)
+PRETTIER_EXTENSIONS = ('.js', '.jsx', '.ts', '.tsx', '.json', '.css', '.scss', '.html', '.md')
+
+
+def _build_pytest_command() -> List[str]:
+    """
+    Builds the pytest invocation used to validate proposed changes.
+    With pytest-xdist installed, tests run on all cores; `--dist loadfile` keeps each test module
+    on one worker because every module owns its own SQLite file. The cache provider is disabled
+    since each run happens in a throwaway worktree.
+    """
+    command = ["python", "-m", "pytest", "-p", "no:cacheprovider"]
+    if importlib.util.find_spec("xdist") is not None:
+        command += ["-n", "auto", "--dist", "loadfile"]
+    return command
+
+
+PYTEST_COMMAND = _build_pytest_command()
+
+# Script for the long-lived Prettier worker process
+PRETTIER_DAEMON_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prettier_daemon.js")
+PRETTIER_DAEMON_TIMEOUT_SECONDS = 60
+
+
+class _PrettierDaemon:
+    """
+    A persistent `node prettier_daemon.js` process shared by all tasks in this worker.
+    Each format request is one JSON line over stdin/stdout, so Node start-up and the
+    Prettier module load are paid once per process instead of once per format call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._process: subprocess.Popen | None = None
+        self._cwd: str | None = None
+        self._unavailable_reason: str | None = None
+
+    def _ensure_started(self, frontend_dir: str):
+        if self._process and self._process.poll() is None and self._cwd == frontend_dir:
+            return
+        self._stop()
+        if self._unavailable_reason:
+            raise RuntimeError(self._unavailable_reason)
+        try:
+            self._process = subprocess.Popen(
+                ["node", PRETTIER_DAEMON_SCRIPT],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                cwd=frontend_dir, text=True, encoding='utf-8', bufsize=1
+            )
+            self._cwd = frontend_dir
+        except OSError as e:
+            self._unavailable_reason = f"could not start node: {e}"
+            raise RuntimeError(self._unavailable_reason)
+
+    def format(self, frontend_dir: str, filepath: str, code: str) -> Dict[str, str]:
+        """
+        Formats `code` as if it lived at `filepath`.
+        Returns {"formatted": ...} or {"error": ...}; raises RuntimeError if the daemon cannot serve requests.
+        """
+        with self._lock:
+            self._ensure_started(frontend_dir)
+            try:
+                self._process.stdin.write(json.dumps({"filepath": filepath, "code": code}) + "\n")
+                self._process.stdin.flush()
+                ready, _, _ = select.select([self._process.stdout], [], [], PRETTIER_DAEMON_TIMEOUT_SECONDS)
+                reply_line = self._process.stdout.readline() if ready else ""
+            except (OSError, ValueError) as e:
+                reply_line = ""
+                logger.warning(f"Prettier daemon I/O error: {e}")
+            if not reply_line:
+                # Daemon died (e.g. Prettier not installed in frontend/node_modules) or timed out
+                exit_code = self._process.poll()
+                self._stop()
+                if exit_code is not None:
+                    self._unavailable_reason = f"daemon exited with code {exit_code}"
+                raise RuntimeError(self._unavailable_reason or "daemon did not reply in time")
+            return json.loads(reply_line)
+
+    def _stop(self):
+        if self._process:
+            try:
+                self._process.kill()
+                self._process.wait(timeout=5)
+            except Exception:
+                pass
+        self._process = None
+        self._cwd = None
+
+    def close(self):
+        with self._lock:
+            self._stop()
+
+
+_prettier_daemon = _PrettierDaemon()
+atexit.register(_prettier_daemon.close)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_black_mode():
+    """Black is imported lazily (it is slow to import) and its Mode is built once."""
+    import black # For formatting Python code
+    return black.Mode()
+
+
+@functools.lru_cache(maxsize=512)
+def _black_format_cached(code_hash: str, code_content: str) -> str:
+    """Black is deterministic, so identical inputs (e.g. LLM retries) reuse the earlier result."""
+    import black # Only the first call pays the import; later ones hit sys.modules
+    return black.format_str(code_content, mode=_get_black_mode())
+
+# Static instructions for the code-modification LLM call. Kept byte-identical across tasks and
+# sent as the system prompt, so the inference server can reuse its KV-cache for this prefix.
+# Everything task-specific goes into the prompt built by _generate_meta_prompt.
+_STATIC_PREAMBLE = """You are Frankie, an expert AI software engineer. Your task is to modify source code based on a user request.
+
+**CRITICAL INSTRUCTIONS FOR YOUR RESPONSE:**
+1.  **JSON Format:** Your ENTIRE response MUST be a single, valid JSON object. No text before or after it.
+2.  **JSON Keys:** The JSON object must have exactly two top-level keys:
+    * `"explanation"`: A string containing a Markdown-formatted explanation of your proposed changes. Describe your plan, the files you'll modify (or create), and the reasoning behind your approach.
+    * `"modifications"`: An array of objects. Each object in this array represents a file to be modified or created.
+3.  **Modification Object Keys:** Each object within the "modifications" array must have exactly two keys:
+    * `"file_path"`: A string representing the full relative path of the file from the project root (e.g., `backend/app/main.py`, `frontend/src/components/MyComponent.jsx`).
+    * EITHER `"diff"`: A string of unified diff hunks (`@@ -start,count +start,count @@` headers followed by ` `, `-` and `+` lines, with at least 3 lines of unchanged context around each change) against the file content provided below. **Prefer this for edits to existing files.**
+    * OR `"new_code"`: A string containing the ENTIRE, complete source code for the file. Use this only when creating a new file or rewriting most of an existing one.
+
+Analyze the request and the provided file contents. Then, generate the JSON response as specified.
+If the request implies creating a new file, ensure its path is correct and provide its full content in "new_code".
+If a target file was not found and you are not creating it, note this in your explanation.
+"""
+
+# Task-specific part of the prompt; only the placeholders change between tasks
+_META_PROMPT_TEMPLATE = """**TARGET FILES AND THEIR CURRENT CONTENT (if existing, paths are relative to project root):**
+(Files listed here are: {target_files})
+{files}
+
+**USER REQUEST:**
+"{user_prompt}"
+"""
+
+_NO_FILE_CONTENT_NOTE = ("No existing file content provided. "
+                         "If target files were specified, you might be creating new files. "
+                         "Refer to the user request for desired new file paths and content.")
+
+# Cache of LLM responses, scoped to the exact target file contents they were generated from.
+# Exact-match only: "add logging to X" and "remove logging from X" embed close together over the same files,
+# so a similarity hit could hand back another task's opposite edit
+_llm_response_cache = SemanticCache(namespace="code_modifier", exact_match_only=True)
+
+_HUNK_HEADER_RE = re.compile(r"^@@ -(\d+)(?:,\d+)? \+\d+(?:,\d+)? @@")
+
+
+def _find_hunk_block(original_keys: List[str], old_keys: List[str], search_from: int, start_hint: int) -> int | None:
+    """Locates `old_keys` in `original_keys`, trying the hunk header's position first, then scanning forward."""
+    block_len = len(old_keys)
+    for index in (start_hint, *range(search_from, len(original_keys) - block_len + 1)):
+        if search_from <= index <= len(original_keys) - block_len and original_keys[index:index + block_len] == old_keys:
+            return index
+    return None
+
+
+def _apply_diff_hunks(original_code: str, diff_text: str, original_lines: List[str] | None = None) -> str:
+    """
+    Applies the unified diff hunks an LLM proposed for a file to its original content.
+    Hunk line numbers are treated as hints, since models often get them slightly wrong;
+    each hunk's context and removed lines must still match the original exactly (ignoring line endings).
+
+    Raises:
+        ValueError: If the diff has no hunks or a hunk does not match the original content.
+    """
+    hunks: List[Tuple[int, List[str], List[str]]] = [] # (0-based start hint, old lines, new lines)
+    current_hunk = None
+    for line in diff_text.splitlines(keepends=True):
+        header = _HUNK_HEADER_RE.match(line)
+        if header:
+            current_hunk = (max(int(header.group(1)) - 1, 0), [], [])
+            hunks.append(current_hunk)
+            continue
+        if current_hunk is None or line.startswith("\\"): # File headers before the first hunk, "\ No newline" markers
+            continue
+        tag, text = (line[0], line[1:]) if line.strip("\r\n") else (" ", "\n") # Models often drop the space on blank context lines
+        if not text.endswith("\n"):
+            text += "\n"
+        if tag in (" ", "-"):
+            current_hunk[1].append(text)
+        if tag in (" ", "+"):
+            current_hunk[2].append(text)
+    if not hunks:
+        raise ValueError("The proposed diff contains no '@@' hunks.")
+
+    if original_lines is None:
+        original_lines = original_code.splitlines(keepends=True)
+    original_keys = [line.rstrip("\r\n") for line in original_lines]
+    result_lines: List[str] = []
+    position = 0
+    for start_hint, old_lines, new_lines in hunks:
+        index = _find_hunk_block(original_keys, [line.rstrip("\r\n") for line in old_lines], position, start_hint)
+        if index is None:
+            raise ValueError(f"A proposed diff hunk near line {start_hint + 1} does not match the current file content.")
+        result_lines.extend(original_lines[position:index])
+        result_lines.extend(new_lines)
+        position = index + len(old_lines)
+    result_lines.extend(original_lines[position:])
+    return "".join(result_lines)
+
+
 class CodeModifierPlugin(FrankiePlugin):
     """
     A plugin for modifying the application's own codebase using LLM suggestions,
@@ -26,6 +249,13 @@ class CodeModifierPlugin(FrankiePlugin):
     def __init__(self, db, task):
         super().__init__(db, task)
         self.repo: Repo | None = None # Initialize repo attribute
+        # (exact-file set, directory-prefix tuple), loaded lazily on the first permission check
+        self._permission_rules: Tuple[set[str], Tuple[str, ...]] | None = None
+        # Line-split original contents, filled by _read_files and reused by hunk application and diffing
+        self._original_lines: Dict[str, List[str]] = {}
+        # Canonical codebase location, resolved once so per-file checks don't re-resolve it
+        self._codebase_root = pathlib.Path(CODEBASE_PATH).resolve()
+        self._frontend_dir = str(self._codebase_root / "frontend")
         try:
             # Ensure the codebase path actually exists before trying to init Repo
             if os.path.isdir(CODEBASE_PATH):
@@ -52,183 +282,333 @@ class CodeModifierPlugin(FrankiePlugin):
     def get_description() -> str:
         return "Analyzes natural language prompts to suggest, format, test, and (upon approval) apply code modifications to the project."
 
+    def _load_permission_rules(self) -> Tuple[set[str], Tuple[str, ...]]:
+        """
+        Fetches the allowed paths once per task and normalizes them into an exact-file set and a
+        tuple of directory prefixes (longest first), so each lookup is a set hit or one str.startswith call.
+        """
+        if self._permission_rules is None:
+            exact_files: set[str] = set()
+            directory_prefixes: List[str] = []
+            for permission in crud.get_permissions(self.db, limit=1000):
+                rule = permission.path.strip()
+                normalized_rule = pathlib.Path(rule).as_posix() # Note: as_posix() drops a trailing '/'
+                if rule.endswith('/'): # Directory rule
+                    directory_prefixes.append(normalized_rule.rstrip('/') + '/')
+                else: # Exact file rule
+                    exact_files.add(normalized_rule)
+            self._permission_rules = (exact_files, tuple(sorted(directory_prefixes, key=len, reverse=True)))
+        return self._permission_rules
+
     def _check_permissions(self, file_paths: List[str]):
         """Checks if the agent has permission to access all specified file paths."""
         if not file_paths:
             raise ValueError("No target files specified for permission check.") # Or handle as no-op if appropriate
-            
-        allowed_permissions: List[models.AgentPermission] = crud.get_permissions(self.db, limit=1000)
-        allowed_path_strings: set[str] = {p.path for p in allowed_permissions}
+
+        exact_files, directory_prefixes = self._load_permission_rules()
 
         for target_file_path_str in file_paths:
             normalized_target_path = pathlib.Path(target_file_path_str.strip()).as_posix()
-            
-            is_currently_allowed = False
-            for allowed_path_rule_str in allowed_path_strings:
-                normalized_allowed_rule = pathlib.Path(allowed_path_rule_str.strip()).as_posix()
-                
-                if normalized_allowed_rule.endswith('/'): # Directory rule
-                    if normalized_target_path.startswith(normalized_allowed_rule):
-                        is_currently_allowed = True
-                        break
-                elif normalized_target_path == normalized_allowed_rule: # Exact file match
-                    is_currently_allowed = True
-                    break
-            
+
+            # str.startswith with a tuple checks every prefix in a single C-level call
+            is_currently_allowed = normalized_target_path in exact_files or normalized_target_path.startswith(directory_prefixes)
+
             if not is_currently_allowed:
                 error_msg = f"Agent permission denied for '{normalized_target_path}'. Please add this path or a parent directory (ending with '/') to the allowed paths in admin settings."
                 logger.warning(f"Permission denied for task {self.task.id}: {error_msg}")
                 raise PermissionError(error_msg)
         logger.info(f"Permissions check passed for task {self.task.id} on files: {file_paths}")
 
+    def _read_one(self, rel_path_str: str) -> Tuple[str, str]:
+        """Reads a single target file, ensuring it is within the designated codebase."""
+        clean_rel_path = rel_path_str.strip()
+        # resolve() collapses '..' segments and follows symlinks, so a single containment
+        # check covers both directory traversal and links pointing outside the codebase.
+        full_path = (self._codebase_root / clean_rel_path).resolve()
+
+        # Security check: ensure the resolved path is still within CODEBASE_PATH
+        if not full_path.is_relative_to(self._codebase_root):
+            raise PermissionError(f"Attempt to access file outside designated codebase via path: '{clean_rel_path}' resolved to '{full_path}'")
+
+        if full_path.is_file():
+            try:
+                with open(full_path, 'r', encoding='utf-8') as f:
+                    return clean_rel_path, f.read()
+            except Exception as e:
+                logger.error(f"Error reading file {full_path} for task {self.task.id}: {e}")
+                raise FileNotFoundError(f"Could not read target file: '{clean_rel_path}'. Error: {e}")
+        logger.info(f"Target file '{clean_rel_path}' (resolved to '{full_path}') not found for task {self.task.id}. Assuming it's a new file to be created.")
+        return clean_rel_path, "" # Provide empty content for new files to allow diff generation
+
     def _read_files(self, target_file_paths: List[str]) -> Dict[str, str]:
-        """Reads content of specified files, ensuring they are within the designated codebase."""
+        """Reads content of specified files concurrently, ensuring they are within the designated codebase."""
         files_content_map: Dict[str, str] = {}
         if not target_file_paths:
             return files_content_map
 
-        for rel_path_str in target_file_paths:
-            clean_rel_path = rel_path_str.strip()
-            # Construct full path and normalize it to prevent directory traversal issues
-            # os.path.join correctly handles path components.
-            # os.path.normpath resolves '..' and '.' segments.
-            full_path = os.path.normpath(os.path.join(CODEBASE_PATH, clean_rel_path))
-            
-            # Security check: ensure the resolved absolute path is still within CODEBASE_PATH
-            if not os.path.abspath(full_path).startswith(os.path.abspath(CODEBASE_PATH)):
-                raise PermissionError(f"Attempt to access file outside designated codebase via path: '{clean_rel_path}' resolved to '{full_path}'")
-
-            if os.path.exists(full_path) and os.path.isfile(full_path):
-                try:
-                    with open(full_path, 'r', encoding='utf-8') as f:
-                        files_content_map[clean_rel_path] = f.read()
-                except Exception as e:
-                    logger.error(f"Error reading file {full_path} for task {self.task.id}: {e}")
-                    raise FileNotFoundError(f"Could not read target file: '{clean_rel_path}'. Error: {e}")
-            else:
-                logger.info(f"Target file '{clean_rel_path}' (resolved to '{full_path}') not found for task {self.task.id}. Assuming it's a new file to be created.")
-                files_content_map[clean_rel_path] = "" # Provide empty content for new files to allow diff generation
+        # Reads are I/O bound, so fanning out across threads makes wall time roughly the slowest single read.
+        # ex.map preserves input order and re-raises the first PermissionError/FileNotFoundError.
+        with ThreadPoolExecutor(max_workers=min(16, len(target_file_paths))) as ex:
+            for clean_rel_path, content in ex.map(self._read_one, target_file_paths):
+                files_content_map[clean_rel_path] = content
+                self._original_lines[clean_rel_path] = content.splitlines(keepends=True) if content else []
         return files_content_map
 
     def _generate_meta_prompt(self, user_prompt: str, files_content: Dict[str, str]) -> str:
-        """Constructs the detailed prompt for the LLM for code modification."""
-        file_blocks_str = "\n\n".join(
-            [f"--- START FILE: {path} ---\n\n{content}\n\n--- END FILE: {path} ---" 
-             for path, content in files_content.items() if content.strip()] # Only include files with actual content for existing
-        )
-        if not files_content or not file_blocks_str.strip():
-            file_blocks_str = ("No existing file content provided. "
-                               "If target files were specified, you might be creating new files. "
-                               "Refer to the user request for desired new file paths and content.")
-            
+        """
+        Constructs the task-specific part of the LLM prompt (the instructions are in _STATIC_PREAMBLE).
+        File blocks come first, sorted by path for a deterministic layout; the user request is last.
+        """
+        file_blocks = io.StringIO()
+        for path in sorted(files_content):
+            if not files_content[path].strip(): # Only include files with actual content for existing
+                continue
+            if file_blocks.tell():
+                file_blocks.write("\n\n")
+            file_blocks.write(f"--- START FILE: {path} ---\n\n")
+            file_blocks.write(files_content[path])
+            file_blocks.write(f"\n\n--- END FILE: {path} ---")
+        file_blocks_str = file_blocks.getvalue()
+        if not file_blocks_str:
+            file_blocks_str = _NO_FILE_CONTENT_NOTE
+
         # Guidance on file paths to use in LLM response
-        target_files_list_str = ", ".join(files_content.keys()) if files_content else "as per user request for new files"
-            
-        return f"""You are Frankie, an expert AI software engineer. Your task is to modify source code based on a user request.
-
-        **CRITICAL INSTRUCTIONS FOR YOUR RESPONSE:**
-        1.  **JSON Format:** Your ENTIRE response MUST be a single, valid JSON object. No text before or after it.
-        2.  **JSON Keys:** The JSON object must have exactly two top-level keys:
-            * `"explanation"`: A string containing a Markdown-formatted explanation of your proposed changes. Describe your plan, the files you'll modify (or create), and the reasoning behind your approach.
-            * `"modifications"`: An array of objects. Each object in this array represents a file to be modified or created.
-        3.  **Modification Object Keys:** Each object within the "modifications" array must have exactly two keys:
-            * `"file_path"`: A string representing the full relative path of the file from the project root (e.g., `backend/app/main.py`, `frontend/src/components/MyComponent.jsx`).
-            * `"new_code"`: A string containing the ENTIRE, complete, updated source code for that file. **Do NOT provide partial code, snippets, or diffs.** If creating a new file, this is its full content.
-
-        **USER REQUEST:**
-        "{user_prompt}"
-
-        **TARGET FILES AND THEIR CURRENT CONTENT (if existing, paths are relative to project root):**
-        (Files listed here are: {target_files_list_str})
-        {file_blocks_str}
-
-        Analyze the request and the provided file contents. Then, generate the JSON response as specified.
-        If the request implies creating a new file, ensure its path is correct and provide its full content in "new_code".
-        If a target file was not found and you are not creating it, note this in your explanation.
+        target_files_list_str = ", ".join(sorted(files_content)) if files_content else "as per user request for new files"
+
+        return _META_PROMPT_TEMPLATE.format(target_files=target_files_list_str, files=file_blocks_str, user_prompt=user_prompt)
+
+    def _get_cache_scope(self, files_content: Dict[str, str]) -> str:
+        """
+        Builds the cache scope for an LLM response: every target path with its mtime and a
+        content hash. Any edit to a target file changes the scope, invalidating cached responses.
+        """
+        scope_parts = []
+        for path in sorted(files_content):
+            full_path = self._codebase_root / path
+            mtime = os.path.getmtime(full_path) if os.path.isfile(full_path) else 0
+            content_hash = hashlib.sha256(files_content[path].encode("utf-8")).hexdigest()
+            scope_parts.append(f"{path}:{mtime}:{content_hash}")
+        return "\n".join(scope_parts)
+
+    def _format_with_prettier(self, files: List[Tuple[str, str]]) -> List[str]:
+        """
+        Formats frontend files through the persistent Prettier daemon.
+        Falls back to a single batched `npx prettier` run if the daemon is unavailable.
+
+        Args:
+            files: (file_path, code_content) pairs.
+        Returns:
+            The formatted contents, in the same order. Any file Prettier could not format
+            is returned unchanged.
+        """
+        frontend_dir = self._frontend_dir
+        if not os.path.isdir(frontend_dir):
+            logger.warning(f"Frontend directory {frontend_dir} not found. Cannot run Prettier for {[path for path, _ in files]}. Skipping format.")
+            return [code_content for _, code_content in files]
+
+        formatted_contents = []
+        try:
+            for file_path_str, code_content in files:
+                reply = _prettier_daemon.format(frontend_dir, str(self._codebase_root / file_path_str), code_content)
+                if "formatted" in reply:
+                    formatted_contents.append(reply["formatted"])
+                else:
+                    logger.warning(f"Prettier failed for {file_path_str}: {reply.get('error')}")
+                    formatted_contents.append(code_content)
+            return formatted_contents
+        except RuntimeError as e:
+            logger.info(f"Prettier daemon unavailable ({e}). Falling back to a single npx prettier run for task {self.task.id}.")
+            return self._format_with_prettier_cli(files)
+
+    def _format_with_prettier_cli(self, files: List[Tuple[str, str]]) -> List[str]:
         """
+        Formats several frontend files with a single `npx prettier --write` invocation,
+        paying Node/Prettier start-up once instead of once per file.
+        """
+        original_contents = [code_content for _, code_content in files]
+        frontend_dir = self._frontend_dir
+        if not os.path.isdir(frontend_dir):
+            logger.warning(f"Frontend directory {frontend_dir} not found. Cannot run Prettier for {[path for path, _ in files]}. Skipping format.")
+            return original_contents
+
+        # Temp dir inside frontend/ so Prettier picks up the project's configuration
+        tmp_dir = tempfile.mkdtemp(prefix=".frankie-format-", dir=frontend_dir)
+        try:
+            tmp_paths = []
+            for i, (file_path_str, code_content) in enumerate(files):
+                tmp_path = os.path.join(tmp_dir, f"{i}{pathlib.Path(file_path_str).suffix}")
+                with open(tmp_path, 'w', encoding='utf-8') as tmp_file:
+                    tmp_file.write(code_content)
+                tmp_paths.append(tmp_path)
+
+            prettier_command = ["npx", "prettier", "--write", *tmp_paths]
+            process = subprocess.run(prettier_command, capture_output=True, text=True, cwd=frontend_dir, timeout=120)
+            if process.returncode != 0:
+                # Prettier still writes every file it could parse; the rest keep their original content.
+                logger.warning(f"Prettier reported errors for task {self.task.id}. Stderr: {process.stderr or 'None'}. Stdout: {process.stdout or 'None'}")
+
+            formatted_contents = []
+            for tmp_path in tmp_paths:
+                with open(tmp_path, 'r', encoding='utf-8') as f:
+                    formatted_contents.append(f.read())
+            logger.info(f"Prettier formatted {len(files)} file(s) in one invocation for task {self.task.id}.")
+            return formatted_contents
+        except Exception as e:
+            logger.error(f"Failed to run Prettier for task {self.task.id}: {e}", exc_info=True)
+            return original_contents
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
 
     def _format_code(self, file_path_str: str, code_content: str) -> str:
         """Formats a string of code using Black for Python or Prettier for frontend files."""
-        # ... (Implementation is identical to the one provided in the previous "Part 4: Auto-formatting/Linting" step)
-        # ... (Ensure it uses self.task.id for logging if needed, and CODEBASE_PATH)
-        # For brevity, re-pasting the core logic:
         file_path = pathlib.Path(file_path_str)
         file_extension = file_path.suffix
         logger.info(f"Attempting to format code for file: {file_path_str} (extension: {file_extension}) for task {self.task.id}")
-        original_code_content = code_content # Keep original if formatting fails
 
+        if file_extension in PRETTIER_EXTENSIONS:
+            return self._format_with_prettier([(file_path_str, code_content)])[0]
+        if file_extension != ".py":
+            logger.info(f"No formatter for extension '{file_extension}' of file {file_path_str}.")
+            return code_content
         try:
-            if file_extension == ".py":
-                return black.format_str(code_content, mode=black.Mode())
-            elif file_extension in ['.js', '.jsx', '.ts', '.tsx', '.json', '.css', '.scss', '.html', '.md']:
-                frontend_dir = os.path.normpath(os.path.join(CODEBASE_PATH, "frontend"))
-                if not os.path.isdir(frontend_dir):
-                     logger.warning(f"Frontend directory {frontend_dir} not found. Cannot run Prettier for {file_path_str}. Skipping format.")
-                     return original_code_content
-                
-                with tempfile.NamedTemporaryFile(
-                    mode='w+', suffix=file_extension, dir=frontend_dir, delete=False, encoding='utf-8' # Temp file in frontend dir
-                ) as tmp_file:
-                    tmp_file.write(code_content)
-                    tmp_file_path_abs = tmp_file.name
-                
-                prettier_command = [ "npx", "prettier", "--write", tmp_file_path_abs ]
-                process = subprocess.run(prettier_command, capture_output=True, text=True, cwd=frontend_dir, timeout=60)
-                
-                if process.returncode == 0:
-                    with open(tmp_file_path_abs, 'r', encoding='utf-8') as f:
-                        formatted_content = f.read()
-                    logger.info(f"Prettier successfully formatted {file_path_str}")
-                    os.remove(tmp_file_path_abs)
-                    return formatted_content
-                else:
-                    logger.warning(f"Prettier failed for {file_path_str}. Stderr: {process.stderr or 'None'}. Stdout: {process.stdout or 'None'}")
-                    os.remove(tmp_file_path_abs)
-                    return original_code_content
-            else:
-                logger.info(f"No formatter for extension '{file_extension}' of file {file_path_str}.")
-                return original_code_content
+            code_hash = hashlib.blake2b(code_content.encode("utf-8"), digest_size=16).hexdigest()
+            return _black_format_cached(code_hash, code_content)
         except Exception as e:
             logger.error(f"Failed to format code for {file_path_str}: {e}", exc_info=True)
-            if 'tmp_file_path_abs' in locals() and os.path.exists(tmp_file_path_abs):
-                try: os.remove(tmp_file_path_abs)
-                except Exception as e_clean: logger.error(f"Error cleaning temp format file {tmp_file_path_abs}: {e_clean}")
-            return original_code_content
-
-
-    def _format_modifications(self, modifications: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Applies formatting to all proposed code modifications from the LLM."""
-        formatted_mods = []
-        for mod in modifications:
-            file_path = mod.get("file_path")
-            new_code = mod.get("new_code")
-            if file_path and isinstance(new_code, str):
-                formatted_code = self._format_code(file_path, new_code)
-                formatted_mods.append({"file_path": file_path, "new_code": formatted_code})
+            return code_content # Keep original if formatting fails
+
+    async def _stream_llm_and_format(self, meta_prompt: str, original_files_content: Dict[str, str]) -> Tuple[Dict[str, Any], List[schemas.CodeModification]]:
+        """
+        Streams the LLM response and hands each `modifications[i]` object to a format worker
+        as soon as it is complete, overlapping generation with formatting.
+
+        Returns:
+            The full parsed LLM response and its formatted modifications (in order).
+        Raises:
+            ValueError: If generation fails or the model's output does not match CodeModifierLLMResponse.
+        """
+        raw_chunks: List[str] = []
+        completed_mods = ijson.sendable_list()
+        parser = ijson.items_coro(completed_mods, "modifications.item")
+        format_futures = []
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            try:
+                async for chunk in ollama_service.generate_json_stream(meta_prompt, system=_STATIC_PREAMBLE):
+                    raw_chunks.append(chunk)
+                    parser.send(chunk.encode("utf-8"))
+                    for mod in completed_mods:
+                        modification = schemas.CodeModification.model_validate(mod) # ValidationError is a ValueError
+                        logger.debug(f"Task {self.task.id}: modification for '{modification.file_path}' streamed; formatting in background.")
+                        format_futures.append(asyncio.wrap_future(executor.submit(self._format_modifications, [modification], original_files_content)))
+                    del completed_mods[:]
+                parser.close()
+            except ijson.JSONError as e:
+                raise ValueError(f"LLM generation failed: the AI model returned a response that is not valid JSON: {e}")
+            except ValueError as e:
+                raise ValueError(f"LLM generation failed: {e}")
+            formatted_modifications = [formatted[0] for formatted in await asyncio.gather(*format_futures)]
+
+        try:
+            llm_response = orjson.loads("".join(raw_chunks))
+        except orjson.JSONDecodeError as e:
+            raise ValueError(f"LLM generation failed: the AI model returned a response that is not valid JSON: {e}")
+        if not isinstance(llm_response, dict):
+            raise ValueError("LLM generation failed: the AI model returned JSON that is not an object.")
+        return llm_response, formatted_modifications
+
+    def _materialize_modification(self, mod: schemas.CodeModification, original_files_content: Dict[str, str]) -> schemas.CodeModification:
+        """
+        Turns a modification given as diff hunks into one with the full `new_code`,
+        which formatting and diff generation operate on. Other entries pass through unchanged.
+        """
+        if mod.new_code is not None:
+            return mod
+        try:
+            new_code = _apply_diff_hunks(original_files_content.get(mod.file_path, ""), mod.diff, self._original_lines.get(mod.file_path))
+        except ValueError as e:
+            raise ValueError(f"Could not apply the LLM's proposed diff to '{mod.file_path}': {e}")
+        return schemas.CodeModification(file_path=mod.file_path, new_code=new_code)
+
+    def _format_modifications(self, modifications: List[schemas.CodeModification], original_files_content: Dict[str, str]) -> List[schemas.CodeModification]:
+        """
+        Applies formatting to all proposed code modifications from the LLM.
+        All frontend files are formatted together in one Prettier run; other files go
+        through _format_code individually. Results keep the order of `modifications`.
+        """
+        modifications = [self._materialize_modification(mod, original_files_content) for mod in modifications]
+        formatted_mods: List[schemas.CodeModification] = list(modifications)
+        prettier_indices: List[int] = []
+        for i, mod in enumerate(modifications):
+            if pathlib.Path(mod.file_path).suffix in PRETTIER_EXTENSIONS:
+                prettier_indices.append(i)
             else:
-                logger.warning(f"Skipping formatting for invalid/incomplete modification entry: {mod} in task {self.task.id}")
-                formatted_mods.append(mod) # Pass through if malformed
+                formatted_mods[i] = mod.model_copy(update={"new_code": self._format_code(mod.file_path, mod.new_code)})
+
+        if prettier_indices:
+            formatted_contents = self._format_with_prettier(
+                [(modifications[i].file_path, modifications[i].new_code) for i in prettier_indices]
+            )
+            for i, formatted_code in zip(prettier_indices, formatted_contents):
+                formatted_mods[i] = modifications[i].model_copy(update={"new_code": formatted_code})
         return formatted_mods
 
-    def _generate_diff(self, formatted_modifications: List[Dict[str, Any]], original_files_content: Dict[str, str]) -> str:
+    def _generate_diff(self, formatted_modifications: List[schemas.CodeModification], original_files_content: Dict[str, str]) -> str:
+        """
+        Generates a unified diff for all formatted modifications with a single `git diff --no-index`
+        over two temporary trees (a/ = originals, b/ = proposed). Falls back to difflib if git fails.
+        """
+        tmp_root = tempfile.mkdtemp(prefix=f"frankie-task-diff-{self.task.id}-")
+        try:
+            for mod in formatted_modifications:
+                file_path, new_code_str = mod.file_path, mod.new_code
+                clean_rel_path = pathlib.Path(file_path.strip()).as_posix()
+                new_copy = os.path.normpath(os.path.join(tmp_root, "b", clean_rel_path))
+                if not new_copy.startswith(os.path.join(tmp_root, "b") + os.sep):
+                    logger.warning(f"Skipping diff for path outside the codebase in task {self.task.id}: '{file_path}'")
+                    continue
+                # Only files that exist get an a/ copy, so git marks the rest as new files (--- /dev/null)
+                if (self._codebase_root / clean_rel_path).is_file():
+                    self._write_diff_copy(os.path.join(tmp_root, "a", clean_rel_path), original_files_content.get(file_path, ""))
+                self._write_diff_copy(new_copy, new_code_str)
+
+            os.makedirs(os.path.join(tmp_root, "a"), exist_ok=True)
+            os.makedirs(os.path.join(tmp_root, "b"), exist_ok=True)
+            # --no-prefix turns the "a/<path>" and "b/<path>" tree paths into standard git diff headers.
+            # Exit code 1 just means "differences found", hence with_exceptions=False.
+            full_diff = Git(tmp_root).diff(
+                "--no-index", "--no-prefix", "--no-color", "--no-ext-diff", "--no-renames", "--text", "a", "b",
+                with_exceptions=False
+            )
+            if not full_diff.strip():
+                return "-- No textual changes detected or no modifications proposed --"
+            return full_diff + "\n" # GitPython strips the final newline, which git apply needs
+        except Exception as e:
+            logger.warning(f"git diff --no-index failed for task {self.task.id} ({e}). Falling back to difflib.")
+            return self._generate_diff_difflib(formatted_modifications, original_files_content)
+        finally:
+            shutil.rmtree(tmp_root, ignore_errors=True)
+
+    @staticmethod
+    def _write_diff_copy(path: str, content: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8', newline='') as f: # newline='' keeps the content's own line endings
+            f.write(content)
+
+    def _generate_diff_difflib(self, formatted_modifications: List[schemas.CodeModification], original_files_content: Dict[str, str]) -> str:
         """Generates a unified diff string for all formatted modifications against their originals."""
         full_diff_lines: List[str] = []
         for mod in formatted_modifications:
-            file_path = mod.get("file_path")
-            new_code_str = mod.get("new_code", "") # Default to empty if new_code is missing or not string
-
-            if not file_path:
-                logger.warning(f"Modification entry missing 'file_path' in task {self.task.id}. Skipping diff for this entry: {mod}")
-                continue
-            if not isinstance(new_code_str, str):
-                logger.warning(f"Modification entry 'new_code' is not a string for file '{file_path}' in task {self.task.id}. Using empty string for diff.")
-                new_code_str = ""
+            file_path, new_code_str = mod.file_path, mod.new_code
 
-            original_code_str = original_files_content.get(file_path, "") # Empty if it's a new file being created
+            original_lines = self._original_lines.get(file_path)
+            if original_lines is None: # Not read via _read_files; split on demand (empty for new files)
+                original_code_str = original_files_content.get(file_path, "")
+                original_lines = original_code_str.splitlines(keepends=True) if original_code_str else []
 
             # Create diff lines
             diff_iter = difflib.unified_diff(
-                original_code_str.splitlines(keepends=True),
+                original_lines,
                 new_code_str.splitlines(keepends=True),
                 fromfile=f"a/{file_path}", # Standard git diff "from" prefix
                 tofile=f"b/{file_path}",   # Standard git diff "to" prefix
@@ -240,84 +620,151 @@ class CodeModifierPlugin(FrankiePlugin):
         return "".join(full_diff_lines) if full_diff_lines else "-- No textual changes detected or no modifications proposed --"
 
 
-    def _run_tests_on_changes(self, proposed_diff: str) -> Dict[str, Any]:
-        """Applies changes to a temporary git branch, runs backend tests, and cleans up."""
+    async def _run_tests_on_changes(self, proposed_diff: str, changed_file_paths: List[str] | None = None) -> Dict[str, Any]:
+        """
+        Applies changes in a throwaway git worktree of HEAD, runs backend tests there, and cleans up.
+        The main checkout is never stashed or switched, so concurrent tasks can test in parallel.
+        If `changed_file_paths` is given and none of them is under backend/, tests are skipped.
+        Results are cached per (diff, HEAD commit) for TEST_RESULT_CACHE_TTL_SECONDS.
+        """
+        if changed_file_paths is not None and not any(
+            pathlib.Path(path.strip()).as_posix().startswith("backend/") for path in changed_file_paths
+        ):
+            logger.info(f"Task {self.task.id} only changes non-backend files. Skipping backend tests.")
+            return {"status": models.TestStatus.NOT_RUN, "results": "No backend files changed, so backend tests were not run."}
+
         if not self.repo:
             logger.error(f"Git repository not available for testing task {self.task.id}.")
             return {"status": models.TestStatus.FAIL, "results": "Git repository not initialized for testing."}
 
-        original_branch_name = ""
         try:
-            original_branch_name = self.repo.active_branch.name
-        except TypeError: # Handles detached HEAD state
-             original_branch_name = self.repo.head.commit.hexsha 
-             logger.warning(f"Repo is in detached HEAD state ({original_branch_name}). Will attempt to checkout a new branch and return here.")
-
-
-        temp_branch_name = f"frankie-task-test-{self.task.id}-{int(time.time())}"
-        patch_file_path = "" # Define for finally block
+            head_sha = self.repo.head.commit.hexsha
+        except ValueError: # Repository has no commits yet
+            head_sha = None
+        diff_hash = hashlib.sha256((proposed_diff or "").encode("utf-8")).hexdigest()
+
+        if head_sha and settings.TEST_RESULT_CACHE_TTL_SECONDS > 0:
+            # The session is sync; run its queries off the event loop
+            cached = await asyncio.to_thread(crud.get_test_result_cache_entry, self.db, diff_hash=diff_hash, head_sha=head_sha)
+            if cached and cached.created_at:
+                created_at = cached.created_at if cached.created_at.tzinfo else cached.created_at.replace(tzinfo=timezone.utc)
+                if datetime.now(timezone.utc) - created_at < timedelta(seconds=settings.TEST_RESULT_CACHE_TTL_SECONDS):
+                    logger.info(f"Reusing cached test result for task {self.task.id} (diff {diff_hash[:12]} on {head_sha[:12]}).")
+                    return {"status": models.TestStatus(cached.status), "results": cached.results}
+
+        test_run_result, pytest_ran = await self._run_tests_in_worktree(proposed_diff)
+        if pytest_ran and head_sha and settings.TEST_RESULT_CACHE_TTL_SECONDS > 0:
+            try:
+                await asyncio.to_thread(
+                    crud.upsert_test_result_cache_entry,
+                    self.db, diff_hash=diff_hash, head_sha=head_sha,
+                    status=test_run_result["status"].value, results=test_run_result["results"]
+                )
+            except Exception as e:
+                self.db.rollback()
+                logger.warning(f"Could not cache test result for task {self.task.id}: {e}")
+        return test_run_result
+
+    def _add_test_worktree(self, worktree_path: str, worktree_name: str):
+        """Checks out HEAD into a new worktree at `worktree_path` (via pygit2 when available)."""
+        if pygit2 is not None:
+            repo = pygit2.Repository(CODEBASE_PATH)
+            # libgit2 worktrees need a branch; a throwaway one named after the worktree is deleted on cleanup
+            branch = repo.branches.local.create(worktree_name, repo.head.peel(pygit2.Commit))
+            repo.add_worktree(worktree_name, worktree_path, branch)
+        else:
+            self.repo.git.worktree("add", "--detach", worktree_path, "HEAD")
+
+    def _remove_test_worktree(self, worktree_path: str, worktree_name: str):
+        if pygit2 is not None:
+            shutil.rmtree(worktree_path, ignore_errors=True)
+            repo = pygit2.Repository(CODEBASE_PATH)
+            repo.lookup_worktree(worktree_name).prune(True)
+            repo.branches.local.delete(worktree_name)
+        else:
+            self.repo.git.worktree("remove", "--force", worktree_path)
+
+    def _apply_diff_in_worktree(self, worktree_path: str, tmp_root: str, proposed_diff: str):
+        """Applies `proposed_diff` inside the test worktree (in-process with pygit2, else via `git apply`)."""
+        if pygit2 is not None:
+            pygit2.Repository(worktree_path).apply(pygit2.Diff.parse_diff(proposed_diff))
+            return
+
+        patch_file_path = os.path.join(tmp_root, "changes.patch")
+        with open(patch_file_path, 'w', encoding='utf-8') as patch_file:
+            patch_file.write(proposed_diff)
+
+        # git apply resolves the diff's paths relative to the worktree root
+        Repo(worktree_path).git.apply(patch_file_path, '--recount', '--allow-empty')
+
+    async def _run_tests_in_worktree(self, proposed_diff: str) -> Tuple[Dict[str, Any], bool]:
+        """
+        Runs the backend tests with `proposed_diff` applied in a temporary worktree.
+        Returns the test result and whether pytest actually ran (only those results are cacheable).
+        Git work runs in a thread and pytest as an asyncio subprocess, so the event loop stays free.
+        """
+        tmp_root = tempfile.mkdtemp(prefix=f"frankie-task-test-{self.task.id}-")
+        worktree_path = os.path.join(tmp_root, "worktree")
+        worktree_name = os.path.basename(tmp_root) # Unique per run, also used as the pygit2 branch name
+        worktree_added = False
 
         try:
-            if self.repo.is_dirty(untracked_files=True):
-                logger.warning(f"Repo is dirty before testing task {self.task.id}. Stashing changes on current branch '{original_branch_name}'.")
-                self.repo.git.stash("push", "-u", "-m", f"frankie-autostash-test-{self.task.id}")
+            await asyncio.to_thread(self._add_test_worktree, worktree_path, worktree_name)
+            worktree_added = True
+            logger.info(f"Created worktree '{worktree_path}' for testing task {self.task.id}.")
 
-            temp_branch = self.repo.create_head(temp_branch_name)
-            temp_branch.checkout()
-            logger.info(f"Checked out temporary branch '{temp_branch_name}' for testing task {self.task.id}.")
-            
             if proposed_diff and proposed_diff.strip() and proposed_diff.strip() != "-- No textual changes detected or no modifications proposed --":
-                # Use a temporary file within CODEBASE_PATH for git apply, as it resolves paths relative to repo root
-                with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.patch', dir=CODEBASE_PATH, encoding='utf-8') as patch_file:
-                    patch_file.write(proposed_diff)
-                    patch_file_path = patch_file.name
-                
-                # Apply the patch using git apply
-                self.repo.git.apply(patch_file_path, '--recount', '--inaccurate-eof', '--allow-empty')
-                logger.info(f"Applied diff to temporary branch '{temp_branch_name}' for task {self.task.id}.")
+                await asyncio.to_thread(self._apply_diff_in_worktree, worktree_path, tmp_root, proposed_diff)
+                logger.info(f"Applied diff in worktree '{worktree_path}' for task {self.task.id}.")
             else:
-                logger.info(f"No diff content to apply for testing task {self.task.id}. Running tests on current state of branch '{temp_branch_name}'.")
+                logger.info(f"No diff content to apply for testing task {self.task.id}. Running tests on HEAD.")
 
             # Run pytest for backend tests
-            backend_dir = os.path.normpath(os.path.join(CODEBASE_PATH, "backend"))
+            backend_dir = os.path.join(worktree_path, "backend")
             if not os.path.isdir(backend_dir):
-                 return {"status": models.TestStatus.FAIL, "results": f"Backend directory '{backend_dir}' not found for running tests."}
+                 return {"status": models.TestStatus.FAIL, "results": f"Backend directory '{backend_dir}' not found for running tests."}, False
 
             logger.info(f"Running pytest in {backend_dir} for task {self.task.id}...")
-            process = subprocess.run(
-                ["python", "-m", "pytest"], # Runs all tests found by pytest in cwd
+            process = await asyncio.create_subprocess_exec(
+                *PYTEST_COMMAND, # Runs all tests found by pytest in cwd
                 cwd=backend_dir,
-                capture_output=True,
-                text=True,
-                timeout=300 # 5 minute timeout for tests
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
             )
-            test_output = f"--- PYTEST STDOUT ---\n{process.stdout}\n\n--- PYTEST STDERR ---\n{process.stderr}"
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=300) # 5 minute timeout for tests
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                logger.warning(f"Backend tests timed out for task {self.task.id} in worktree {worktree_path}.")
+                return {"status": models.TestStatus.FAIL, "results": "Backend tests timed out after 300 seconds."}, False
+            test_output = (f"--- PYTEST STDOUT ---\n{stdout.decode('utf-8', errors='replace')}\n\n"
+                           f"--- PYTEST STDERR ---\n{stderr.decode('utf-8', errors='replace')}")
             
             if process.returncode == 0:
-                logger.info(f"Backend tests PASSED for task {self.task.id} on branch {temp_branch_name}.")
-                return {"status": models.TestStatus.PASS, "results": test_output}
+                logger.info(f"Backend tests PASSED for task {self.task.id} in worktree {worktree_path}.")
+                return {"status": models.TestStatus.PASS, "results": test_output}, True
             else:
-                logger.warning(f"Backend tests FAILED for task {self.task.id} on branch {temp_branch_name}. Exit code: {process.returncode}")
-                return {"status": models.TestStatus.FAIL, "results": test_output}
+                logger.warning(f"Backend tests FAILED for task {self.task.id} in worktree {worktree_path}. Exit code: {process.returncode}")
+                return {"status": models.TestStatus.FAIL, "results": test_output}, True
 
         except GitCommandError as e:
             logger.error(f"Git command error during testing for task {self.task.id}: {e.stderr or e.stdout}")
-            return {"status": models.TestStatus.FAIL, "results": f"Git command failed during testing: {e.stderr or e.stdout}"}
+            return {"status": models.TestStatus.FAIL, "results": f"Git command failed during testing: {e.stderr or e.stdout}"}, False
         except Exception as e:
+            if pygit2 is not None and isinstance(e, pygit2.GitError):
+                logger.error(f"libgit2 error during testing for task {self.task.id}: {e}")
+                return {"status": models.TestStatus.FAIL, "results": f"Git operation failed during testing: {e}"}, False
             logger.error(f"Unexpected error during testing for task {self.task.id}: {e}", exc_info=True)
-            return {"status": models.TestStatus.FAIL, "results": f"An unexpected error occurred during testing: {str(e)}"}
+            return {"status": models.TestStatus.FAIL, "results": f"An unexpected error occurred during testing: {str(e)}"}, False
         finally:
-            if self.repo: # Ensure repo was initialized
-                logger.info(f"Cleaning up after test run for task {self.task.id}. Attempting to switch back to {original_branch_name}.")
+            if worktree_added:
                 try:
-                    self.repo.git.checkout(original_branch_name, force=True) # Force checkout to discard any uncommitted changes on temp_branch
-                    self.repo.delete_head(temp_branch_name, force=True)
-                    logger.info(f"Successfully cleaned up temporary branch '{temp_branch_name}'.")
-                except GitCommandError as e_cleanup:
-                    logger.error(f"Could not fully cleanup temporary test branch '{temp_branch_name}': {e_cleanup.stderr}")
-            if patch_file_path and os.path.exists(patch_file_path):
-                try: os.remove(patch_file_path)
-                except OSError as e_ose: logger.error(f"Error deleting patch file {patch_file_path}: {e_ose}")
+                    await asyncio.to_thread(self._remove_test_worktree, worktree_path, worktree_name)
+                    logger.info(f"Removed test worktree '{worktree_path}' for task {self.task.id}.")
+                except Exception as e_cleanup:
+                    logger.error(f"Could not remove test worktree '{worktree_path}': {getattr(e_cleanup, 'stderr', None) or e_cleanup}")
+            shutil.rmtree(tmp_root, ignore_errors=True)
 
 
     async def execute(self) -> dict:
@@ -334,18 +781,25 @@ class CodeModifierPlugin(FrankiePlugin):
              return {"status": models.TaskStatus.ERROR, "error_message": "No valid target files were specified after parsing the input string."}
 
         try:
-            self._check_permissions(target_file_paths)
-            original_files_content = self._read_files(target_file_paths)
+            await asyncio.to_thread(self._check_permissions, target_file_paths) # Loads the permission rules from the DB
+            original_files_content = await asyncio.to_thread(self._read_files, target_file_paths)
             meta_prompt = self._generate_meta_prompt(self.task.prompt, original_files_content)
             
-            logger.info(f"Sending meta-prompt to LLM for task {self.task.id}...")
-            llm_response = await ollama_service.generate_json(meta_prompt)
-
-            if "error" in llm_response: # Check for error key from OllamaService
-                raise ValueError(f"LLM generation failed: {llm_response['error']}")
-
-            explanation = llm_response.get("explanation", "No explanation provided by LLM.")
-            modifications: List[Dict[str, Any]] = llm_response.get("modifications", [])
+            cache_scope = self._get_cache_scope(original_files_content)
+            llm_response = await asyncio.to_thread(_llm_response_cache.lookup, self.db, scope=cache_scope, prompt_text=self.task.prompt)
+            formatted_modifications: List[schemas.CodeModification] | None = None
+            from_cache = llm_response is not None
+            if from_cache:
+                logger.info(f"Reusing cached LLM response for task {self.task.id}. Skipping LLM call.")
+            else:
+                logger.info(f"Streaming meta-prompt to LLM for task {self.task.id}...")
+                llm_response, formatted_modifications = await self._stream_llm_and_format(meta_prompt, original_files_content)
+
+            parsed_response = schemas.CodeModifierLLMResponse.model_validate(llm_response) # ValidationError is a ValueError
+            if not from_cache: # Only responses that passed validation are cached, so a malformed one is never replayed
+                await asyncio.to_thread(_llm_response_cache.store, self.db, scope=cache_scope, prompt_text=self.task.prompt, response=llm_response)
+            explanation = parsed_response.explanation
+            modifications = parsed_response.modifications
             
             if not modifications: # Check if modifications list is empty or missing
                 logger.info(f"LLM did not propose any code modifications for task {self.task.id}.")
@@ -357,14 +811,17 @@ class CodeModifierPlugin(FrankiePlugin):
                     "test_results": "No code changes proposed by LLM, so no tests were run."
                 }
             
-            logger.info(f"LLM proposed {len(modifications)} modifications for task {self.task.id}. Formatting code...")
-            formatted_modifications = self._format_modifications(modifications)
+            if formatted_modifications is None: # Cache hit; streamed responses were formatted as they arrived
+                logger.info(f"LLM proposed {len(modifications)} modifications for task {self.task.id}. Formatting code...")
+                formatted_modifications = await asyncio.to_thread(self._format_modifications, modifications, original_files_content)
             
             logger.info(f"Generating diff for task {self.task.id}...")
-            full_diff = self._generate_diff(formatted_modifications, original_files_content)
+            full_diff = await asyncio.to_thread(self._generate_diff, formatted_modifications, original_files_content)
             
             logger.info(f"Running tests for task {self.task.id}...")
-            test_run_result = self._run_tests_on_changes(full_diff)
+            test_run_result = await self._run_tests_on_changes(
+                full_diff, [mod.file_path for mod in formatted_modifications]
+            )
             
             logger.info(f"Task {self.task.id} ready for review. Test status: {test_run_result.get('status', models.TestStatus.FAIL).value}")
             return {
@@ -1,13 +1,38 @@
 from loguru import logger
+from sqlalchemy import exists
 from typing import List, Dict, Any # For type hinting
 import time
+import asyncio
+import contextlib
+import re
 
 from app.plugins.base_plugin import FrankiePlugin
 from app.db import models, crud, schemas # Ensure schemas is imported for ResearchFindingCreate
 from app.genealogy_tools.findagrave_tool import FindAGraveTool
 # from app.genealogy_tools.familysearch_tool import FamilySearchTool # Example for future
 from app.services.ollama_service import ollama_service
-from app.core.config import settings # To potentially access API keys for tools
+from app.services import tool_cache
+
+# Fields _identify_missing_info_fields can report. Findings tagged with one of these only feed that
+# field's synthesis; untagged or general findings (e.g. "existence_on_findagrave") feed every field.
+RESEARCHABLE_FIELDS = ("birth_date", "birth_place", "death_date", "death_place", "parents")
+
+# Person fields a tool search can depend on; together with the tool name they key the tool result cache
+TOOL_SEARCH_FIELDS = ("first_name", "last_name", "sex", "birth_date", "birth_place", "death_date", "death_place")
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+_WHITESPACE_RE = re.compile(r"\s+")
+_YEAR_RE = re.compile(r"\b(1[0-9]{3}|20[0-9]{2})\b")
+
+# Fields whose findings all score below this rule-based estimate are not worth an LLM call
+CHEAP_CONFIDENCE_THRESHOLD = 0.2
+YEAR_PROXIMITY_TOLERANCE = 5
+
+
+def _normalize_for_dedupe(value: Any) -> str:
+    """Lowercases and strips punctuation/extra whitespace, so "12 Mar. 1901" and "12 mar 1901" compare equal."""
+    return _WHITESPACE_RE.sub(" ", _PUNCTUATION_RE.sub("", str(value or "").lower())).strip()
+
 
 class GenealogyResearchPlugin(FrankiePlugin):
     """
@@ -27,23 +52,161 @@ class GenealogyResearchPlugin(FrankiePlugin):
     def get_description() -> str:
         return "Uses online sources to find missing data for people in a family tree and suggests findings for admin review."
 
+    # Invariant synthesis instructions, kept byte-identical across calls (see _synthesize_findings_with_llm)
+    PROMPT_PREFIX = """You are an expert genealogist and data analyst. Your task is to analyze a set of raw research findings for a specific individual and the data fields they are missing or need to verify. The individual's known information, the raw findings, and the fields being researched follow in the prompt.
+
+Instructions, applied separately to EACH field being researched:
+1.  Carefully review all findings. Consider consistency, source reliability (e.g., a direct vital record image is better than an unsourced tree entry), and how well they match the known data for the individual.
+2.  Determine the most probable value for that field only.
+3.  Provide a confidence score (integer from 0 to 100) for your suggested value FOR THAT FIELD. A score of 0 means no confident suggestion can be made for the field from these findings.
+4.  Provide a brief reasoning (1-3 sentences) explaining your confidence and choice for that field, especially if there are conflicting findings or if you are inferring from related data.
+5.  Formulate a concise source citation string based on the provided source names and URLs that DIRECTLY support your suggestion for that field. If multiple sources support the same fact, list the primary ones.
+
+Respond ONLY with a single, valid JSON object with one key, "findings": an array with one object per researched field, each with the following keys:
+- "field": The name of the field, exactly as listed in the prompt.
+- "suggested_value": The most probable value for the field (string, formatted appropriately for the data type, e.g., dates as "DD MMM YYYY", places as "City, County, State, Country"). If suggesting a name for a parent, provide the full name.
+- "confidence_score": Your confidence in this suggestion (integer, 0-100).
+- "llm_reasoning": Your brief reasoning for this specific suggestion (string).
+- "citation_text": A concise citation for the supporting source(s) for this specific suggestion (string).
+
+If no confident suggestion can be made for a field based on the provided findings, ensure its "confidence_score" is low (e.g., below 30) or 0.
+"""
+
     def __init__(self, db, task):
         super().__init__(db, task)
         self.person_to_research: models.Person | None = None
+        # Validated ResearchFinding rows, inserted together once synthesis is done
+        self._pending_findings: List[Dict[str, Any]] = []
         
         # Initialize tools - more tools can be added here
         self.tools = []
         self.tools.append(FindAGraveTool()) # No API key needed for this example tool
         
         # Example of adding a tool that might need an API key:
-        # if settings.FAMILYSEARCH_DEV_KEY:
+        # if settings.FAMILYSEARCH_DEV_KEY: # (import settings from app.core.config)
         #     self.tools.append(FamilySearchTool(api_key=settings.FAMILYSEARCH_DEV_KEY))
         # else:
         #     logger.info("FamilySearchTool not configured due to missing FAMILYSEARCH_DEV_KEY.")
             
         # Filter out tools that are not configured (e.g., missing API keys)
         self.tools = [tool for tool in self.tools if tool.is_configured]
-        logger.info(f"GenealogyResearchPlugin initialized for task {self.task.id} with {len(self.tools)} configured tools: {[t.name for t in self.tools]}")
+        logger.opt(lazy=True).info("GenealogyResearchPlugin initialized for task {} with {} configured tools: {}", lambda: self.task.id, lambda: len(self.tools), lambda: [t.name for t in self.tools])
+
+    async def _search_with_tool(self, tool_instance, person: models.Person) -> List[Dict[str, Any]]:
+        """
+        Returns the tool's results for `person`, reusing a cached search with the same arguments if available.
+        The cache is keyed on the searched fields rather than the person's id, so the same individual in
+        another tree (or a re-imported one) reuses the fetch too. Cached lists are fresh copies, safe to annotate.
+        """
+        search_args = {field: getattr(person, field) for field in TOOL_SEARCH_FIELDS}
+        cached = await tool_cache.get(tool_instance.name, search_args)
+        if cached is not None:
+            logger.info(f"Reusing cached '{tool_instance.name}' results for person {person.id}.")
+            return cached
+        results = await tool_instance.search_person(person)
+        await tool_cache.put(tool_instance.name, search_args, results, ttl_seconds=tool_instance.result_cache_ttl_seconds)
+        return [dict(finding_dict) for finding_dict in results] # Copies, since callers annotate them
+
+    async def _collect_tool_findings(self, person: models.Person) -> List[Dict[str, Any]]:
+        """
+        Runs every tool concurrently as a producer feeding an asyncio.Queue; the consumer annotates
+        and collects findings as each tool finishes, so post-processing overlaps the slower tools.
+        A tool failure is logged and does not cancel the other tools.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def produce(tool_instance):
+            try:
+                tool_raw_results = await self._search_with_tool(tool_instance, person)
+            except Exception as e:
+                logger.error(f"Error using tool '{tool_instance.name}' for person {person.id}: {e}", exc_info=True)
+                tool_raw_results = None
+            await queue.put((tool_instance, tool_raw_results))
+
+        all_raw_findings: List[Dict[str, Any]] = []
+
+        async def consume():
+            for _ in range(len(self.tools)): # One message per tool, including failed ones
+                tool_instance, tool_raw_results = await queue.get()
+                if tool_raw_results is None:
+                    continue
+                for finding_dict in tool_raw_results:
+                    finding_dict['source_name'] = tool_instance.name # Ensure source name is attached
+                    all_raw_findings.append(finding_dict)
+                # Per-item logs use deferred formatting at debug level, so they cost nothing when filtered out
+                logger.debug("Tool '{}' returned {} raw items potentially related to person {}.", tool_instance.name, len(tool_raw_results), person.id)
+
+        async with asyncio.TaskGroup() as task_group:
+            for tool_instance in self.tools:
+                task_group.create_task(produce(tool_instance))
+            task_group.create_task(consume())
+        return all_raw_findings
+
+    def _insert_pending_findings(self):
+        """Inserts every queued finding with one bulk INSERT instead of a round-trip per finding."""
+        self.db.bulk_insert_mappings(models.ResearchFinding, self._pending_findings)
+        self.db.commit()
+        self._pending_findings = []
+
+    @staticmethod
+    def _format_known_data(person: models.Person) -> str:
+        """Formats the person's known facts for the synthesis prompt; built once per execute()."""
+        return (
+            f"- Full Name: {person.first_name or 'N/A'} {person.last_name or 'N/A'} (GEDCOM ID: {person.gedcom_id})\n"
+            f"- Sex: {person.sex or 'N/A'}\n"
+            f"- Birth Date: {person.birth_date or 'Unknown'}\n"
+            f"- Birth Place: {person.birth_place or 'Unknown'}\n"
+            f"- Death Date: {person.death_date or 'Unknown'}\n"
+            f"- Death Place: {person.death_place or 'Unknown'}\n"
+        )
+
+    @staticmethod
+    def _dedupe_findings(all_raw_findings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Drops findings that repeat the same fact from the same source (e.g. mirrored pages),
+        keeping the first one. Values are compared normalized to also catch near-duplicates.
+        """
+        seen = set()
+        deduped = []
+        for f_dict in all_raw_findings:
+            key = (f_dict.get('source_name'), f_dict.get('data_field'), _normalize_for_dedupe(f_dict.get('value')))
+            if key not in seen:
+                seen.add(key)
+                deduped.append(f_dict)
+        return deduped
+
+    @staticmethod
+    def _cheap_confidence_estimate(field: str, raw_findings: List[Dict[str, Any]], person: models.Person) -> float:
+        """
+        Rule-based estimate (0.0-1.0) of how likely the best of `raw_findings` is about `person`,
+        used to skip the LLM when nothing could yield a confident suggestion. The score is the share of
+        the person's name tokens found in a finding, halved when its years are all far from the known
+        ones (date fields) or it shares no token with the known places (place fields).
+        """
+        name_tokens = set(_normalize_for_dedupe(f"{person.first_name or ''} {person.last_name or ''}").split())
+        if not name_tokens:
+            return 1.0 # Nothing to compare against; let the LLM decide
+        known_years = [int(y) for y in _YEAR_RE.findall(f"{person.birth_date or ''} {person.death_date or ''}")]
+        known_place_tokens = set(_normalize_for_dedupe(f"{person.birth_place or ''} {person.death_place or ''}").split())
+
+        best = 0.0
+        for f_dict in raw_findings:
+            text = f"{f_dict.get('value', '')} {f_dict.get('citation', '')} {f_dict.get('match_quality_notes', '')}"
+            tokens = set(_normalize_for_dedupe(text).split())
+            estimate = len(name_tokens & tokens) / len(name_tokens)
+            if field.endswith("_date") and known_years:
+                found_years = [int(y) for y in _YEAR_RE.findall(text)]
+                if found_years and not any(abs(fy - ky) <= YEAR_PROXIMITY_TOLERANCE for fy in found_years for ky in known_years):
+                    estimate /= 2
+            elif field.endswith("_place") and known_place_tokens and not known_place_tokens & tokens:
+                estimate /= 2
+            best = max(best, estimate)
+        return best
+
+    @staticmethod
+    def _findings_for_field(all_raw_findings: List[Dict[str, Any]], field: str) -> List[Dict[str, Any]]:
+        """Selects the findings relevant to `field`: those tagged with it plus untagged/general ones."""
+        return [f for f in all_raw_findings if f.get('data_field') == field or f.get('data_field') not in RESEARCHABLE_FIELDS]
 
     def _identify_missing_info_fields(self) -> List[str]:
         """Identifies key pieces of information that are missing for the target person."""
@@ -59,98 +222,116 @@ class GenealogyResearchPlugin(FrankiePlugin):
         if not p.death_place: missing_fields.append("death_place")
         
         # Example: Check for parents. A person has parents if they are listed as a child in any family.
-        # This requires querying the database.
-        families_where_person_is_child = self.db.query(models.Family).filter(models.Family.children.any(id=p.id)).count()
-        if families_where_person_is_child == 0:
+        # EXISTS on the association table stops at the first row; no join to families or full COUNT needed.
+        is_child_in_any_family = self.db.query(
+            exists().where(models.family_child_association.c.person_id == p.id)
+        ).scalar()
+        if not is_child_in_any_family:
             missing_fields.append("parents") # This could be further broken down by LLM into 'father_name', 'mother_name'
             
         logger.info(f"For person ID {p.id} ({p.first_name} {p.last_name}), identified missing info fields: {missing_fields}")
         return missing_fields
 
-    async def _synthesize_findings_with_llm(self, person: models.Person, raw_findings: List[Dict[str, Any]], field_being_researched: str):
+    async def _synthesize_findings_with_llm(self, person: models.Person, known_data_str: str, fields: List[str], raw_findings_by_field: Dict[str, List[Dict[str, Any]]]) -> int:
         """
-        Uses an LLM to analyze raw findings for a specific field, score them,
-        generate reasoning, a citation, and create a ResearchFinding record if confident.
-        """
-        if not raw_findings:
-            logger.info(f"No raw findings to synthesize for '{field_being_researched}' of person ID {person.id}.")
-            return
-
-        # Prepare known data for context to the LLM
-        known_data_str = f"""
-        - Full Name: {person.first_name or 'N/A'} {person.last_name or 'N/A'} (GEDCOM ID: {person.gedcom_id})
-        - Sex: {person.sex or 'N/A'}
-        - Birth Date: {person.birth_date or 'Unknown'}
-        - Birth Place: {person.birth_place or 'Unknown'}
-        - Death Date: {person.death_date or 'Unknown'}
-        - Death Place: {person.death_place or 'Unknown'}
+        Uses a single LLM call to analyze the raw findings for all researched fields, score them,
+        generate reasoning and a citation per field, and queue a ResearchFinding row for each confident one
+        in self._pending_findings. `known_data_str` is the person's _format_known_data() block.
+        Returns the number of findings queued.
         """
+        fields = [field for field in fields if raw_findings_by_field.get(field)]
+        if not fields:
+            logger.info(f"No raw findings to synthesize for person ID {person.id}.")
+            return 0
 
-        # Prepare raw findings for the prompt, making it readable
-        raw_findings_formatted_list = []
-        for i, f_dict in enumerate(raw_findings):
-            raw_findings_formatted_list.append(
-                f"  Finding {i+1} (Source: {f_dict.get('source_name', 'Unknown')}):\n"
-                f"    - Data Field Found: {f_dict.get('data_field', 'N/A')}\n"
-                f"    - Value Found: {f_dict.get('value', 'N/A')}\n"
-                f"    - URL: {f_dict.get('source_url', 'N/A')}\n"
-                f"    - Citation/Notes: {f_dict.get('citation', f_dict.get('match_quality_notes', 'N/A'))}"
-            )
-        raw_findings_str = "\n".join(raw_findings_formatted_list)
-
-        prompt = f"""
-        You are an expert genealogist and data analyst. Your task is to analyze a set of raw research findings for a specific individual and a specific data field they are missing or need to verify.
+        # Escalate to the LLM only for fields where cheap heuristics can't rule the findings out
+        plausible_fields = [
+            field for field in fields
+            if self._cheap_confidence_estimate(field, raw_findings_by_field[field], person) >= CHEAP_CONFIDENCE_THRESHOLD
+        ]
+        if len(plausible_fields) < len(fields):
+            logger.opt(lazy=True).info("Skipping synthesis for fields {} of person ID {}: no finding plausibly matches.", lambda: [f for f in fields if f not in plausible_fields], lambda: person.id)
+        fields = plausible_fields
+        if not fields:
+            return 0
 
-        Individual's Known Information:
-        {known_data_str}
+        # Each distinct finding is listed once, even if it is relevant to several fields
+        unique_findings: List[Dict[str, Any]] = []
+        seen_finding_ids = set()
+        for field in fields:
+            for f_dict in raw_findings_by_field[field]:
+                if id(f_dict) not in seen_finding_ids:
+                    seen_finding_ids.add(id(f_dict))
+                    unique_findings.append(f_dict)
 
-        Specific Data Field Currently Being Researched: '{field_being_researched}'
+        # Prepare raw findings for the prompt, making it readable
+        raw_findings_str = "\n".join(
+            f"  Finding {i+1} (Source: {f_dict.get('source_name', 'Unknown')}):\n"
+            f"    - Data Field Found: {f_dict.get('data_field', 'N/A')}\n"
+            f"    - Value Found: {f_dict.get('value', 'N/A')}\n"
+            f"    - URL: {f_dict.get('source_url', 'N/A')}\n"
+            f"    - Citation/Notes: {f_dict.get('citation', f_dict.get('match_quality_notes', 'N/A'))}"
+            for i, f_dict in enumerate(unique_findings)
+        )
+        fields_str = ", ".join(f"'{field}'" for field in fields)
 
-        Raw Research Findings (potentially related to '{field_being_researched}' or the individual in general):
-        {raw_findings_str}
+        # Only the per-person data varies; the instructions are sent as a constant system prompt
+        # ahead of it, so the model server can reuse their KV-cache across calls.
+        prompt = (
+            f"Individual's Known Information:\n{known_data_str}\n"
+            f"Raw Research Findings (potentially related to the fields below or the individual in general):\n"
+            f"{raw_findings_str}\n\n"
+            f"Data Fields Currently Being Researched: {fields_str}\n"
+        )
 
-        Instructions:
-        1.  Carefully review all findings. Consider consistency, source reliability (e.g., a direct vital record image is better than an unsourced tree entry), and how well they match the known data for the individual.
-        2.  Determine the most probable value ONLY for the specific '{field_being_researched}'.
-        3.  Provide a confidence score (integer from 0 to 100) for your suggested value FOR THIS SPECIFIC FIELD. A score of 0 means no confident suggestion can be made for this field from these findings.
-        4.  Provide a brief reasoning (1-3 sentences) explaining your confidence and choice for this specific field, especially if there are conflicting findings or if you are inferring from related data.
-        5.  Formulate a concise source citation string based on the provided source names and URLs that DIRECTLY support your suggestion for this field. If multiple sources support the same fact, list the primary ones.
+        logger.info(f"Sending synthesis prompt to LLM for person ID {person.id}, fields {fields} with {len(unique_findings)} raw findings.")
+        response_json = await ollama_service.generate_json(prompt, system=self.PROMPT_PREFIX)
+        if not response_json or "error" in response_json:
+            error_info = response_json.get('error') if response_json else 'No valid JSON response from LLM for synthesis'
+            logger.info(f"LLM synthesis for person ID {person.id} failed: {error_info}")
+            return 0
 
-        Respond ONLY with a single, valid JSON object with the following keys:
-        - "suggested_value": The most probable value for '{field_being_researched}' (string, formatted appropriately for the data type, e.g., dates as "DD MMM YYYY", places as "City, County, State, Country"). If suggesting a name for a parent, provide the full name.
-        - "confidence_score": Your confidence in this suggestion (integer, 0-100).
-        - "llm_reasoning": Your brief reasoning for this specific suggestion (string).
-        - "citation_text": A concise citation for the supporting source(s) for this specific suggestion (string).
+        created_count = 0
+        llm_findings = response_json.get("findings")
+        for field_result in llm_findings if isinstance(llm_findings, list) else []:
+            if not isinstance(field_result, dict):
+                continue
+            field_being_researched = field_result.get("field")
+            if field_being_researched not in fields:
+                logger.warning(f"LLM synthesis for person ID {person.id} returned an unrequested field '{field_being_researched}'. Ignoring it.")
+                continue
+            confidence_score = field_result.get("confidence_score", 0)
+            # The model may send null, a string or an out-of-range number; such a result is dropped, not the whole batch
+            if isinstance(confidence_score, bool) or not isinstance(confidence_score, (int, float)) or not 0 <= confidence_score <= 100:
+                logger.warning(f"LLM synthesis for person ID {person.id} returned an invalid confidence score {confidence_score!r} for '{field_being_researched}'. Ignoring it.")
+                continue
+            confidence_score = round(confidence_score)
+            if confidence_score < 30: # Confidence threshold for saving a finding
+                logger.debug("LLM synthesis for '{}' (person ID {}) did not yield a confident result.", field_being_researched, person.id)
+                continue
 
-        If no confident suggestion can be made for '{field_being_researched}' based on the provided findings, ensure "confidence_score" is low (e.g., below 30) or 0.
-        """
-        
-        logger.info(f"Sending synthesis prompt to LLM for person ID {person.id}, field '{field_being_researched}' with {len(raw_findings)} raw findings.")
-        response_json = await ollama_service.generate_json(prompt)
-        
-        if response_json and "error" not in response_json and response_json.get("confidence_score", 0) >= 30: # Confidence threshold for saving a finding
+            raw_findings = raw_findings_by_field[field_being_researched]
             original_value = getattr(person, field_being_researched, None) # Get current value if field exists
-            
+
             # Data for creating ResearchFinding record
             finding_create_data = schemas.ResearchFindingCreate(
                 person_id=person.id,
                 agent_task_id=self.task.id, # Link finding to the agent task
                 data_field=field_being_researched, # The field this finding is about
                 original_value=str(original_value) if original_value is not None else None,
-                suggested_value=response_json.get("suggested_value"),
-                confidence_score=response_json.get("confidence_score"),
-                llm_reasoning=response_json.get("llm_reasoning"),
+                suggested_value=field_result.get("suggested_value"),
+                confidence_score=confidence_score,
+                llm_reasoning=field_result.get("llm_reasoning"),
                 # Consolidate source names from the raw findings that contributed
                 source_name=", ".join(set(f.get('source_name', 'Unknown Source') for f in raw_findings if f.get('source_name'))),
                 # Try to get a relevant URL, could be more sophisticated
                 source_url=next((f.get('source_url') for f in raw_findings if f.get('source_url')), None),
-                citation_text=response_json.get("citation_text", "Citation not generated by LLM."),
+                citation_text=field_result.get("citation_text", "Citation not generated by LLM."),
             )
-            crud.create_research_finding(self.db, finding_in=finding_create_data)
-            logger.info(f"Created ResearchFinding for person ID {person.id}, field '{field_being_researched}' with confidence {finding_create_data.confidence_score}")
-        else:
-            error_info = response_json.get('error', 'Low confidence or no suggestion from LLM') if response_json else 'No valid JSON response from LLM for synthesis'
-            logger.info(f"LLM synthesis for '{field_being_researched}' (person ID {person.id}) did not yield a confident result or had an error: {error_info}")
+            self._pending_findings.append({**finding_create_data.model_dump(mode="json"), "status": models.FindingStatus.UNVERIFIED})
+            created_count += 1
+            logger.debug("Queued ResearchFinding for person ID {}, field '{}' with confidence {}", person.id, field_being_researched, finding_create_data.confidence_score)
+        return created_count
 
 
     async def execute(self) -> Dict[str, Any]:
@@ -161,49 +342,50 @@ class GenealogyResearchPlugin(FrankiePlugin):
         if not self.task.target_person_id:
             return {"status": models.TaskStatus.ERROR, "error_message": "No target person ID specified for genealogy research."}
             
-        self.person_to_research = crud.get_person_by_id(self.db, person_id=self.task.target_person_id)
+        # The session is sync, so every query in this coroutine runs in a worker thread to keep the event loop free
+        self.person_to_research = await asyncio.to_thread(crud.get_person_by_id, self.db, person_id=self.task.target_person_id)
         if not self.person_to_research:
             return {"status": models.TaskStatus.ERROR, "error_message": f"Target person with ID {self.task.target_person_id} not found in database."}
 
-        missing_info_fields = self._identify_missing_info_fields()
+        # Tool results are person-scoped, so every tool can start fetching (all concurrently) while the
+        # blocking missing-fields query runs in a worker thread; the tools don't touch the session.
+        person = self.person_to_research
+        known_data_str = self._format_known_data(person)
+        tool_findings_task = asyncio.create_task(self._collect_tool_findings(person))
+        try:
+            missing_info_fields = await asyncio.to_thread(self._identify_missing_info_fields)
+        except BaseException:
+            tool_findings_task.cancel()
+            raise
         if not missing_info_fields:
+            tool_findings_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await tool_findings_task
             logger.info(f"No missing information identified for person {self.person_to_research.id} to research.")
             return {"status": models.TaskStatus.APPLIED, "llm_explanation": "No missing information identified for this person to research. Task considered complete as no action was needed."}
         
         logger.info(f"Will research missing fields: {missing_info_fields} for person ID {self.person_to_research.id} ({self.person_to_research.first_name} {self.person_to_research.last_name})")
 
-        total_raw_findings_collected = 0
-        for field_to_research_currently in missing_info_fields:
-            all_raw_findings_for_this_field: List[Dict[str, Any]] = []
-            logger.info(f"--- Researching field: '{field_to_research_currently}' for person {self.person_to_research.id} ---")
-            
-            for tool_instance in self.tools:
-                logger.info(f"Using tool '{tool_instance.name}' to research '{field_to_research_currently}' for person {self.person_to_research.id}")
-                try:
-                    # The search_person method of the tool should ideally try to find info related to the person.
-                    # The LLM will then be asked to synthesize based on the field_to_research_currently.
-                    tool_raw_results: List[Dict[str, Any]] = await tool_instance.search_person(self.person_to_research)
-                    
-                    for finding_dict in tool_raw_results:
-                        finding_dict['source_name'] = tool_instance.name # Ensure source name is attached
-                        all_raw_findings_for_this_field.append(finding_dict)
-                    
-                    logger.info(f"Tool '{tool_instance.name}' returned {len(tool_raw_results)} raw items potentially related to person {self.person_to_research.id}.")
-                    total_raw_findings_collected += len(tool_raw_results)
-                except Exception as e:
-                    logger.error(f"Error using tool '{tool_instance.name}' for person {self.person_to_research.id}: {e}", exc_info=True)
-
-            if all_raw_findings_for_this_field:
-                logger.info(f"Synthesizing {len(all_raw_findings_for_this_field)} raw findings for field '{field_to_research_currently}' for person {self.person_to_research.id}.")
-                await self._synthesize_findings_with_llm(self.person_to_research, all_raw_findings_for_this_field, field_to_research_currently)
-            else:
-                logger.info(f"No raw findings gathered from any tool for field '{field_to_research_currently}' for person {self.person_to_research.id}.")
-        
-        # After iterating through all missing fields, count how many actual ResearchFinding records were created and are unverified
-        newly_created_unverified_findings = self.db.query(models.ResearchFinding).filter(
-            models.ResearchFinding.agent_task_id == self.task.id, # Filter by current task
-            models.ResearchFinding.status == models.FindingStatus.UNVERIFIED
-        ).count()
+        all_raw_findings = await tool_findings_task
+        # Duplicate facts only lengthen the synthesis prompt without adding evidence
+        deduped_findings = self._dedupe_findings(all_raw_findings)
+        if len(deduped_findings) < len(all_raw_findings):
+            logger.info(f"Dropped {len(all_raw_findings) - len(deduped_findings)} duplicate raw findings for person {person.id}.")
+        all_raw_findings = deduped_findings
+        newly_created_unverified_findings = 0
+
+        if all_raw_findings:
+            # One LLM call covers every field, so the shared context is only processed once
+            logger.info(f"Synthesizing {len(all_raw_findings)} raw findings for fields {missing_info_fields} for person {person.id}.")
+            newly_created_unverified_findings = await self._synthesize_findings_with_llm(
+                person, known_data_str, missing_info_fields,
+                {field: self._findings_for_field(all_raw_findings, field) for field in missing_info_fields}
+            )
+        else:
+            logger.info(f"No raw findings gathered from any tool for person {person.id}.")
+
+        if self._pending_findings:
+            await asyncio.to_thread(self._insert_pending_findings)
         
         end_time = time.time()
         duration = end_time - start_time
@@ -1,19 +1,163 @@
-import json
+import asyncio
+import functools
+import re
+import ijson
+import yaml
 from loguru import logger
 from sqlalchemy.orm import Session
-from typing import Dict, Any
+from pydantic import ValidationError
+from typing import Awaitable, Callable, Dict, Any, Final, List, Optional, Tuple
 
 from app.plugins.base_plugin import FrankiePlugin
-from app.db import models # For models and enums like TaskStatus
+from app.db import models, schemas, crud # For models and enums like TaskStatus
 from app.services.ollama_service import ollama_service
+from app.services.semantic_cache import SemanticCache
+from app.core.config import settings
 
-# Define phases for the Odyssey plugin's internal state machine
-_PHASE_PLANNING = "PLANNING"
-_PHASE_AWAITING_PLAN_REVIEW = "AWAITING_PLAN_REVIEW"
-_PHASE_EXECUTING_MILESTONE = "EXECUTING_MILESTONE"
-_PHASE_AWAITING_MILESTONE_REVIEW = "AWAITING_MILESTONE_REVIEW"
-_PHASE_FINALIZING = "FINALIZING"
-_PHASE_COMPLETED = "COMPLETED"
+# Phases of the Odyssey plugin's internal state machine (also used by the admin approval endpoint)
+ODYSSEY_PHASE_PLANNING = "PLANNING"
+ODYSSEY_PHASE_AWAITING_PLAN_REVIEW = "AWAITING_PLAN_REVIEW"
+ODYSSEY_PHASE_EXECUTING_MILESTONE = "EXECUTING_MILESTONE"
+ODYSSEY_PHASE_AWAITING_MILESTONE_REVIEW = "AWAITING_MILESTONE_REVIEW"
+ODYSSEY_PHASE_FINALIZING = "FINALIZING"
+ODYSSEY_PHASE_COMPLETED = "COMPLETED"
+# Phases in which the plugin waits for an admin decision and has nothing to execute
+ODYSSEY_AWAITING_PHASES = frozenset({ODYSSEY_PHASE_AWAITING_PLAN_REVIEW, ODYSSEY_PHASE_AWAITING_MILESTONE_REVIEW})
+# Phases after the final milestone was approved; the task is done and execute() leaves it as is
+ODYSSEY_FINISHED_PHASES = frozenset({ODYSSEY_PHASE_FINALIZING, ODYSSEY_PHASE_COMPLETED})
+
+# Invariant planning instructions; only the user's goal is appended per task.
+_PLANNING_PROMPT_PREFIX: Final[str] = """You are "Odyssey Planner," an advanced AI project planning assistant for the Frankie Agent.
+Your task is to take a high-level user goal and break it down into a sequence of actionable milestones and logical sub-steps.
+The user's goal is given at the end of this prompt.
+
+Consider these general capabilities (tools) the agent might use in later phases:
+- InternetSearch: For general web research.
+- WebScraper: For extracting specific data from web pages.
+- FileSystem: For creating/writing files (e.g., reports, code drafts) in a sandboxed workspace.
+- CodeGenerator: For generating code snippets or full files.
+- FrankieCodebaseReader: For understanding Frankie's internal structure if the goal is to create a new Frankie plugin.
+- LLMInternal: For reasoning, summarization, or text generation.
+
+Based on the user's goal, provide a comprehensive project plan. Your response MUST be a single, valid JSON object with the following keys:
+- "project_title": A concise title for this project.
+- "overall_summary": A brief summary of your understanding of the goal and your approach.
+- "clarifying_questions": An array of strings listing any critical questions for the administrator. If none, provide an empty array.
+- "milestones": An array of objects. Each milestone object must have "milestone_id" (e.g., "M1"), "name", "description", "estimated_sub_steps" (an array of strings), "potential_tools" (an array of strings), and "parallel_safe" (true only if none of its sub-steps needs the result of another).
+"""
+# Full planning prompt; the goal is the only placeholder and comes last so the prefix stays cacheable
+_PLANNING_META_PROMPT_TEMPLATE: Final[str] = _PLANNING_PROMPT_PREFIX + '\nThe user\'s goal is: "{user_goal}"\n'
+
+# Plans keyed by normalized user goal; near-duplicate goals hit via embedding similarity (see SemanticCache)
+_plan_cache = SemanticCache(namespace="odyssey_plan", similarity_threshold=settings.ODYSSEY_PLAN_CACHE_SIMILARITY_THRESHOLD)
+
+def _normalize_goal(user_goal: str) -> str:
+    """
+    Plan cache key for a goal: case and whitespace differences ("Build  a scraper" vs "build a scraper") still hit exactly.
+    casefold (not lower) also folds non-ASCII case variants, e.g. "STRASSE" and "straße".
+    """
+    return " ".join(user_goal.casefold().split())
+
+# Plan generations currently streaming, keyed by normalized goal. Tasks that reach PLANNING with the same
+# goal while one is running await that generation instead of sending their own (the cache can't help yet).
+_plans_in_flight: Dict[str, "asyncio.Future[Tuple[schemas.OdysseyPlan, List[str]]]"] = {}
+
+# Instructions for carrying out a single milestone sub-step; the step itself is sent as the prompt
+_SUB_STEP_SYSTEM_PROMPT: Final[str] = """You are "Odyssey Executor," carrying out one sub-step of an approved project plan for the Frankie Agent.
+Work through the sub-step using reasoning only and report what you produced.
+Your response MUST be a single, valid JSON object with the keys:
+- "outcome": The result of the sub-step (findings, drafted text, decisions, etc.).
+- "notes": Anything the administrator should check before the project continues. Use an empty string if none.
+"""
+
+# Markdown layout of the plan summary shown to the admin, filled with str.format_map.
+# Substituted values are not re-parsed, so braces in LLM-generated text are safe.
+_PLAN_SUMMARY_TEMPLATE: Final[str] = (
+    "## Proposed Plan: {project_title}\n\n"
+    "**Summary:**\n{overall_summary}\n\n"
+    "{clarifying_questions}"
+    "**Milestones:**\n{milestones}"
+    "Please review this plan. If you approve, I will begin with the first milestone."
+)
+_CLARIFYING_QUESTIONS_TEMPLATE: Final[str] = "**Clarifying Questions:**\n{questions}\n"
+_MILESTONE_SUMMARY_TEMPLATE: Final[str] = (
+    "  {position}. **{name}** (ID: {milestone_id})\n"
+    "     *Desc:* {description}\n"
+    "     *Key Sub-steps:* {sub_steps}\n"
+    "     *Potential Tools:* {tools}\n\n"
+)
+
+def _format_milestone_summary(position: int, milestone: schemas.OdysseyMilestone) -> str:
+    """One milestone's entry in the plan summary shown to the admin."""
+    return _MILESTONE_SUMMARY_TEMPLATE.format_map({
+        "position": position,
+        "name": milestone.name,
+        "milestone_id": milestone.milestone_id or f"M{position}",
+        "description": milestone.description,
+        "sub_steps": "; ".join(milestone.estimated_sub_steps) or "N/A",
+        "tools": ", ".join(milestone.potential_tools) or "N/A",
+    })
+
+def _format_plan_summary(plan: schemas.OdysseyPlan, milestone_summaries: List[str]) -> str:
+    """The full plan summary shown to the admin, from the milestones' already-rendered entries."""
+    clarifying_questions = ""
+    if plan.clarifying_questions:
+        clarifying_questions = _CLARIFYING_QUESTIONS_TEMPLATE.format_map({
+            "questions": "".join(f"- {q}\n" for q in plan.clarifying_questions),
+        })
+    return _PLAN_SUMMARY_TEMPLATE.format_map({
+        "project_title": plan.project_title,
+        "overall_summary": plan.overall_summary,
+        "clarifying_questions": clarifying_questions,
+        "milestones": "".join(milestone_summaries),
+    })
+
+@functools.lru_cache(maxsize=1)
+def _load_plan_templates() -> Tuple[Tuple[re.Pattern, Dict[str, Any]], ...]:
+    """
+    Reads the plan templates file once per process: a YAML list of {pattern, plan} entries, where `pattern`
+    is a regex matched against the goal and `plan` is a plan whose strings may use the pattern's named
+    groups and {goal} as placeholders. A missing file simply means no templates.
+    """
+    try:
+        with open(settings.ODYSSEY_PLAN_TEMPLATES_PATH, "r") as f:
+            entries = yaml.safe_load(f) or []
+    except FileNotFoundError:
+        return ()
+    except yaml.YAMLError as e:
+        logger.error(f"Error parsing Odyssey plan templates at {settings.ODYSSEY_PLAN_TEMPLATES_PATH}: {e}")
+        return ()
+    templates = []
+    for entry in entries:
+        try:
+            templates.append((re.compile(entry["pattern"], re.IGNORECASE), entry["plan"]))
+        except (KeyError, TypeError, re.error) as e:
+            logger.warning(f"Skipping invalid Odyssey plan template entry: {e}")
+    logger.info(f"Loaded {len(templates)} Odyssey plan templates.")
+    return tuple(templates)
+
+def _fill_plan_template(value: Any, slots: Dict[str, str]) -> Any:
+    """Copies a template plan, substituting slots into every string."""
+    if isinstance(value, str):
+        return value.format_map(slots)
+    if isinstance(value, list):
+        return [_fill_plan_template(item, slots) for item in value]
+    if isinstance(value, dict):
+        return {key: _fill_plan_template(item, slots) for key, item in value.items()}
+    return value
+
+def _match_plan_template(user_goal: str) -> Optional[Dict[str, Any]]:
+    """Returns the first template plan whose pattern matches the goal, filled in from the goal, or None."""
+    for pattern, template in _load_plan_templates():
+        match = pattern.search(user_goal)
+        if match is None:
+            continue
+        slots = {"goal": user_goal, **{name: value or "" for name, value in match.groupdict().items()}}
+        try:
+            return _fill_plan_template(template, slots)
+        except (KeyError, IndexError, ValueError) as e:
+            logger.warning(f"Odyssey plan template '{pattern.pattern}' could not be filled: {e}")
+    return None
 
 class OdysseyPlugin(FrankiePlugin):
     """
@@ -22,6 +166,8 @@ class OdysseyPlugin(FrankiePlugin):
     executing milestones, and pausing for admin review at key checkpoints.
     """
 
+    __slots__ = ("task_specific_data", "_mutations", "plan", "_phase_handlers")
+
     @staticmethod
     def get_id() -> str:
         return "odyssey_agent"
@@ -37,99 +183,245 @@ class OdysseyPlugin(FrankiePlugin):
     def __init__(self, db: Session, task: models.AgentTask):
         super().__init__(db, task)
         self.task_specific_data: Dict[str, Any] = {}
+        self._mutations: Dict[str, Any] = {} # Context keys changed during this execution
+        self.plan: Optional[schemas.OdysseyPlan] = None
+        # Phases that run work; EXECUTING_MILESTONE is entered after an admin approves a plan or a previous milestone
+        self._phase_handlers: Dict[str, Callable[[], Awaitable[Dict[str, Any]]]] = {
+            ODYSSEY_PHASE_PLANNING: self._phase_planning,
+            ODYSSEY_PHASE_EXECUTING_MILESTONE: self._phase_execute_milestone,
+        }
         self._load_task_context_data()
 
     def _load_task_context_data(self):
-        """Load and initialize ongoing task data from the AgentTask's JSON context field."""
-        if self.task.task_context_data:
+        """
+        Load and initialize ongoing task data: the phase state from task_context_data and the plan from task_plan_data.
+        A shallow copy is taken so the ORM's copy only changes through the returned mutations.
+        """
+        self.task_specific_data = dict(self.task.task_context_data or {})
+        if "current_phase" not in self.task_specific_data:
+            self._set_context(current_phase=ODYSSEY_PHASE_PLANNING)
+        # Tasks planned before the plan had its own column still carry it inside the context
+        stored_plan = self.task.task_plan_data or self.task_specific_data.get("plan")
+        if stored_plan:
             try:
-                self.task_specific_data = json.loads(self.task.task_context_data)
-                if "current_phase" not in self.task_specific_data:
-                    self.task_specific_data["current_phase"] = _PHASE_PLANNING
-            except json.JSONDecodeError:
-                self.task_specific_data = {"current_phase": _PHASE_PLANNING}
-        else:
-            self.task_specific_data = {"current_phase": _PHASE_PLANNING}
+                self.plan = schemas.OdysseyPlan.model_validate(stored_plan)
+            except ValidationError as e:
+                logger.warning(f"OdysseyPlugin Task {self.task.id} has a stored plan that does not match the plan schema: {e}")
         logger.info(f"OdysseyPlugin Task {self.task.id} loaded with internal phase: {self.task_specific_data['current_phase']}")
 
-    def _get_serialized_task_context_data(self) -> str:
-        """Serializes the internal task data to a JSON string for database storage."""
-        return json.dumps(self.task_specific_data)
+    def _set_context(self, **fields: Any):
+        """
+        Updates task_specific_data and records the change for the orchestrator to persist.
+        Keys whose value is unchanged are skipped, so they are never re-encoded or rewritten.
+        """
+        for key, value in fields.items():
+            if key in self.task_specific_data and self.task_specific_data[key] == value:
+                continue
+            self.task_specific_data[key] = value
+            self._mutations[key] = value
+
+    async def _stream_plan(self, planning_meta_prompt: str) -> Tuple[schemas.OdysseyPlan, List[str]]:
+        """
+        Streams the plan from the LLM and validates each `milestones[i]` object as soon as it is complete,
+        rendering its summary entry while the rest of the plan is still being generated.
+
+        Returns:
+            The validated plan and its milestones' rendered summary entries.
+        Raises:
+            ValueError: If generation fails or the output does not match OdysseyPlan.
+        """
+        raw_chunks: List[str] = []
+        completed_items = ijson.sendable_list()
+        parser = ijson.items_coro(completed_items, "milestones.item")
+        milestone_summaries: List[str] = []
+        try:
+            async for chunk in ollama_service.generate_json_stream(planning_meta_prompt):
+                raw_chunks.append(chunk)
+                parser.send(chunk.encode("utf-8"))
+                for item in completed_items:
+                    milestone = schemas.OdysseyMilestone.model_validate(item) # ValidationError is a ValueError
+                    milestone_summaries.append(_format_milestone_summary(len(milestone_summaries) + 1, milestone))
+                del completed_items[:]
+            parser.close()
+        except ijson.JSONError as e:
+            raise ValueError(f"the AI model returned a response that is not valid JSON: {e}")
+        # One typed decode of the whole response replaces json parsing plus ad-hoc isinstance checks
+        return schemas.OdysseyPlan.model_validate_json("".join(raw_chunks)), milestone_summaries
+
+    def _reuse_plan(self, stored_plan: Optional[Dict[str, Any]], source: str) -> Optional[schemas.OdysseyPlan]:
+        """Validates a previously stored plan for reuse; returns None if there is none or it no longer matches the schema."""
+        if stored_plan is None:
+            return None
+        try:
+            plan = schemas.OdysseyPlan.model_validate(stored_plan)
+        except ValidationError:
+            logger.warning(f"Task {self.task.id} [OdysseyPlugin]: Ignoring {source}, which no longer matches the plan schema.")
+            return None
+        logger.info(f"Task {self.task.id} [OdysseyPlugin]: Reusing {source}. Skipping LLM call.")
+        return plan
 
     async def _phase_planning(self) -> Dict[str, Any]:
         """
         The first phase: Takes the user's high-level goal and uses an LLM to generate a plan.
         """
         logger.info(f"Task {self.task.id} [OdysseyPlugin]: Entering PLANNING phase.")
+        self.task.status = models.TaskStatus.PLANNING # Update main status for UI feedback
         user_goal = self.task.prompt
 
-        planning_meta_prompt = f"""
-        You are "Odyssey Planner," an advanced AI project planning assistant for the Frankie Agent.
-        Your task is to take a high-level user goal and break it down into a sequence of actionable milestones and logical sub-steps.
-        The user's goal is: "{user_goal}"
-
-        Consider these general capabilities (tools) the agent might use in later phases:
-        - InternetSearch: For general web research.
-        - WebScraper: For extracting specific data from web pages.
-        - FileSystem: For creating/writing files (e.g., reports, code drafts) in a sandboxed workspace.
-        - CodeGenerator: For generating code snippets or full files.
-        - FrankieCodebaseReader: For understanding Frankie's internal structure if the goal is to create a new Frankie plugin.
-        - LLMInternal: For reasoning, summarization, or text generation.
-
-        Based on the user's goal, provide a comprehensive project plan. Your response MUST be a single, valid JSON object with the following keys:
-        - "project_title": A concise title for this project.
-        - "overall_summary": A brief summary of your understanding of the goal and your approach.
-        - "clarifying_questions": An array of strings listing any critical questions for the administrator. If none, provide an empty array.
-        - "milestones": An array of objects. Each milestone object must have "milestone_id" (e.g., "M1"), "name", "description", "estimated_sub_steps" (an array of strings), and "potential_tools" (an array of strings).
-        """
-        
-        llm_response = await ollama_service.generate_json(planning_meta_prompt)
+        # The plan of an earlier completed task with the identical prompt is preferred (an admin approved it),
+        # then a configured template for this kind of goal; otherwise one generated for the same or a
+        # sufficiently similar goal is reused instead of re-planning.
+        # The instructions are the plan cache's scope, so editing them invalidates previously cached plans.
+        plan: Optional[schemas.OdysseyPlan] = None
+        if settings.ODYSSEY_REUSE_APPROVED_PLANS and self.task.prompt_hash:
+            approved_plan = await asyncio.to_thread(
+                crud.get_latest_applied_task_plan, self.db,
+                plugin_id=self.get_id(), prompt_hash=self.task.prompt_hash, exclude_task_id=self.task.id
+            )
+            plan = self._reuse_plan(approved_plan, "the plan of an earlier completed task with the same prompt")
+        if plan is None:
+            plan = self._reuse_plan(_match_plan_template(user_goal), "a plan template matching the goal")
+        if plan is None:
+            cached_plan = await asyncio.to_thread(_plan_cache.lookup, self.db, scope=_PLANNING_PROMPT_PREFIX, prompt_text=_normalize_goal(user_goal))
+            plan = self._reuse_plan(cached_plan, "a cached plan for a similar goal")
+        if plan is not None:
+            milestone_summaries = [_format_milestone_summary(i + 1, m) for i, m in enumerate(plan.milestones)]
+        else:
+            goal_key = _normalize_goal(user_goal)
+            in_flight = _plans_in_flight.get(goal_key)
+            joined_in_flight = in_flight is not None
+            if in_flight is None:
+                planning_meta_prompt = _PLANNING_META_PROMPT_TEMPLATE.format(user_goal=user_goal)
+                in_flight = asyncio.ensure_future(self._stream_plan(planning_meta_prompt))
+                _plans_in_flight[goal_key] = in_flight
+                in_flight.add_done_callback(lambda _: _plans_in_flight.pop(goal_key, None))
+            else:
+                logger.info(f"Task {self.task.id} [OdysseyPlugin]: A plan for the same goal is already being generated. Waiting for it.")
 
-        if "error" in llm_response or not isinstance(llm_response.get("milestones"), list):
-            error_msg = f"LLM error during planning phase or malformed plan received: {llm_response.get('error', 'Malformed plan structure.')}"
-            return {"status": models.TaskStatus.ERROR, "error_message": error_msg}
+            try:
+                # shield: one waiting task being cancelled must not cancel the generation the others await
+                plan, milestone_summaries = await asyncio.shield(in_flight)
+            except ValueError as e:
+                return {"status": models.TaskStatus.ERROR, "error_message": f"LLM error during planning phase or malformed plan received: {e}"}
+            if joined_in_flight:
+                plan = plan.model_copy(deep=True) # Each task edits and stores its own copy of the plan
+            else:
+                await asyncio.to_thread(_plan_cache.store, self.db, scope=_PLANNING_PROMPT_PREFIX, prompt_text=goal_key, response=plan.model_dump())
 
-        self.task_specific_data["plan"] = llm_response
-        self.task_specific_data["current_milestone_index"] = -1
-        self.task_specific_data["current_phase"] = _PHASE_AWAITING_PLAN_REVIEW
+        # Each milestone's tool is fixed now, while the plan is still being written, so every execution
+        # (and a re-run after review) uses the same one without choosing again
+        for milestone in plan.milestones:
+            if milestone.selected_tool is None and milestone.potential_tools:
+                milestone.selected_tool = milestone.potential_tools[0]
+
+        self.plan = plan
+        # Only the small phase state goes into the context; the plan is written once to its own column below
+        self._set_context(
+            current_milestone_index=-1,
+            current_phase=ODYSSEY_PHASE_AWAITING_PLAN_REVIEW,
+        )
         
-        plan_summary_for_admin = f"## Proposed Plan: {llm_response.get('project_title', 'New Project')}\n\n**Summary:**\n{llm_response.get('overall_summary', 'N/A')}\n\n"
-        if llm_response.get('clarifying_questions'):
-            plan_summary_for_admin += "**Clarifying Questions:**\n" + "\n".join([f"- {q}" for q in llm_response['clarifying_questions']]) + "\n\n"
-        plan_summary_for_admin += "**Milestones:**\n"
-        for i, milestone in enumerate(llm_response.get('milestones', [])):
-            plan_summary_for_admin += f"  {i+1}. **{milestone.get('name', 'N/A')}**\n     *Desc:* {milestone.get('description', 'N/A')}\n\n"
-        plan_summary_for_admin += "Please review this plan. If you approve, I will begin with the first milestone."
+        plan_summary_for_admin = _format_plan_summary(plan, milestone_summaries)
         
         logger.info(f"Task {self.task.id} [OdysseyPlugin]: Plan generated, ready for admin review.")
         return {
             "status": models.TaskStatus.AWAITING_REVIEW,
             "llm_explanation": plan_summary_for_admin,
-            "task_context_data": self._get_serialized_task_context_data()
+            "task_plan_data": plan.model_dump(),
+            "task_context_mutations": self._mutations
         }
 
+    async def _run_sub_step(self, milestone: schemas.OdysseyMilestone, sub_step: str, slots: asyncio.Semaphore) -> Dict[str, Any]:
+        """
+        Carries out one sub-step of a milestone with the LLM (the LLMInternal capability).
+        Raises:
+            ValueError: If generation fails.
+        """
+        prompt = (
+            f"Project: {self.plan.project_title}\n"
+            f"Milestone: {milestone.name} - {milestone.description}\n"
+            f"Sub-step to carry out now: {sub_step}\n"
+        )
+        if milestone.selected_tool:
+            prompt += f"Approach it as the planned tool '{milestone.selected_tool}' would.\n"
+        async with slots:
+            result = await ollama_service.generate_json(prompt, system=_SUB_STEP_SYSTEM_PROMPT)
+        if "error" in result:
+            raise ValueError(result["error"])
+        return result
+
     async def _phase_execute_milestone(self) -> Dict[str, Any]:
-        """Placeholder for executing an approved milestone. This is the next major implementation step."""
-        logger.warning(f"Task {self.task.id} [OdysseyPlugin]: Attempted to run milestone execution, which is not yet implemented.")
-        return {"status": models.TaskStatus.ERROR, "error_message": "Milestone execution phase not yet implemented."}
+        """
+        Executes the current milestone's sub-steps, then pauses for the admin to review the outcome.
+        Sub-steps of a milestone the planner marked parallel_safe run concurrently (bounded by
+        ODYSSEY_MAX_PARALLEL_SUB_STEPS); otherwise they run in order, since a step may build on the previous one.
+        """
+        milestone_index = self.task_specific_data.get("current_milestone_index", -1)
+        if self.plan is None or not 0 <= milestone_index < len(self.plan.milestones):
+            return {"status": models.TaskStatus.ERROR, "error_message": f"No approved plan milestone at index {milestone_index}."}
+        milestone = self.plan.milestones[milestone_index]
+        milestone_label = milestone.milestone_id or f"M{milestone_index + 1}"
+        logger.info(f"Task {self.task.id} [OdysseyPlugin]: Executing milestone {milestone_label} ('{milestone.name}') with {len(milestone.estimated_sub_steps)} sub-steps (parallel: {milestone.parallel_safe}).")
+
+        sub_steps = milestone.estimated_sub_steps or [milestone.description]
+        slots = asyncio.Semaphore(max(1, settings.ODYSSEY_MAX_PARALLEL_SUB_STEPS))
+        if milestone.parallel_safe:
+            outcomes: List[Any] = await asyncio.gather(
+                *(self._run_sub_step(milestone, step, slots) for step in sub_steps), return_exceptions=True
+            )
+        else:
+            outcomes = []
+            for step in sub_steps:
+                try:
+                    outcomes.append(await self._run_sub_step(milestone, step, slots))
+                except ValueError as e:
+                    outcomes.append(e)
+
+        # Consolidate in plan order, whatever order the sub-steps finished in
+        failed_steps = 0
+        summary_parts = [f"## Milestone {milestone_label}: {milestone.name}\n\n"]
+        for position, (step, outcome) in enumerate(zip(sub_steps, outcomes), start=1):
+            summary_parts.append(f"**{position}. {step}**\n")
+            if isinstance(outcome, BaseException):
+                failed_steps += 1
+                logger.warning(f"Task {self.task.id} [OdysseyPlugin]: Sub-step {position} of milestone {milestone_label} failed: {outcome}")
+                summary_parts.append(f"*Failed:* {outcome}\n\n")
+                continue
+            summary_parts.append(f"{outcome.get('outcome', 'N/A')}\n")
+            if outcome.get("notes"):
+                summary_parts.append(f"*Notes:* {outcome['notes']}\n")
+            summary_parts.append("\n")
+
+        if failed_steps == len(sub_steps):
+            return {"status": models.TaskStatus.ERROR, "error_message": f"All sub-steps of milestone {milestone_label} failed."}
+
+        is_last_milestone = milestone_index == len(self.plan.milestones) - 1
+        summary_parts.append("Please review this milestone. If you approve, I will " + ("complete the project." if is_last_milestone else "continue with the next milestone."))
+        self._set_context(current_phase=ODYSSEY_PHASE_AWAITING_MILESTONE_REVIEW)
+        logger.info(f"Task {self.task.id} [OdysseyPlugin]: Milestone {milestone_label} executed ({failed_steps} failed sub-steps), ready for admin review.")
+        return {
+            "status": models.TaskStatus.AWAITING_REVIEW,
+            "llm_explanation": "".join(summary_parts),
+            "task_context_mutations": self._mutations
+        }
 
     async def execute(self) -> Dict[str, Any]:
         """Main entry point. Acts as a state machine for the plugin's lifecycle."""
-        current_phase = self.task_specific_data.get("current_phase", _PHASE_PLANNING)
+        current_phase = self.task_specific_data.get("current_phase", ODYSSEY_PHASE_PLANNING)
         logger.info(f"Task {self.task.id} [OdysseyPlugin]: Execute called. Internal phase: '{current_phase}'")
 
-        if current_phase == _PHASE_PLANNING:
-            self.task.status = models.TaskStatus.PLANNING # Update main status for UI feedback
-            return await self._phase_planning()
-        
-        elif current_phase == _PHASE_EXECUTING_MILESTONE:
-            # This phase is entered after an admin approves a plan or a previous milestone.
-            return await self._phase_execute_milestone()
-            
-        elif current_phase in [_PHASE_AWAITING_PLAN_REVIEW, _PHASE_AWAITING_MILESTONE_REVIEW]:
+        handler = self._phase_handlers.get(current_phase)
+        if handler is not None:
+            return await handler()
+
+        if current_phase in ODYSSEY_AWAITING_PHASES:
              logger.info(f"Task {self.task.id} [OdysseyPlugin]: In phase '{current_phase}', awaiting admin action. No plugin execution needed.")
              return {} # Return empty dict; orchestrator will not update the task.
-        
+
+        if current_phase in ODYSSEY_FINISHED_PHASES:
+            logger.info(f"Task {self.task.id} [OdysseyPlugin]: In phase '{current_phase}', all milestones approved. Nothing left to execute.")
+            return {}
+
         # Default case for unexpected or unhandled phases
         logger.warning(f"Task {self.task.id} [OdysseyPlugin]: Reached execute with unhandled phase '{current_phase}'.")
         return {"status": models.TaskStatus.ERROR, "error_message": f"Unhandled plugin phase: {current_phase}"}
\ No newline at end of file
@@ -0,0 +1,26 @@
+// Long-lived Prettier worker used by CodeModifierPlugin (see _PrettierDaemon).
+// Started with the frontend directory as cwd so Prettier resolves from its node_modules.
+// Protocol: one JSON request per stdin line: {"filepath": "...", "code": "..."}
+//           one JSON reply per stdout line:  {"formatted": "..."} or {"error": "..."}
+const readline = require("readline");
+
+const prettier = require(require.resolve("prettier", { paths: [process.cwd()] }));
+
+const rl = readline.createInterface({ input: process.stdin, terminal: false });
+let queue = Promise.resolve(); // Requests are answered strictly in order
+
+rl.on("line", (line) => {
+  queue = queue.then(async () => {
+    let reply;
+    try {
+      const { filepath, code } = JSON.parse(line);
+      const options = (await prettier.resolveConfig(filepath)) || {};
+      reply = { formatted: await prettier.format(code, { ...options, filepath }) };
+    } catch (err) {
+      reply = { error: String((err && err.message) || err) };
+    }
+    process.stdout.write(JSON.stringify(reply) + "\n");
+  });
+});
+
+rl.on("close", () => process.exit(0));
@@ -1,130 +1,265 @@
+import io
+from itertools import islice
 from sqlalchemy.orm import Session
 from loguru import logger
-from io import StringIO
-from typing import Dict, List
-
-from gedcom.parser import Parser
-from gedcom.element.element import Element
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from app.db import models, crud
 
+# Rows per executemany INSERT: only this many row dicts exist at a time, whatever the size of the tree
+_INSERT_BATCH_SIZE = 1000
+
+def _iter_batches(rows: Iterable[Dict[str, Any]], size: int = _INSERT_BATCH_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """Groups a lazily generated stream of row dicts into lists of at most `size` rows."""
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def _iter_gedcom_lines(gedcom_stream: BinaryIO, encoding: str) -> Iterator[str]:
+    """
+    Decodes a binary GEDCOM stream one line at a time, dropping a leading byte-order mark.
+    Universal newlines (newline=None) split on LF, CRLF and the bare CR of old Mac files alike.
+    """
+    text_stream = io.TextIOWrapper(gedcom_stream, encoding=encoding, newline=None)
+    try:
+        for line_number, line in enumerate(text_stream):
+            yield line.lstrip("\ufeff") if line_number == 0 else line
+    finally:
+        text_stream.detach() # Leave the caller's stream open (the Latin-1 fallback re-reads it)
+
+
+def _tokenize_gedcom_line(line: str) -> Optional[Tuple[int, Optional[str], str, str]]:
+    """
+    Splits a GEDCOM line "level [@pointer@] TAG [value]" into its parts with str.partition,
+    or returns None for a blank line. Raises ValueError for a line without a numeric level.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    level_str, _, rest = line.partition(" ")
+    if not level_str.isdigit():
+        raise ValueError(f"Malformed GEDCOM line: {line[:80]!r}")
+    pointer = None
+    if rest.startswith("@"):
+        pointer, _, rest = rest.partition(" ")
+    tag, _, value = rest.partition(" ")
+    return int(level_str), pointer, tag.upper(), value
+
+
+class _GedcomColumns:
+    """
+    The INDI and FAM data of a GEDCOM file as parallel column lists (struct-of-arrays), one entry per record,
+    filled in a single pass over the tokens. Records of other types are skipped without storing anything.
+    """
+
+    __slots__ = (
+        "person_ids", "first_names", "last_names", "sexes",
+        "birth_dates", "birth_places", "death_dates", "death_places",
+        "family_ids", "husband_ptrs", "wife_ptrs", "child_links", "skipped_without_pointer",
+    )
+
+    def __init__(self):
+        self.person_ids: List[str] = []
+        self.first_names: List[Optional[str]] = []
+        self.last_names: List[Optional[str]] = []
+        self.sexes: List[Optional[str]] = []
+        self.birth_dates: List[Optional[str]] = []
+        self.birth_places: List[Optional[str]] = []
+        self.death_dates: List[Optional[str]] = []
+        self.death_places: List[Optional[str]] = []
+        self.family_ids: List[str] = []
+        self.husband_ptrs: List[Optional[str]] = []
+        self.wife_ptrs: List[Optional[str]] = []
+        self.child_links: List[Tuple[str, str]] = [] # (family gedcom_id, child pointer), one per CHIL line
+        self.skipped_without_pointer = 0
+
+    def _add_person(self, gedcom_id: str):
+        self.person_ids.append(gedcom_id)
+        for column in (self.first_names, self.last_names, self.sexes, self.birth_dates, self.birth_places, self.death_dates, self.death_places):
+            column.append(None)
+
+    def _add_family(self, gedcom_id: str):
+        self.family_ids.append(gedcom_id)
+        self.husband_ptrs.append(None)
+        self.wife_ptrs.append(None)
+
+
+def _collect_gedcom_columns(lines: Iterable[str]) -> _GedcomColumns:
+    """
+    Tokenizes GEDCOM lines with a small state machine that writes straight into the columns.
+    Per person, the first NAME ("Given /Surname/", or its GIVN/SURN sub-lines), SEX, BIRT and DEAT count.
+    """
+    columns = _GedcomColumns()
+    # Places and surnames repeat heavily within a tree; equal values share one string object in the columns
+    shared_strings: Dict[str, str] = {}
+    share = shared_strings.setdefault
+    record_tag: Optional[str] = None # "INDI"/"FAM" while inside a stored record
+    row = -1
+    context: Optional[str] = None    # Level-1 tag whose level-2 lines are being read (NAME, BIRT or DEAT)
+    seen_contexts: set = set()       # Level-1 tags already used for this person
+
+    for line in lines:
+        token = _tokenize_gedcom_line(line)
+        if token is None:
+            continue
+        level, pointer, tag, value = token
+
+        if level == 0:
+            record_tag, context = None, None
+            if tag in ("INDI", "FAM"):
+                if not pointer:
+                    columns.skipped_without_pointer += 1
+                elif tag == "INDI":
+                    record_tag, row = tag, len(columns.person_ids)
+                    seen_contexts = set()
+                    columns._add_person(pointer)
+                else:
+                    record_tag, row = tag, len(columns.family_ids)
+                    columns._add_family(pointer)
+            continue
+
+        if record_tag == "INDI":
+            if level == 1:
+                context = None
+                if tag in ("NAME", "BIRT", "DEAT") and tag not in seen_contexts:
+                    seen_contexts.add(tag)
+                    context = tag
+                    if tag == "NAME" and value:
+                        name_parts = value.split("/")
+                        columns.first_names[row] = name_parts[0].strip() or None
+                        surname = name_parts[1].strip() if len(name_parts) > 1 else ""
+                        columns.last_names[row] = share(surname, surname) if surname else None
+                elif tag == "SEX" and columns.sexes[row] is None:
+                    columns.sexes[row] = value.strip() or None
+            elif level == 2 and context is not None:
+                value = value.strip() or None
+                if context == "NAME":
+                    if tag == "GIVN" and value:
+                        columns.first_names[row] = value
+                    elif tag == "SURN" and value:
+                        columns.last_names[row] = share(value, value)
+                elif tag == "DATE":
+                    (columns.birth_dates if context == "BIRT" else columns.death_dates)[row] = value
+                elif tag == "PLAC":
+                    (columns.birth_places if context == "BIRT" else columns.death_places)[row] = share(value, value) if value else None
+        elif record_tag == "FAM" and level == 1:
+            if tag == "HUSB" and columns.husband_ptrs[row] is None:
+                columns.husband_ptrs[row] = value or None
+            elif tag == "WIFE" and columns.wife_ptrs[row] is None:
+                columns.wife_ptrs[row] = value or None
+            elif tag == "CHIL" and value:
+                columns.child_links.append((columns.family_ids[row], value))
+    return columns
+
+
 class GenealogyService:
     def __init__(self, db: Session):
         self.db = db
 
-    def parse_and_store_gedcom(self, file_content_str: str, file_name: str, owner_id: int) -> models.FamilyTree:
-        logger.info(f"Starting GEDCOM parsing for file: '{file_name}' by owner_id: {owner_id}")
-        
-        gedcom_lines = file_content_str.splitlines()
-        parser = Parser()
-        
+    def _parse_gedcom_stream(self, gedcom_stream: BinaryIO, file_name: str) -> _GedcomColumns:
+        """
+        Tokenizes a binary GEDCOM stream line by line into INDI/FAM columns
+        (never holding the whole file as one string plus a list of its lines).
+        Lines are decoded as UTF-8; files that aren't valid UTF-8 are re-read as Latin-1 (common for older GEDCOMs).
+        """
         try:
-            root_child_elements: List[Element] = parser.parse_lines(gedcom_lines)
+            try:
+                return _collect_gedcom_columns(_iter_gedcom_lines(gedcom_stream, "utf-8"))
+            except UnicodeDecodeError:
+                logger.info(f"'{file_name}' is not valid UTF-8. Re-parsing it as Latin-1.")
+                gedcom_stream.seek(0)
+                return _collect_gedcom_columns(_iter_gedcom_lines(gedcom_stream, "latin-1"))
         except Exception as e:
             logger.error(f"Error parsing GEDCOM lines for file '{file_name}': {e}", exc_info=True)
             raise ValueError(f"Could not parse GEDCOM file '{file_name}'. It might be malformed or not a valid GEDCOM file.")
 
-        if not root_child_elements:
-            logger.warning(f"GEDCOM file '{file_name}' appears to be empty or invalid after parsing (no root elements).")
-            raise ValueError(f"GEDCOM file '{file_name}' could not be parsed or yielded no data.")
-
-        db_tree = crud.create_family_tree(self.db, file_name=file_name, owner_id=owner_id)
-        
-        person_map: Dict[str, models.Person] = {} 
+    def parse_and_store_gedcom(self, gedcom_stream: BinaryIO, file_name: str, owner_id: int) -> models.FamilyTree:
+        logger.info(f"Starting GEDCOM parsing for file: '{file_name}' by owner_id: {owner_id}")
         
-        for element in root_child_elements:
-            if element.get_tag() == "INDI":
-                gedcom_id = element.get_pointer()
-                if not gedcom_id:
-                    logger.warning(f"Skipping INDI record without a pointer in '{file_name}'.")
-                    continue
-
-                name_parts = element.get_name()
-                
-                first_name = name_parts[0].strip() if name_parts and len(name_parts) > 0 and name_parts[0] else None
-                last_name = name_parts[1].strip() if name_parts and len(name_parts) > 1 and name_parts[1] else None
+        columns = self._parse_gedcom_stream(gedcom_stream, file_name)
+        if columns.skipped_without_pointer:
+            logger.warning(f"Skipped {columns.skipped_without_pointer} INDI/FAM records without a pointer in '{file_name}'.")
 
-                sex = element.get_gender() or "U"
-
-                birth_data = element.get_birth_data()
-                birth_date_str = birth_data[0].strip() if birth_data and birth_data[0] else None
-                birth_place_str = birth_data[1].strip() if birth_data and birth_data[1] else None
+        if not columns.person_ids and not columns.family_ids:
+            logger.warning(f"GEDCOM file '{file_name}' appears to be empty or invalid after parsing (no INDI or FAM records).")
+            raise ValueError(f"GEDCOM file '{file_name}' could not be parsed or yielded no data.")
 
-                death_data = element.get_death_data()
-                death_date_str = death_data[0].strip() if death_data and death_data[0] else None
-                death_place_str = death_data[1].strip() if death_data and death_data[1] else None
+        db_tree = crud.create_family_tree(self.db, file_name=file_name, user_id=owner_id)
 
-                person_data_for_model = {
+        # Nothing below should be flushed implicitly: the only writes are the explicit bulk inserts and commits,
+        # so the lookups between them never push half-built state (or trigger surprise queries) first.
+        with self.db.no_autoflush:
+            # Rows generated straight from the columns and inserted in batches; person ids are read back afterwards in a single query
+            persons_payload = (
+                {
                     "gedcom_id": gedcom_id,
                     "first_name": first_name,
                     "last_name": last_name,
-                    "sex": sex,
-                    "birth_date": birth_date_str,
-                    "birth_place": birth_place_str,
-                    "death_date": death_date_str,
-                    "death_place": death_place_str,
-                    "tree_id": db_tree.id
+                    "sex": sex or "U",
+                    "birth_date": birth_date,
+                    "birth_place": birth_place,
+                    "death_date": death_date,
+                    "death_place": death_place,
+                    "tree_id": db_tree.id,
                 }
-                
-                db_person = models.Person(**person_data_for_model)
-                self.db.add(db_person)
-                person_map[gedcom_id] = db_person
-        
-        try:
-            self.db.commit() 
-        except Exception as e:
-            self.db.rollback()
-            logger.error(f"Database error committing persons for tree '{file_name}': {e}", exc_info=True)
-            raise
-            
-        for person_obj in person_map.values():
-            self.db.refresh(person_obj)
-        logger.info(f"Created and committed {len(person_map)} person records for tree_id: {db_tree.id}.")
-
-        family_map: Dict[str, models.Family] = {}
-        for element in root_child_elements:
-            if element.get_tag() == "FAM":
-                gedcom_id = element.get_pointer()
-                if not gedcom_id:
-                    logger.warning(f"Skipping FAM record without a pointer in '{file_name}'.")
-                    continue
-
-                family_data_for_model = {
+                for gedcom_id, first_name, last_name, sex, birth_date, birth_place, death_date, death_place in zip(
+                    columns.person_ids, columns.first_names, columns.last_names, columns.sexes,
+                    columns.birth_dates, columns.birth_places, columns.death_dates, columns.death_places,
+                )
+            )
+
+            try:
+                # One executemany INSERT per batch instead of a flushed ORM object (and a refresh SELECT) per person
+                for batch in _iter_batches(persons_payload):
+                    self.db.bulk_insert_mappings(models.Person, batch)
+                self.db.commit()
+            except Exception as e:
+                self.db.rollback()
+                logger.error(f"Database error committing persons for tree '{file_name}': {e}", exc_info=True)
+                raise
+
+            # gedcom_id -> Person.id for the family pass
+            person_map: Dict[str, int] = dict(
+                self.db.query(models.Person.gedcom_id, models.Person.id).filter(models.Person.tree_id == db_tree.id).all()
+            )
+            logger.info(f"Created and committed {len(person_map)} person records for tree_id: {db_tree.id}.")
+
+            # Families are bulk-inserted like persons; the child links are written to the association table
+            # in batched statements once the family ids are known.
+            families_payload = (
+                {
                     "gedcom_id": gedcom_id,
-                    "tree_id": db_tree.id
+                    "tree_id": db_tree.id,
+                    "husband_id": person_map.get(husband_ptr) if husband_ptr else None,
+                    "wife_id": person_map.get(wife_ptr) if wife_ptr else None,
                 }
-                
-                husband_ptr = element.get_husband()
-                if husband_ptr and husband_ptr in person_map:
-                    family_data_for_model["husband_id"] = person_map[husband_ptr].id
-
-                wife_ptr = element.get_wife()
-                if wife_ptr and wife_ptr in person_map:
-                    family_data_for_model["wife_id"] = person_map[wife_ptr].id
-                
-                db_family = models.Family(**family_data_for_model)
-                self.db.add(db_family)
-                try:
-                    self.db.flush() 
-                except Exception as e:
-                    self.db.rollback()
-                    logger.error(f"Database error flushing family '{gedcom_id}' for tree '{file_name}': {e}", exc_info=True)
-                    continue
-
-                for child_element in element.get_child_elements():
-                    child_ptr = child_element.get_value()
-                    if child_ptr in person_map:
-                        db_family.children.append(person_map[child_ptr])
-                
-                family_map[gedcom_id] = db_family
-
-        logger.info(f"Processed {len(family_map)} FAM records for tree_id: {db_tree.id}. Committing families...")
-        try:
-            self.db.commit()
-        except Exception as e:
-            self.db.rollback()
-            logger.error(f"Database error committing families for tree '{file_name}': {e}", exc_info=True)
-            raise
+                for gedcom_id, husband_ptr, wife_ptr in zip(columns.family_ids, columns.husband_ptrs, columns.wife_ptrs)
+            )
+
+            logger.info(f"Processed {len(columns.family_ids)} FAM records for tree_id: {db_tree.id}. Committing families...")
+            try:
+                for batch in _iter_batches(families_payload):
+                    self.db.bulk_insert_mappings(models.Family, batch)
+                family_id_map: Dict[str, int] = dict(
+                    self.db.query(models.Family.gedcom_id, models.Family.id).filter(models.Family.tree_id == db_tree.id).all()
+                )
+                # dict.fromkeys drops repeated CHIL lines (the association table's key is family+person)
+                assoc_rows = (
+                    {"family_id": family_id, "person_id": person_id}
+                    for family_id, person_id in dict.fromkeys(
+                        (family_id_map[family_gedcom_id], person_map[child_ptr])
+                        for family_gedcom_id, child_ptr in columns.child_links
+                        if child_ptr in person_map
+                    )
+                )
+                for batch in _iter_batches(assoc_rows):
+                    self.db.execute(models.family_child_association.insert(), batch)
+                self.db.commit()
+            except Exception as e:
+                self.db.rollback()
+                logger.error(f"Database error committing families for tree '{file_name}': {e}", exc_info=True)
+                raise
 
         self.db.refresh(db_tree)
         logger.info(f"GEDCOM parsing and storage complete for file: '{file_name}', Tree ID: {db_tree.id}")
@@ -1,12 +1,102 @@
+import html
 import smtplib
 from email.message import EmailMessage
 import enum
-from typing import Optional
+from typing import Dict, NamedTuple, Optional
 from loguru import logger
 
 from app.core.config import settings # To get notification and SMTP settings
 from app.db.models import AgentTask, TaskStatus # Import enums for type checking
 
+
+class _KeepUnknownFields(dict):
+    """format_map mapping that leaves placeholders it has no value for in place, for filling later."""
+    def __missing__(self, key: str) -> str:
+        return "{" + key + "}"
+
+
+# Inline styles (and the app name) are substituted into the templates once, at import
+_EMAIL_STYLES = _KeepUnknownFields(
+    common_style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;",
+    p_style="margin: 10px 0;",
+    strong_style="font-weight: bold;",
+    link_style="color: #007bff; text-decoration: none;",
+    # Braces doubled so a "{" in the app name survives the second, per-task format_map
+    app_name=html.escape(settings.APP_NAME).replace("{", "{{").replace("}", "}}"),
+)
+
+def _bake_email_template(template: str) -> str:
+    """Fills in the style placeholders, leaving the per-task fields for str.format_map at send time."""
+    return template.format_map(_EMAIL_STYLES).strip()
+
+_EMAIL_HEADER = "<h2 style='color: #2c3e50; border-bottom: 1px solid #eee; padding-bottom: 10px;'>Frankie AI Agent Notification</h2>"
+_EMAIL_FOOTER = "<p style='{p_style} font-size: 0.9em; color: #777; margin-top: 20px; border-top: 1px solid #eee; padding-top: 10px;'>This is an automated notification from {app_name}.</p>"
+
+_AWAITING_REVIEW_TEMPLATE = _bake_email_template(f"""
+            <div style="{{common_style}}">
+                {_EMAIL_HEADER}
+                <p style="{{p_style}}">Hello Administrator,</p>
+                <p style="{{p_style}}">The agent task <strong style="{{strong_style}}">#{{task_id}}</strong> using plugin <strong style="{{strong_style}}">'{{plugin_id}}'</strong> has completed its processing and now <strong style="{{strong_style}}">requires your review and approval</strong>.</p>
+                <ul style="list-style-type: none; padding-left: 0;">
+                    <li style="{{p_style}}"><strong style="{{strong_style}}">Task ID:</strong> {{task_id}}</li>
+                    <li style="{{p_style}}"><strong style="{{strong_style}}">Plugin:</strong> {{plugin_id}}</li>
+                    <li style="{{p_style}}"><strong style="{{strong_style}}">Prompt:</strong> {{prompt}}</li>
+                    <li style="{{p_style}}"><strong style="{{strong_style}}">Test Status:</strong> {{test_status}}</li>
+                </ul>
+                <p style="{{p_style}}">Please log in to the admin panel to review the proposed changes:</p>
+                <p style="{{p_style}}"><a href="{{task_link}}" style="{{link_style}}">Review Task #{{task_id}}</a></p>
+                {_EMAIL_FOOTER}
+            </div>
+""")
+
+_APPLIED_TEMPLATE = _bake_email_template(f"""
+            <div style="{{common_style}}">
+                {_EMAIL_HEADER}
+                <p style="{{p_style}}">Hello Administrator,</p>
+                <p style="{{p_style}}">The changes for agent task <strong style="{{strong_style}}">#{{task_id}}</strong> (Plugin: <strong style="{{strong_style}}">'{{plugin_id}}'</strong>) have been approved and successfully applied.</p>
+                <ul style="list-style-type: none; padding-left: 0;">
+                    <li style="{{p_style}}"><strong style="{{strong_style}}">Task ID:</strong> {{task_id}}</li>
+                    <li style="{{p_style}}"><strong style="{{strong_style}}">Plugin:</strong> {{plugin_id}}</li>
+                    {{commit_hash_item}}
+                </ul>
+                <p style="{{p_style}}">The system has been updated. If this involved code changes, you might need to rebuild and restart application services.</p>
+                {_EMAIL_FOOTER}
+            </div>
+""")
+_COMMIT_HASH_ITEM_TEMPLATE = _bake_email_template(
+    '<li style="{p_style}"><strong style="{strong_style}">Commit Hash:</strong> {commit_hash}</li>'
+)
+
+_ERROR_TEMPLATE = _bake_email_template(f"""
+            <div style="{{common_style}}">
+                {_EMAIL_HEADER}
+                <p style="{{p_style}}">Hello Administrator,</p>
+                <p style="{{p_style}}">The agent task <strong style="{{strong_style}}">#{{task_id}}</strong> (Plugin: <strong style="{{strong_style}}">'{{plugin_id}}'</strong>) failed with an error during processing.</p>
+                 <ul style="list-style-type: none; padding-left: 0;">
+                    <li style="{{p_style}}"><strong style="{{strong_style}}">Task ID:</strong> {{task_id}}</li>
+                    <li style="{{p_style}}"><strong style="{{strong_style}}">Plugin:</strong> {{plugin_id}}</li>
+                    <li style="{{p_style}}"><strong style="{{strong_style}}">Prompt:</strong> {{prompt}}</li>
+                    <li style="{{p_style}}"><strong style="{{strong_style}}">Error Message:</strong> <pre style="background-color: #f8f8f8; border: 1px solid #ddd; padding: 10px; border-radius: 4px; white-space: pre-wrap;">{{error_message}}</pre></li>
+                </ul>
+                <p style="{{p_style}}">Please log in to the admin panel to review the task details and logs:</p>
+                <p style="{{p_style}}"><a href="{{task_link}}" style="{{link_style}}">Review Task #{{task_id}}</a></p>
+                {_EMAIL_FOOTER}
+            </div>
+""")
+
+
+class _StatusNotification(NamedTuple):
+    event: str   # Attribute of NotificationEvents that switches this notification on or off
+    subject: str
+    body: str
+
+# Task status value -> the notification sent when a task reaches it
+_STATUS_NOTIFICATIONS: Dict[str, _StatusNotification] = {
+    TaskStatus.AWAITING_REVIEW.value: _StatusNotification("awaits_review", "Task #{task_id} ({plugin_id}) Requires Review", _AWAITING_REVIEW_TEMPLATE),
+    TaskStatus.APPLIED.value: _StatusNotification("applied", "Task #{task_id} ({plugin_id}) Successfully Applied", _APPLIED_TEMPLATE),
+    TaskStatus.ERROR.value: _StatusNotification("error", "Task #{task_id} ({plugin_id}) Encountered an Error", _ERROR_TEMPLATE),
+}
+
 class NotificationService:
     def __init__(self):
         self.config = settings.notifications
@@ -63,88 +153,34 @@ class NotificationService:
             logger.error(f"Failed to send email notification: {e}", exc_info=True)
 
     def notify_task_status_change(self, task: AgentTask, base_app_url: Optional[str] = None):
-        """Send a notification about a task status change."""
-        if base_app_url is None:
-            base_app_url = settings.BASE_APP_URL
         """Checks config and sends a notification for a task status change with HTML content."""
         if not self.is_configured or not self.config.enabled:
             return
 
-        subject = ""
-        message_html_body = ""
-        should_send = False
-        
         # Ensure task status is a string for comparison if it's an Enum object
         current_task_status_str = task.status.value if isinstance(task.status, enum.Enum) else task.status
+        notification = _STATUS_NOTIFICATIONS.get(current_task_status_str)
+        # Statuses without a notification, or whose event is switched off, return before any template work
+        if notification is None or not getattr(self.config.notify_on, notification.event):
+            return
 
+        if base_app_url is None:
+            base_app_url = settings.BASE_APP_URL
         task_link = f"{base_app_url}/admin/agent/task/{task.id}" # Example link
+        test_status = task.test_status.value if isinstance(task.test_status, enum.Enum) else task.test_status
 
-        common_style = "font-family: Arial, sans-serif; line-height: 1.6; color: #333;"
-        p_style = "margin: 10px 0;"
-        strong_style = "font-weight: bold;"
-        link_style = "color: #007bff; text-decoration: none;"
-        
-        header_html = f"<h2 style='color: #2c3e50; border-bottom: 1px solid #eee; padding-bottom: 10px;'>Frankie AI Agent Notification</h2>"
-        footer_html = f"<p style='{p_style} font-size: 0.9em; color: #777; margin-top: 20px; border-top: 1px solid #eee; padding-top: 10px;'>This is an automated notification from {settings.APP_NAME}.</p>"
-
-        if current_task_status_str == TaskStatus.AWAITING_REVIEW.value and self.config.notify_on.awaits_review:
-            should_send = True
-            subject = f"Task #{task.id} ({task.plugin_id}) Requires Review"
-            message_html_body = f"""
-            <div style="{common_style}">
-                {header_html}
-                <p style="{p_style}">Hello Administrator,</p>
-                <p style="{p_style}">The agent task <strong style="{strong_style}">#{task.id}</strong> using plugin <strong style="{strong_style}">'{task.plugin_id}'</strong> has completed its processing and now <strong style="{strong_style}">requires your review and approval</strong>.</p>
-                <ul style="list-style-type: none; padding-left: 0;">
-                    <li style="{p_style}"><strong style="{strong_style}">Task ID:</strong> {task.id}</li>
-                    <li style="{p_style}"><strong style="{strong_style}">Plugin:</strong> {task.plugin_id}</li>
-                    <li style="{p_style}"><strong style="{strong_style}">Prompt:</strong> {task.prompt}</li>
-                    <li style="{p_style}"><strong style="{strong_style}">Test Status:</strong> {task.test_status.value if isinstance(task.test_status, enum.Enum) else task.test_status}</li>
-                </ul>
-                <p style="{p_style}">Please log in to the admin panel to review the proposed changes:</p>
-                <p style="{p_style}"><a href="{task_link}" style="{link_style}">Review Task #{task.id}</a></p>
-                {footer_html}
-            </div>
-            """
-        elif current_task_status_str == TaskStatus.APPLIED.value and self.config.notify_on.applied:
-            should_send = True
-            subject = f"Task #{task.id} ({task.plugin_id}) Successfully Applied"
-            message_html_body = f"""
-            <div style="{common_style}">
-                {header_html}
-                <p style="{p_style}">Hello Administrator,</p>
-                <p style="{p_style}">The changes for agent task <strong style="{strong_style}">#{task.id}</strong> (Plugin: <strong style="{strong_style}">'{task.plugin_id}'</strong>) have been approved and successfully applied.</p>
-                <ul style="list-style-type: none; padding-left: 0;">
-                    <li style="{p_style}"><strong style="{strong_style}">Task ID:</strong> {task.id}</li>
-                    <li style="{p_style}"><strong style="{strong_style}">Plugin:</strong> {task.plugin_id}</li>
-                    {f'<li style="{p_style}"><strong style="{strong_style}">Commit Hash:</strong> {task.commit_hash}</li>' if task.commit_hash else ""}
-                </ul>
-                <p style="{p_style}">The system has been updated. If this involved code changes, you might need to rebuild and restart application services.</p>
-                {footer_html}
-            </div>
-            """
-        elif current_task_status_str == TaskStatus.ERROR.value and self.config.notify_on.error:
-            should_send = True
-            subject = f"Task #{task.id} ({task.plugin_id}) Encountered an Error"
-            message_html_body = f"""
-            <div style="{common_style}">
-                {header_html}
-                <p style="{p_style}">Hello Administrator,</p>
-                <p style="{p_style}">The agent task <strong style="{strong_style}">#{task.id}</strong> (Plugin: <strong style="{strong_style}">'{task.plugin_id}'</strong>) failed with an error during processing.</p>
-                 <ul style="list-style-type: none; padding-left: 0;">
-                    <li style="{p_style}"><strong style="{strong_style}">Task ID:</strong> {task.id}</li>
-                    <li style="{p_style}"><strong style="{strong_style}">Plugin:</strong> {task.plugin_id}</li>
-                    <li style="{p_style}"><strong style="{strong_style}">Prompt:</strong> {task.prompt}</li>
-                    <li style="{p_style}"><strong style="{strong_style}">Error Message:</strong> <pre style="background-color: #f8f8f8; border: 1px solid #ddd; padding: 10px; border-radius: 4px; white-space: pre-wrap;">{task.error_message}</pre></li>
-                </ul>
-                <p style="{p_style}">Please log in to the admin panel to review the task details and logs:</p>
-                <p style="{p_style}"><a href="{task_link}" style="{link_style}">Review Task #{task.id}</a></p>
-                {footer_html}
-            </div>
-            """
-        
-        if should_send:
-            self._send_email(subject, message_html_body.strip())
+        # Prompts and error messages are free text, so every value is HTML-escaped before substitution
+        fields = {
+            "task_id": task.id,
+            "plugin_id": html.escape(str(task.plugin_id)),
+            "prompt": html.escape(str(task.prompt)),
+            "test_status": html.escape(str(test_status)),
+            "error_message": html.escape(str(task.error_message)),
+            "task_link": html.escape(task_link),
+            "commit_hash_item": _COMMIT_HASH_ITEM_TEMPLATE.format_map({"commit_hash": html.escape(task.commit_hash)}) if task.commit_hash else "",
+        }
+        subject = notification.subject.format(task_id=task.id, plugin_id=task.plugin_id)
+        self._send_email(subject, notification.body.format_map(fields))
 
 # Global instance for easy access, will be used by other services/endpoints
 notification_service = NotificationService()
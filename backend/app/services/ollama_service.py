@@ -1,10 +1,15 @@
+import asyncio
+import hashlib
 import httpx
-import json
+import orjson
 import socket
-from typing import List, Optional, Dict, Tuple, Any
+import time
+from typing import List, Optional, Dict, Tuple, Any, AsyncIterator
 from loguru import logger
 
 from app.core.config import settings, OllamaServer
+from app.db import crud
+from app.db.database import SessionLocal
 
 
 def _resolve_docker_host() -> str:
@@ -15,44 +20,125 @@ def _resolve_docker_host() -> str:
         logger.debug(f"Could not resolve host.docker.internal: {exc}")
         return "host.docker.internal"
 
+def _response_cache_key(prompt: str, system: Optional[str]) -> str:
+    """SHA-256 of the fully rendered request text; the model is stored alongside it."""
+    return hashlib.sha256(f"{system or ''}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+def _read_cached_response(key_hash: str, model: str) -> Optional[str]:
+    db = SessionLocal()
+    try:
+        entry = crud.get_llm_response_cache_entry(db, key_hash=key_hash, model=model)
+        return entry.response_json if entry else None
+    finally:
+        db.close()
+
+
+def _write_cached_response(key_hash: str, model: str, response_json: str) -> None:
+    db = SessionLocal()
+    try:
+        crud.upsert_llm_response_cache_entry(db, key_hash=key_hash, model=model, response_json=response_json)
+    finally:
+        db.close()
+
+
 class OllamaService:
     def __init__(self, servers: List[OllamaServer]):
         self.servers = {server.name: server for server in servers}
+        # One bound per server: concurrent tasks run in parallel up to the server's slots instead of
+        # all piling onto its GPU at once, which would only add head-of-line blocking. Created on first use
+        # in the running event loop (see _bind_event_loop), since the module-level instance is built at import.
+        self._generate_slots: Dict[str, asyncio.Semaphore] = {}
+        self._client: Optional[httpx.AsyncClient] = None # Shared connection pool, created on first use
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None # The client and slots belong to this loop
+        # (time.monotonic() of the fetch, models) from the last list_models that found any; see OLLAMA_MODELS_CACHE_TTL_SECONDS
+        self._models_cache: Optional[Tuple[float, List[Dict[str, str]]]] = None
+        # A burst of generate() calls on a cold cache fetches the lists once; per event loop, like the slots
+        self._models_cache_lock: Optional[asyncio.Lock] = None
         if not self.servers:
             logger.error("OLLAMA_SERVERS is not configured in the settings.")
             raise ValueError("OLLAMA_SERVERS configuration is missing.")
 
-    async def list_models(self) -> List[Dict[str, str]]:
-        """Fetches the list of available models from all configured Ollama servers."""
-        all_models = []
-        for server_name, server_config in self.servers.items():
-            try:
-                async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
-                    url_to_check = str(server_config.url)
-                    if "host.docker.internal" in url_to_check:
-                        url_to_check = url_to_check.replace(
-                            "host.docker.internal", _resolve_docker_host()
-                        )
-
-                    logger.info(f"Checking for models on Ollama server '{server_config.name}' at {url_to_check}")
-                    response = await client.get(f"{url_to_check.rstrip('/')}/api/tags")
-                    response.raise_for_status()
+    def _bind_event_loop(self) -> None:
+        """
+        Pooled connections and asyncio primitives can't cross event loops. When the running loop is not the one
+        they were made in (e.g. under TestClient, or asyncio.run in a worker), they are dropped and recreated lazily.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client_loop is not loop:
+            self._client_loop = loop
+            self._client = None
+            self._generate_slots = {}
+            self._models_cache_lock = asyncio.Lock()
 
-                    data = response.json()
-                    models_data = data.get("models", [])
+    def _get_generate_slot(self, server_name: str) -> asyncio.Semaphore:
+        """Returns the semaphore bounding concurrent generation requests to one server in the running loop."""
+        self._bind_event_loop()
+        slot = self._generate_slots.get(server_name)
+        if slot is None:
+            slot = self._generate_slots[server_name] = asyncio.Semaphore(max(1, settings.OLLAMA_MAX_CONCURRENT_REQUESTS))
+        return slot
 
-                    for model in models_data:
-                        all_models.append({
-                            "server_name": server_config.name,
-                            "model_name": model.get("name"),
-                        })
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        Returns the shared HTTP client. Reusing one pool keeps connections to each Ollama server alive
+        across requests instead of opening (and tearing down) a new one per call.
+        """
+        self._bind_event_loop()
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                # Generation may take minutes, but an unreachable server should fail fast
+                timeout=httpx.Timeout(180.0, connect=10.0),
+                follow_redirects=True,
+                limits=httpx.Limits(max_keepalive_connections=32),
+            )
+        return self._client
 
-                    logger.info(f"Found {len(models_data)} models on server '{server_config.name}'.")
+    async def aclose(self) -> None:
+        """Closes the shared HTTP client (called on application shutdown)."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
-            except Exception as e:
-                logger.error(f"An unexpected error occurred while fetching models from '{server_config.name}': {e}", exc_info=True)
+    async def _fetch_models(self, server_config: OllamaServer) -> List[Dict[str, str]]:
+        """Fetches the models of one Ollama server; a failing server yields an empty list so it can't sink the others."""
+        try:
+            url_to_check = str(server_config.url)
+            if "host.docker.internal" in url_to_check:
+                url_to_check = url_to_check.replace(
+                    "host.docker.internal", _resolve_docker_host()
+                )
+
+            logger.info(f"Checking for models on Ollama server '{server_config.name}' at {url_to_check}")
+            response = await self._get_client().get(f"{url_to_check.rstrip('/')}/api/tags", timeout=30.0)
+            response.raise_for_status()
 
-        return all_models
+            models_data = response.json().get("models", [])
+            logger.info(f"Found {len(models_data)} models on server '{server_config.name}'.")
+            return [{"server_name": server_config.name, "model_name": model.get("name")} for model in models_data]
+
+        except Exception as e:
+            logger.error(f"An unexpected error occurred while fetching models from '{server_config.name}': {e}", exc_info=True)
+            return []
+
+    async def list_models(self, use_cache: bool = True) -> List[Dict[str, str]]:
+        """
+        Fetches the list of available models from all configured Ollama servers.
+        The servers are queried concurrently, so this takes as long as the slowest one rather than the sum.
+        Within OLLAMA_MODELS_CACHE_TTL_SECONDS of the last fetch the previous result is returned instead.
+        """
+        self._bind_event_loop()
+        async with self._models_cache_lock:
+            cached = self._models_cache
+            if use_cache and cached and time.monotonic() - cached[0] < settings.OLLAMA_MODELS_CACHE_TTL_SECONDS:
+                return cached[1]
+
+            # gather keeps the servers' configured order, so "the first model found" stays deterministic
+            per_server = await asyncio.gather(*(self._fetch_models(server_config) for server_config in self.servers.values()))
+            all_models = [model for server_models in per_server for model in server_models]
+            # An empty result (e.g. every server down) isn't cached, so the next call tries again
+            self._models_cache = (time.monotonic(), all_models) if all_models else None
+            return all_models
 
     async def _get_target_server(self, model_identifier: str) -> Tuple[Optional[OllamaServer], str]:
         """
@@ -70,22 +156,31 @@ class OllamaService:
             model_name_to_find = model_identifier
 
         # Fallback: Find the model on any available server if not explicitly specified or nickname not found.
-        all_models_list = await self.list_models() # This uses the corrected list_models logic
-        for model_info in all_models_list:
-            if model_info['model_name'] == model_name_to_find:
-                server_name = model_info['server_name']
-                logger.info(f"Found model '{model_name_to_find}' on server '{server_name}' via search.")
-                return self.servers[server_name], model_name_to_find
+        # The cached lists are searched first; a miss re-fetches them once in case the model was pulled since.
+        for use_cache in (True, False):
+            all_models_list = await self.list_models(use_cache=use_cache)
+            for model_info in all_models_list:
+                if model_info['model_name'] == model_name_to_find:
+                    server_name = model_info['server_name']
+                    logger.info(f"Found model '{model_name_to_find}' on server '{server_name}' via search.")
+                    return self.servers[server_name], model_name_to_find
 
         # If the model is not found anywhere, we cannot proceed.
         logger.error(f"Could not find model '{model_name_to_find}' on any configured server.")
         return None, model_name_to_find
 
-    async def generate(self, prompt: str, model: Optional[str] = None) -> Dict[str, Any]:
-        """Sends a prompt to the appropriate Ollama server and gets a plain text response."""
-        if not model:
-            return {"error": "No model was selected for generation."}
+    async def _resolve_agent_model(self) -> Optional[str]:
+        """Returns the configured AGENT_MODEL, falling back to the first model found on any server."""
+        if settings.AGENT_MODEL:
+            return settings.AGENT_MODEL
+        all_models_list = await self.list_models()
+        if all_models_list:
+            first_model = all_models_list[0]
+            return f"{first_model['server_name']}/{first_model['model_name']}"
+        return None
 
+    async def _post_generate(self, prompt: str, model: str, system: Optional[str] = None, json_format: bool = False) -> Dict[str, Any]:
+        """Resolves the target server for `model` and performs a single non-streaming /api/generate call."""
         server_to_use, target_model = await self._get_target_server(model)
 
         if not server_to_use:
@@ -101,11 +196,17 @@ class OllamaService:
                 "host.docker.internal", _resolve_docker_host()
             )
 
-        payload = {"model": target_model, "prompt": prompt, "stream": False}
+        payload = {"model": target_model, "prompt": prompt, "stream": False, "keep_alive": settings.OLLAMA_KEEP_ALIVE}
+        if system:
+            # Sent separately so the static instructions form an identical prefix across
+            # requests, letting the server reuse its KV-cache for them.
+            payload["system"] = system
+        if json_format:
+            payload["format"] = "json"
 
         try:
-            async with httpx.AsyncClient(timeout=180.0, follow_redirects=True) as client:
-                response = await client.post(f"{url_str.rstrip('/')}/api/generate", json=payload)
+            async with self._get_generate_slot(server_to_use.name):
+                response = await self._get_client().post(f"{url_str.rstrip('/')}/api/generate", json=payload)
                 response.raise_for_status()
                 ollama_response = response.json()
 
@@ -121,5 +222,146 @@ class OllamaService:
             logger.error(f"An unexpected error occurred during model generation: {e}", exc_info=True)
             return {"error": "An unexpected error occurred while communicating with the AI model."}
 
+    async def warm_up_agent_model(self) -> None:
+        """
+        Loads the agent model into memory ahead of the first task. Ollama treats a generate request
+        with an empty prompt as a load-only call, so nothing is generated.
+        """
+        model = await self._resolve_agent_model()
+        if not model:
+            logger.info("No agent model configured or available; skipping Ollama warm-up.")
+            return
+        result = await self._post_generate("", model)
+        if "error" in result:
+            logger.warning(f"Ollama warm-up of agent model '{model}' failed: {result['error']}")
+        else:
+            logger.info(f"Agent model '{model}' loaded (keep_alive={settings.OLLAMA_KEEP_ALIVE}).")
+
+    async def generate(self, prompt: str, model: Optional[str] = None) -> Dict[str, Any]:
+        """Sends a prompt to the appropriate Ollama server and gets a plain text response."""
+        if not model:
+            return {"error": "No model was selected for generation."}
+
+        return await self._post_generate(prompt, model)
+
+    async def generate_json(self, prompt: str, system: Optional[str] = None, model: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Sends a prompt in Ollama's JSON mode and returns the parsed JSON object.
+        Used by agent plugins. On failure, returns a dict with an "error" key.
+        """
+        model = model or await self._resolve_agent_model()
+        if not model:
+            return {"error": "No model is configured or available for agent generation."}
+
+        # Byte-identical prompts to the same model reuse the stored response (cache errors only cost a miss)
+        cache_key = _response_cache_key(prompt, system) if settings.LLM_RESPONSE_CACHE_ENABLED else None
+        cached_json = await self._lookup_cached_response(cache_key, model)
+        if cached_json is not None:
+            return orjson.loads(cached_json)
+
+        result = await self._post_generate(prompt, model, system=system, json_format=True)
+        if "error" in result:
+            return result
+
+        try:
+            parsed_response = orjson.loads(result["response"])
+        except orjson.JSONDecodeError as e:
+            logger.error(f"Model '{result['model_used']}' returned invalid JSON: {e}")
+            return {"error": f"The AI model returned a response that is not valid JSON: {e}"}
+        if not isinstance(parsed_response, dict):
+            return {"error": "The AI model returned JSON that is not an object."}
+        await self._store_cached_response(cache_key, model, result["response"])
+        return parsed_response
+
+    async def _lookup_cached_response(self, cache_key: Optional[str], model: str) -> Optional[str]:
+        """The cached JSON text for this request, or None (also when caching is off or the lookup fails)."""
+        if not cache_key:
+            return None
+        try:
+            cached_json = await asyncio.to_thread(_read_cached_response, cache_key, model)
+        except Exception as e:
+            logger.warning(f"LLM response cache lookup failed: {e}")
+            return None
+        if cached_json is not None:
+            logger.info(f"LLM response cache hit for model '{model}' (key {cache_key[:12]}). Skipping generation.")
+        return cached_json
+
+    async def _store_cached_response(self, cache_key: Optional[str], model: str, response_json: str) -> None:
+        """Stores a JSON-object response; failures are logged and never raised."""
+        if not cache_key:
+            return
+        try:
+            await asyncio.to_thread(_write_cached_response, cache_key, model, response_json)
+        except Exception as e:
+            logger.warning(f"Could not store LLM response in cache: {e}")
+
+    async def generate_json_stream(self, prompt: str, system: Optional[str] = None, model: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Streaming counterpart of generate_json: yields the raw JSON text fragments as the model
+        produces them, so callers can parse incrementally. Raises ValueError on failure.
+        Shares generate_json's response cache: a hit is yielded as a single fragment, and a stream that
+        completes with a JSON object is stored.
+        """
+        model = model or await self._resolve_agent_model()
+        if not model:
+            raise ValueError("No model is configured or available for agent generation.")
+
+        cache_key = _response_cache_key(prompt, system) if settings.LLM_RESPONSE_CACHE_ENABLED else None
+        cached_json = await self._lookup_cached_response(cache_key, model)
+        if cached_json is not None:
+            yield cached_json
+            return
+
+        server_to_use, target_model = await self._get_target_server(model)
+        if not server_to_use:
+            raise ValueError(f"Could not find the specified model '{target_model}' on any configured Ollama server.")
+
+        logger.info(f"Streaming prompt to model '{target_model}' on server '{server_to_use.name}'.")
+
+        url_str = str(server_to_use.url)
+        if "host.docker.internal" in url_str:
+            url_str = url_str.replace(
+                "host.docker.internal", _resolve_docker_host()
+            )
+
+        payload = {"model": target_model, "prompt": prompt, "stream": True, "format": "json", "keep_alive": settings.OLLAMA_KEEP_ALIVE}
+        if system:
+            payload["system"] = system
+
+        fragments: List[str] = [] # Kept only to store the finished response in the cache
+        try:
+            async with self._get_generate_slot(server_to_use.name):
+                async with self._get_client().stream("POST", f"{url_str.rstrip('/')}/api/generate", json=payload) as response:
+                    response.raise_for_status()
+                    # Ollama streams NDJSON: one object per line carrying the next "response" fragment
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        chunk = orjson.loads(line)
+                        if chunk.get("error"):
+                            raise ValueError(f"Ollama server returned an error: {chunk['error']}")
+                        if chunk.get("response"):
+                            if cache_key:
+                                fragments.append(chunk["response"])
+                            yield chunk["response"]
+                        if chunk.get("done"):
+                            break
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Ollama server returned an error: {e.response.status_code}.")
+            raise ValueError(f"Ollama server returned an error: {e.response.status_code}.")
+        except httpx.HTTPError as e:
+            logger.error(f"HTTP error while streaming from the AI model: {e}", exc_info=True)
+            raise ValueError("An unexpected error occurred while communicating with the AI model.")
+
+        # Reached only when the caller consumed the whole stream; like generate_json, only JSON objects are cached
+        if cache_key:
+            response_json = "".join(fragments)
+            try:
+                is_object = isinstance(orjson.loads(response_json), dict)
+            except orjson.JSONDecodeError:
+                is_object = False
+            if is_object:
+                await self._store_cached_response(cache_key, model, response_json)
+
 # Initialize with settings
 ollama_service = OllamaService(servers=settings.OLLAMA_SERVERS)
@@ -34,7 +34,7 @@ class AgentOrchestrator:
         High-level orchestrator that finds the right plugin and executes the task.
         Updates the task record with results from the plugin.
         """
-        db_task = crud.get_agent_task(self.db, task_id=task_id)
+        db_task = crud.get_agent_task_for_execution(self.db, task_id=task_id)
         if not db_task:
             logger.error(f"Task {task_id} not found for execution.")
             return
@@ -55,6 +55,7 @@ class AgentOrchestrator:
             return
 
         # Set task status to ANALYZING before starting plugin execution
+        previous_status = db_task.status
         crud.update_agent_task(self.db, db_task=db_task, task_update_data={"status": models.TaskStatus.ANALYZING})
         
         plugin_execution_results = {} # To store what the plugin returns
@@ -66,6 +67,19 @@ class AgentOrchestrator:
             logger.error(f"Plugin execution failed catastrophically for task #{task_id} (Plugin: {db_task.plugin_id}): {e}", exc_info=True)
             plugin_execution_results = {"status": models.TaskStatus.ERROR, "error_message": f"Critical plugin execution error: {str(e)}"}
         
+        # An empty result means the plugin had nothing to do (e.g. Odyssey awaiting admin review):
+        # only undo the ANALYZING marker, without rewriting other columns or re-notifying.
+        if not plugin_execution_results:
+            crud.update_agent_task(self.db, db_task=db_task, task_update_data={"status": previous_status})
+            logger.info(f"Task #{task_id} (Plugin: {db_task.plugin_id}) had nothing to execute; status left at {previous_status.value}.")
+            return
+
+        # Plugins with structured state (e.g. Odyssey) return only the context keys they changed;
+        # these are patched in place so the rest of the stored context isn't rewritten.
+        context_mutations = plugin_execution_results.pop("task_context_mutations", None)
+        if context_mutations:
+            crud.patch_agent_task_context(self.db, db_task=db_task, fields=context_mutations)
+
         # Update the task with the results from the plugin
         crud.update_agent_task(self.db, db_task=db_task, task_update_data=plugin_execution_results)
         
@@ -109,9 +123,8 @@ class AgentOrchestrator:
 
             # Apply the patch. `git apply` can handle creating new files if the diff format is correct (e.g. from `git diff`).
             # --recount: Useful with whitespace issues.
-            # --inaccurate-eof: Handles patches that might not end with a newline.
             # --allow-empty: Allows applying a patch that results in no changes.
-            self.repo.git.apply(patch_file_path, '--recount', '--inaccurate-eof', '--allow-empty')
+            self.repo.git.apply(patch_file_path, '--recount', '--allow-empty')
             logger.info(f"Successfully applied patch for task {task.id} using temporary file: {patch_file_path}")
             
             # Check if the patch actually resulted in changes to be committed
@@ -0,0 +1,123 @@
+import hashlib
+import orjson
+from functools import lru_cache
+from typing import Any, Dict, Optional
+from loguru import logger
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.core.config import settings
+
+
+@lru_cache(maxsize=1)
+def _get_embedder():
+    """
+    Lazily loads the sentence-transformers model once per process.
+    sentence-transformers (and numpy) are optional: without them the cache
+    still works, but only for exact-match hits.
+    """
+    try:
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(settings.SEMANTIC_CACHE_EMBEDDING_MODEL)
+    except ImportError:
+        logger.info("sentence-transformers is not installed. Semantic cache will use exact-match lookups only.")
+    except Exception as e:
+        logger.warning(f"Could not load embedding model '{settings.SEMANTIC_CACHE_EMBEDDING_MODEL}': {e}. Using exact-match lookups only.")
+    return None
+
+
+def _hash(*parts: str) -> str:
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(part.encode("utf-8"))
+        hasher.update(b"\0") # Separator so ("ab", "c") and ("a", "bc") hash differently
+    return hasher.hexdigest()
+
+
+class SemanticCache:
+    """
+    Caches LLM JSON responses in the application database.
+
+    Each entry belongs to a `namespace` (one per caller) and a `scope`: a string that
+    must match exactly for an entry to be reused (e.g. the contents of the files the
+    prompt was built from). Within a scope, a prompt is first looked up by its SHA-256
+    key; on a miss, near-duplicate prompts are found by cosine similarity of their
+    embeddings against `similarity_threshold` (SEMANTIC_CACHE_SIMILARITY_THRESHOLD by default).
+    With `exact_match_only`, the similarity search is skipped (and no embeddings are computed), for callers
+    where a merely similar prompt may need a different answer.
+    """
+
+    def __init__(self, namespace: str, similarity_threshold: Optional[float] = None, exact_match_only: bool = False):
+        self.namespace = namespace
+        self.similarity_threshold = similarity_threshold
+        self.exact_match_only = exact_match_only
+
+    def _embed(self, text: str):
+        if self.exact_match_only:
+            return None
+        embedder = _get_embedder()
+        if embedder is None:
+            return None
+        # normalize_embeddings=True makes the dot product equal to cosine similarity
+        return embedder.encode([text], normalize_embeddings=True)[0].astype("float32")
+
+    def lookup(self, db: Session, scope: str, prompt_text: str) -> Optional[Dict[str, Any]]:
+        """Returns the cached response for this prompt/scope, or None on a miss."""
+        if not settings.SEMANTIC_CACHE_ENABLED:
+            return None
+
+        scope_hash = _hash(scope)
+        key_hash = _hash(scope, prompt_text)
+        exact_entry = db.query(models.SemanticCacheEntry).filter(
+            models.SemanticCacheEntry.namespace == self.namespace,
+            models.SemanticCacheEntry.key_hash == key_hash,
+        ).first()
+        if exact_entry:
+            logger.info(f"Semantic cache [{self.namespace}]: exact-match hit (entry {exact_entry.id}).")
+            return orjson.loads(exact_entry.response_json)
+
+        query_embedding = self._embed(prompt_text)
+        if query_embedding is None:
+            return None
+
+        import numpy as np # Available whenever sentence-transformers is
+        candidates = db.query(models.SemanticCacheEntry.id, models.SemanticCacheEntry.embedding).filter(
+            models.SemanticCacheEntry.namespace == self.namespace,
+            models.SemanticCacheEntry.scope_hash == scope_hash,
+            models.SemanticCacheEntry.embedding.isnot(None),
+        ).all()
+        if not candidates:
+            return None
+
+        matrix = np.stack([np.frombuffer(embedding, dtype=np.float32) for _, embedding in candidates])
+        similarities = matrix @ query_embedding
+        best_index = int(np.argmax(similarities))
+        best_similarity = float(similarities[best_index])
+        threshold = self.similarity_threshold if self.similarity_threshold is not None else settings.SEMANTIC_CACHE_SIMILARITY_THRESHOLD
+        if best_similarity < threshold:
+            return None
+
+        best_entry = db.get(models.SemanticCacheEntry, candidates[best_index][0])
+        logger.info(f"Semantic cache [{self.namespace}]: semantic hit (entry {best_entry.id}, similarity {best_similarity:.3f}).")
+        return orjson.loads(best_entry.response_json)
+
+    def store(self, db: Session, scope: str, prompt_text: str, response: Dict[str, Any]) -> None:
+        """Stores a successful LLM response. Failures are logged and never raised to the caller."""
+        if not settings.SEMANTIC_CACHE_ENABLED:
+            return
+        try:
+            key_hash = _hash(scope, prompt_text)
+            embedding = self._embed(prompt_text)
+            entry = db.query(models.SemanticCacheEntry).filter(
+                models.SemanticCacheEntry.namespace == self.namespace,
+                models.SemanticCacheEntry.key_hash == key_hash,
+            ).first() or models.SemanticCacheEntry(namespace=self.namespace, key_hash=key_hash)
+            entry.scope_hash = _hash(scope)
+            entry.prompt_text = prompt_text
+            entry.embedding = embedding.tobytes() if embedding is not None else None
+            entry.response_json = orjson.dumps(response).decode()
+            db.add(entry)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Semantic cache [{self.namespace}]: failed to store response: {e}", exc_info=True)
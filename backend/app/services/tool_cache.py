@@ -0,0 +1,59 @@
+import asyncio
+import hashlib
+import orjson
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+from loguru import logger
+
+from app.db import crud
+from app.db.database import SessionLocal
+
+
+def _tool_cache_key(tool: str, args: Dict[str, Any]) -> str:
+    """SHA-256 of the tool name and its arguments as canonical (key-sorted) JSON."""
+    return hashlib.sha256(tool.encode("utf-8") + b"\0" + orjson.dumps(args, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def _read_entry(key_hash: str) -> Optional[Any]:
+    db = SessionLocal()
+    try:
+        entry = crud.get_tool_result_cache_entry(db, key_hash=key_hash)
+        if entry is None:
+            return None
+        expires_at = entry.expires_at if entry.expires_at.tzinfo else entry.expires_at.replace(tzinfo=timezone.utc)
+        if expires_at <= datetime.now(timezone.utc):
+            return None
+        return orjson.loads(entry.result_json)
+    finally:
+        db.close()
+
+
+def _write_entry(key_hash: str, tool: str, result_json: str, expires_at: datetime) -> None:
+    db = SessionLocal()
+    try:
+        crud.upsert_tool_result_cache_entry(db, key_hash=key_hash, tool=tool, result_json=result_json, expires_at=expires_at)
+    finally:
+        db.close()
+
+
+async def get(tool: str, args: Dict[str, Any]) -> Optional[Any]:
+    """
+    Returns the cached result of calling `tool` with `args`, or None on a miss or expired entry.
+    Cache errors are logged and treated as a miss, so a tool call is never blocked by the cache.
+    """
+    try:
+        return await asyncio.to_thread(_read_entry, _tool_cache_key(tool, args))
+    except Exception as e:
+        logger.warning(f"Tool result cache lookup failed for '{tool}': {e}")
+        return None
+
+
+async def put(tool: str, args: Dict[str, Any], result: Any, ttl_seconds: int) -> None:
+    """Stores the result of calling `tool` with `args` for `ttl_seconds` (0 or less disables caching)."""
+    if ttl_seconds <= 0:
+        return
+    try:
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)
+        await asyncio.to_thread(_write_entry, _tool_cache_key(tool, args), tool, orjson.dumps(result).decode(), expires_at)
+    except Exception as e:
+        logger.warning(f"Could not store '{tool}' result in the tool result cache: {e}")
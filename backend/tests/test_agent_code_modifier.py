@@ -4,6 +4,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session as SQLAlchemySession
 from unittest.mock import patch, AsyncMock, MagicMock # For mocking async functions and objects
 import os
+import json
 import tempfile # For creating temporary files/directories if needed for tests
 import shutil # For cleaning up temp directories
 
@@ -87,14 +88,18 @@ def temp_codebase():
         
     # Initialize a Git repo in this temp codebase
     from git import Repo
-    Repo.init(base_dir)
+    repo = Repo.init(base_dir)
+    # Tests run in a worktree of HEAD, so the fixture files must be committed
+    repo.index.add(["backend/app/sample_service.py", "frontend/src/SampleComponent.jsx"])
+    repo.index.commit("Initial test codebase")
     
     yield base_dir # Provide the path to the test function
     
     shutil.rmtree(base_dir) # Cleanup
 
 # Using multiple patch decorators correctly
-@patch('app.plugins.code_modifier_plugin.ollama_service.generate_json', new_callable=AsyncMock)
+@patch('app.plugins.code_modifier_plugin.ollama_service.generate_json_stream')
+@patch('app.plugins.code_modifier_plugin.asyncio.create_subprocess_exec', new_callable=AsyncMock) # Mocks the pytest run
 @patch('app.plugins.code_modifier_plugin.subprocess.run') # Mocks subprocess.run called by plugin
 @patch('app.plugins.code_modifier_plugin.CODEBASE_PATH', new_callable=lambda: None) # Will be replaced by temp_codebase
 @patch('app.services.orchestration_service.CODEBASE_PATH', new_callable=lambda: None) # Also in orchestrator for git ops
@@ -102,7 +107,8 @@ def test_code_modifier_plugin_full_flow(
     mock_orchestrator_codebase_path, # Order of patch args is inner-most first
     mock_plugin_codebase_path,
     mock_subprocess_run,
-    mock_ollama_generate_json,
+    mock_create_subprocess_exec,
+    mock_ollama_generate_json_stream,
     admin_headers_agent,
     test_db_agent_session: SQLAlchemySession,
     temp_codebase # Use the temp codebase fixture
@@ -120,19 +126,22 @@ def test_code_modifier_plugin_full_flow(
          patch('app.services.orchestration_service.CODEBASE_PATH', temp_codebase):
 
         # --- Mock Setup ---
-        # Mock Ollama LLM response
-        mock_ollama_generate_json.return_value = {
+        # Mock Ollama LLM response, streamed back in small fragments like the real endpoint
+        llm_response_text = json.dumps({
             "explanation": "Refactored sample_service.py to include a new greeting.",
             "modifications": [{
                 "file_path": "backend/app/sample_service.py", # Path relative to temp_codebase
                 "new_code": "def new_greeting():\n    return 'Hello, Frankie Agent!'"
             }]
-        }
+        })
+        async def fake_stream(*args, **kwargs):
+            for i in range(0, len(llm_response_text), 16):
+                yield llm_response_text[i:i + 16]
+        mock_ollama_generate_json_stream.side_effect = fake_stream
 
-        # Mock subprocess.run for formatting (Prettier) and testing (pytest)
+        # Mock subprocess.run for formatting (Prettier, if a frontend file was targeted)
         def subprocess_side_effect_configured(*args, **kwargs):
             command_args = args[0]
-            # For Prettier (example, if a .js file was targeted)
             if "npx" in command_args and "prettier" in command_args:
                 # Simulate prettier modifying the temp file it was given
                 # The plugin writes to a temp file, then calls prettier on it.
@@ -142,15 +151,13 @@ def test_code_modifier_plugin_full_flow(
                 mock_res_format.stdout = "" # Prettier --write modifies in place
                 mock_res_format.stderr = ""
                 return mock_res_format
-            # For pytest
-            elif "pytest" in command_args:
-                mock_res_test = MagicMock()
-                mock_res_test.returncode = 0 # 0 for pass
-                mock_res_test.stdout = "=== 10 tests passed in 0.5s ==="
-                mock_res_test.stderr = ""
-                return mock_res_test
             # Fallback for any other subprocess call (shouldn't happen in this plugin's flow)
             return MagicMock(returncode=1, stderr="Mocked subprocess: Unknown command")
+        # Mock the asyncio subprocess that runs pytest
+        mock_pytest_process = MagicMock()
+        mock_pytest_process.returncode = 0 # 0 for pass
+        mock_pytest_process.communicate = AsyncMock(return_value=(b"=== 10 tests passed in 0.5s ===", b""))
+        mock_create_subprocess_exec.return_value = mock_pytest_process
         mock_subprocess_run.side_effect = subprocess_side_effect_configured
         
         # --- Test Execution ---
@@ -192,6 +199,66 @@ def test_code_modifier_plugin_full_flow(
         assert "10 tests passed" in task_result["test_results"]
 
         # Verify mocks were called as expected
-        mock_ollama_generate_json.assert_called_once()
-        # At least one call for pytest, maybe for prettier if it was triggered (depends on formatter logic)
-        assert mock_subprocess_run.call_count >= 1
\ No newline at end of file
+        mock_ollama_generate_json_stream.assert_called_once()
+        # pytest ran once as an asyncio subprocess
+        mock_create_subprocess_exec.assert_called_once()
+        assert "pytest" in mock_create_subprocess_exec.call_args.args
+
+def test_apply_diff_hunks_uses_context_when_line_numbers_are_off():
+    """LLM-proposed hunks are located by their context lines, not only their (often wrong) headers."""
+    from app.plugins.code_modifier_plugin import _apply_diff_hunks
+
+    original = "import os\n\ndef a():\n    return 1\n\ndef b():\n    return 2\n"
+    diff = "--- a/x.py\n+++ b/x.py\n@@ -1,3 +1,3 @@\n def b():\n-    return 2\n+    return 3\n"
+    assert _apply_diff_hunks(original, diff) == "import os\n\ndef a():\n    return 1\n\ndef b():\n    return 3\n"
+
+    with pytest.raises(ValueError):
+        _apply_diff_hunks(original, "@@ -1,1 +1,1 @@\n-def missing():\n+def found():\n")
+
+def test_streamed_llm_response_is_cached_per_system_prompt():
+    """
+    The code modifier streams with its static preamble as the system prompt; repeating that exact request is
+    answered from the LLM response cache as one fragment, while a different system prompt still goes to the server.
+    """
+    import asyncio
+    import httpx
+    from app.core.config import OllamaServer
+    from app.plugins.code_modifier_plugin import _STATIC_PREAMBLE
+    from app.services import ollama_service as ollama_module
+
+    server = OllamaServer(name="local", url="http://ollama.test")
+    ndjson_body = "\n".join(json.dumps(chunk) for chunk in (
+        {"response": '{"explanation": "ok",', "done": False},
+        {"response": ' "modifications": []}', "done": True},
+    ))
+    server_requests = []
+    def handler(request):
+        server_requests.append(request)
+        return httpx.Response(200, content=ndjson_body.encode("utf-8"))
+
+    stored_responses = {}
+    service = ollama_module.OllamaService(servers=[server])
+
+    async def collect(system):
+        return [fragment async for fragment in service.generate_json_stream("Refactor sample_service.py", system=system, model="local/llama3")]
+
+    async def run_requests():
+        mock_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with patch.object(service, "_get_client", return_value=mock_client), \
+             patch.object(service, "_get_target_server", AsyncMock(return_value=(server, "llama3"))):
+            first = await collect(_STATIC_PREAMBLE)
+            repeated = await collect(_STATIC_PREAMBLE)
+            other_system = await collect("A different preamble")
+        await mock_client.aclose()
+        return first, repeated, other_system
+
+    with patch.object(ollama_module, "_read_cached_response", side_effect=lambda key, model: stored_responses.get((key, model))), \
+         patch.object(ollama_module, "_write_cached_response", side_effect=lambda key, model, text: stored_responses.__setitem__((key, model), text)), \
+         patch.object(ollama_module.settings, "LLM_RESPONSE_CACHE_ENABLED", True):
+        first, repeated, other_system = asyncio.run(run_requests())
+
+    assert first == ['{"explanation": "ok",', ' "modifications": []}']
+    assert repeated == ["".join(first)] # Served whole from the cache
+    assert other_system == first
+    assert len(server_requests) == 2 # The repeat never reached the server
+    assert json.loads(repeated[0]) == {"explanation": "ok", "modifications": []}
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from unittest.mock import patch, AsyncMock
+
+from app.db.database import Base
+from app.db import models
+from app.services import ollama_service as ollama_module
+from app.services import tool_cache
+
+# Test DB for the persistent caches
+SQLALCHEMY_DATABASE_URL_CACHES = "sqlite:///./test_caches_db.db" # Unique name
+engine_caches = create_engine(
+    SQLALCHEMY_DATABASE_URL_CACHES, connect_args={"check_same_thread": False}
+)
+TestingSessionLocalCaches = sessionmaker(autocommit=False, autoflush=False, bind=engine_caches)
+
+@pytest.fixture(scope="function", autouse=True)
+def cache_db():
+    """Points the cache modules' own sessions at the test database."""
+    Base.metadata.create_all(bind=engine_caches)
+    with patch.object(ollama_module, "SessionLocal", TestingSessionLocalCaches), \
+         patch.object(tool_cache, "SessionLocal", TestingSessionLocalCaches), \
+         patch.object(ollama_module.settings, "LLM_RESPONSE_CACHE_ENABLED", True):
+        yield
+    Base.metadata.drop_all(bind=engine_caches)
+
+
+def _generate_result(response_text: str) -> dict:
+    return {"response": response_text, "model_used": "llama3 (local)"}
+
+
+def test_llm_response_cache_hit_skips_generation():
+    """A byte-identical prompt/system for the same model is answered from the cache."""
+    post_generate = AsyncMock(return_value=_generate_result('{"answer": 42}'))
+    with patch.object(ollama_module.ollama_service, "_post_generate", post_generate):
+        first = asyncio.run(ollama_module.ollama_service.generate_json("What is it?", system="Be brief.", model="local/llama3"))
+        repeated = asyncio.run(ollama_module.ollama_service.generate_json("What is it?", system="Be brief.", model="local/llama3"))
+
+    assert first == repeated == {"answer": 42}
+    post_generate.assert_awaited_once()
+
+
+def test_llm_response_cache_misses_on_different_system_prompt_or_model():
+    """The key covers the system prompt and the prompt; the model is matched separately."""
+    post_generate = AsyncMock(return_value=_generate_result('{"answer": 42}'))
+    with patch.object(ollama_module.ollama_service, "_post_generate", post_generate):
+        asyncio.run(ollama_module.ollama_service.generate_json("What is it?", system="Be brief.", model="local/llama3"))
+        asyncio.run(ollama_module.ollama_service.generate_json("What is it?", system="Be thorough.", model="local/llama3"))
+        asyncio.run(ollama_module.ollama_service.generate_json("What is it?", system="Be brief.", model="local/mistral"))
+
+    assert post_generate.await_count == 3
+    assert ollama_module._response_cache_key("a", "b") != ollama_module._response_cache_key("b", "a")
+
+
+def test_llm_response_cache_never_stores_invalid_responses():
+    """Responses that aren't a JSON object are returned as errors and not replayed from the cache."""
+    post_generate = AsyncMock(side_effect=[_generate_result("not json"), _generate_result("[1, 2]"), _generate_result('{"ok": true}')])
+    with patch.object(ollama_module.ollama_service, "_post_generate", post_generate):
+        results = [asyncio.run(ollama_module.ollama_service.generate_json("Q", model="local/llama3")) for _ in range(3)]
+
+    assert "error" in results[0] and "error" in results[1]
+    assert results[2] == {"ok": True}
+    assert post_generate.await_count == 3
+    db = TestingSessionLocalCaches()
+    try:
+        assert db.query(models.LLMResponseCacheEntry).count() == 1
+    finally:
+        db.close()
+
+
+def test_tool_cache_key_is_canonical_over_argument_order():
+    """Sorted-key JSON makes the argument order irrelevant; different tools or values get different keys."""
+    key = tool_cache._tool_cache_key("findagrave", {"first_name": "Ada", "last_name": "Lovelace", "birth_year": 1815})
+    assert key == tool_cache._tool_cache_key("findagrave", {"birth_year": 1815, "last_name": "Lovelace", "first_name": "Ada"})
+    assert key != tool_cache._tool_cache_key("familysearch", {"first_name": "Ada", "last_name": "Lovelace", "birth_year": 1815})
+    assert key != tool_cache._tool_cache_key("findagrave", {"first_name": "Ada", "last_name": "Lovelace", "birth_year": 1816})
+
+
+def test_tool_cache_put_then_get_round_trips_until_expiry():
+    """A stored result is returned for the same arguments in any order, and not once it has expired."""
+    result = [{"source": "findagrave", "data": {"death_year": 1852}}]
+    asyncio.run(tool_cache.put("findagrave", {"first_name": "Ada", "last_name": "Lovelace"}, result, ttl_seconds=3600))
+    assert asyncio.run(tool_cache.get("findagrave", {"last_name": "Lovelace", "first_name": "Ada"})) == result
+    assert asyncio.run(tool_cache.get("findagrave", {"first_name": "Ada", "last_name": "Byron"})) is None
+
+    expired_key = tool_cache._tool_cache_key("findagrave", {"first_name": "Charles", "last_name": "Babbage"})
+    tool_cache._write_entry(expired_key, "findagrave", json.dumps(result), datetime.now(timezone.utc) - timedelta(seconds=1))
+    assert asyncio.run(tool_cache.get("findagrave", {"first_name": "Charles", "last_name": "Babbage"})) is None
+
+
+def test_tool_cache_put_with_non_positive_ttl_stores_nothing():
+    asyncio.run(tool_cache.put("findagrave", {"first_name": "Ada"}, ["x"], ttl_seconds=0))
+    assert asyncio.run(tool_cache.get("findagrave", {"first_name": "Ada"})) is None
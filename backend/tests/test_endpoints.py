@@ -45,6 +45,12 @@ def test_read_root_endpoint():
     assert response.status_code == 200
     assert response.json() == {"message": f"Welcome to {settings.APP_NAME}! API is live."}
 
+def test_healthz_endpoint():
+    """Tests the lightweight liveness probe, which bypasses the API routers."""
+    response = client.get("/healthz")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
 def test_non_existent_api_route():
     """Tests that accessing a non-existent API route returns a 404 Not Found error."""
     response = client.get(f"{settings.API_V1_STR}/this-route-does-not-exist-at-all-123")
@@ -148,3 +148,95 @@ def test_get_family_tree_details(admin_user_headers_genealogy: Dict[str, str], t
     assert john_smith["last_name"] == "Smith"
     assert john_smith["birth_date"] == "1 JAN 1900"
     assert john_smith["birth_place"] == "New York City, New York, USA"
+
+def test_gedcom_columns_keep_only_indi_and_fam_records():
+    """Other level-0 records are dropped, and GIVN/SURN sub-lines fill in an empty NAME value."""
+    import io
+    from app.services.genealogy_service import _collect_gedcom_columns, _iter_gedcom_lines
+
+    gedcom_bytes = (
+        b"\xef\xbb\xbf0 HEAD\n1 CHAR UTF-8\n"
+        b"0 @N1@ NOTE A note that is not stored\n"
+        b"0 @I9@ INDI\n1 NAME\n2 GIVN Ada\n2 SURN Lovelace\n1 BIRT\n2 DATE 10 DEC 1815\n"
+        b"0 @F9@ FAM\n1 WIFE @I9@\n1 CHIL @I10@\n"
+        b"0 TRLR\n"
+    )
+    columns = _collect_gedcom_columns(_iter_gedcom_lines(io.BytesIO(gedcom_bytes), "utf-8"))
+
+    assert columns.person_ids == ["@I9@"]
+    assert (columns.first_names, columns.last_names) == (["Ada"], ["Lovelace"])
+    assert (columns.birth_dates, columns.birth_places) == (["10 DEC 1815"], [None])
+    assert columns.family_ids == ["@F9@"]
+    assert (columns.husband_ptrs, columns.wife_ptrs) == ([None], ["@I9@"])
+    assert columns.child_links == [("@F9@", "@I10@")]
+
+
+def test_gedcom_lines_split_on_bare_carriage_returns():
+    """Old Mac GEDCOMs end lines with CR only; they must not arrive as one line."""
+    import io
+    from app.services.genealogy_service import _collect_gedcom_columns, _iter_gedcom_lines
+
+    gedcom_stream = io.BytesIO(b"0 HEAD\r0 @I1@ INDI\r1 NAME John /Smith/\r1 SEX M\r0 TRLR\r")
+    columns = _collect_gedcom_columns(_iter_gedcom_lines(gedcom_stream, "utf-8"))
+
+    assert columns.person_ids == ["@I1@"]
+    assert (columns.first_names, columns.last_names, columns.sexes) == (["John"], ["Smith"], ["M"])
+    assert not gedcom_stream.closed # The caller's stream stays usable
+
+def test_cheap_confidence_estimate_branches():
+    """
+    The rule-based pre-check that decides whether a field's findings reach the LLM: name-token overlap,
+    halved for years far from the known ones (date fields) or no shared place token (place fields).
+    """
+    from types import SimpleNamespace
+    from app.plugins.genealogy_research_plugin import GenealogyResearchPlugin, CHEAP_CONFIDENCE_THRESHOLD
+
+    estimate = GenealogyResearchPlugin._cheap_confidence_estimate
+    person = SimpleNamespace(first_name="Ada", last_name="Lovelace", birth_date="10 DEC 1815", birth_place="London, England",
+                             death_date=None, death_place=None)
+
+    # Name overlap: the share of the person's name tokens found in the best finding
+    assert estimate("parents", [{"value": "Ada Lovelace, daughter of Lord Byron"}], person) == 1.0
+    assert estimate("parents", [{"value": "Ada Smith"}, {"citation": "unrelated record"}], person) == 0.5
+    assert estimate("parents", [{"value": "John Smith"}], person) < CHEAP_CONFIDENCE_THRESHOLD
+
+    # Date fields: halved only when every year in the finding is far from the known years
+    assert estimate("death_date", [{"value": "Ada Lovelace died 1852"}], person) == 0.5
+    assert estimate("death_date", [{"value": "Ada Lovelace baptised 1817"}], person) == 1.0
+    assert estimate("death_date", [{"value": "Ada Lovelace, date unknown"}], person) == 1.0
+
+    # Place fields: halved when the finding shares no token with the known places
+    assert estimate("death_place", [{"value": "Ada Lovelace", "citation": "Paris, France"}], person) == 0.5
+    assert estimate("death_place", [{"value": "Ada Lovelace", "citation": "Marylebone, London"}], person) == 1.0
+
+    # A full name match must survive a penalty; otherwise the threshold would suppress every finding it halves
+    assert estimate("death_date", [{"value": "Ada Lovelace died 1852"}], person) >= CHEAP_CONFIDENCE_THRESHOLD
+
+    # Without a name to compare against, the LLM decides
+    assert estimate("death_date", [{"value": "anything"}], SimpleNamespace(first_name=None, last_name=None, birth_date=None,
+                                                                        birth_place=None, death_date=None, death_place=None)) == 1.0
+
+def test_synthesis_skips_findings_with_invalid_confidence_scores():
+    """Null, string or out-of-range scores from the LLM drop only that field's finding; valid ones are still queued."""
+    import asyncio
+    from types import SimpleNamespace
+    from unittest.mock import patch, AsyncMock
+    from app.plugins import genealogy_research_plugin as research_module
+
+    plugin = research_module.GenealogyResearchPlugin(db=None, task=SimpleNamespace(id=3))
+    person = SimpleNamespace(id=5, first_name="Ada", last_name="Lovelace", birth_date=None, birth_place=None,
+                             death_date=None, death_place=None)
+    fields = ["birth_date", "birth_place", "death_date", "death_place"]
+    raw_findings_by_field = {field: [{"source_name": "Find a Grave", "value": "Ada Lovelace"}] for field in fields}
+    llm_response = {"findings": [
+        {"field": "birth_date", "suggested_value": "10 DEC 1815", "confidence_score": None},
+        {"field": "birth_place", "suggested_value": "London", "confidence_score": "85"},
+        {"field": "death_date", "suggested_value": "27 NOV 1852", "confidence_score": 150},
+        {"field": "death_place", "suggested_value": "Marylebone", "confidence_score": 84.6},
+    ]}
+
+    with patch.object(research_module.ollama_service, "generate_json", AsyncMock(return_value=llm_response)):
+        queued = asyncio.run(plugin._synthesize_findings_with_llm(person, "", fields, raw_findings_by_field))
+
+    assert queued == 1
+    assert [(finding["data_field"], finding["confidence_score"]) for finding in plugin._pending_findings] == [("death_place", 85)]
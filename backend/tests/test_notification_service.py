@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from app.core.config import NotificationSettingsModel
+from app.db import models
+from app.services.notification_service import NotificationService, _STATUS_NOTIFICATIONS
+
+HOSTILE_TEXT = "<script>alert('x')</script> {x} {task_id} }{"
+
+
+def test_every_status_notification_escapes_and_keeps_hostile_field_values_literal():
+    """Free-text task fields are HTML-escaped, and braces in them are never treated as placeholders."""
+    service = NotificationService()
+    service.is_configured = True
+    service.config = NotificationSettingsModel(enabled=True, recipient_email="admin@example.com")
+
+    for status_value in _STATUS_NOTIFICATIONS:
+        task = SimpleNamespace(
+            id=7, plugin_id=HOSTILE_TEXT, prompt=HOSTILE_TEXT, error_message=HOSTILE_TEXT,
+            commit_hash=HOSTILE_TEXT, test_status=models.TestStatus.PASS, status=models.TaskStatus(status_value),
+        )
+        with patch.object(service, "_send_email") as send_email:
+            service.notify_task_status_change(task, base_app_url="http://frankie.test")
+
+        send_email.assert_called_once()
+        subject, body = send_email.call_args.args
+        assert subject.startswith("Task #7 ")
+        assert "<script>" not in body
+        assert "&lt;script&gt;alert(&#x27;x&#x27;)&lt;/script&gt; {x} {task_id} }{" in body
+        assert "#7" in body and "{common_style}" not in body and "{p_style}" not in body
+
+
+def test_disabled_event_sends_nothing():
+    service = NotificationService()
+    service.is_configured = True
+    service.config = NotificationSettingsModel(enabled=True, recipient_email="admin@example.com", notify_on={"error": False})
+    task = SimpleNamespace(id=1, plugin_id="odyssey_agent", prompt="p", error_message="boom", commit_hash=None,
+                           test_status=None, status=models.TaskStatus.ERROR)
+
+    with patch.object(service, "_send_email") as send_email:
+        service.notify_task_status_change(task)
+
+    send_email.assert_not_called()
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from app.main import app
+from app.core.config import settings
+from app.core.dependencies import get_db
+from app.db.database import Base
+from app.db import models, schemas, crud
+from app.plugins import odyssey_plugin
+from app.plugins.odyssey_plugin import (
+    OdysseyPlugin, ODYSSEY_PHASE_AWAITING_PLAN_REVIEW, ODYSSEY_PHASE_AWAITING_MILESTONE_REVIEW, ODYSSEY_PHASE_FINALIZING,
+    ODYSSEY_PHASE_COMPLETED,
+)
+from app.services.orchestration_service import AgentOrchestrator
+
+PLAN_JSON = json.dumps({
+    "project_title": "Scraper",
+    "overall_summary": "Build a scraper.",
+    "clarifying_questions": [],
+    "milestones": [
+        {"milestone_id": "M1", "name": "Fetch", "description": "Fetch pages", "estimated_sub_steps": ["GET"], "potential_tools": ["WebScraper"]},
+    ],
+})
+
+# Test DB for the Odyssey approval flow
+SQLALCHEMY_DATABASE_URL_ODYSSEY = "sqlite:///./test_odyssey_db.db" # Unique name
+engine_odyssey = create_engine(
+    SQLALCHEMY_DATABASE_URL_ODYSSEY, connect_args={"check_same_thread": False}
+)
+TestingSessionLocalOdyssey = sessionmaker(autocommit=False, autoflush=False, bind=engine_odyssey)
+
+def override_get_db_for_odyssey_tests():
+    try:
+        db = TestingSessionLocalOdyssey()
+        yield db
+    finally:
+        db.close()
+
+@pytest.fixture(scope="function")
+def test_db_odyssey_session():
+    Base.metadata.create_all(bind=engine_odyssey)
+    original_get_db = app.dependency_overrides.get(get_db)
+    app.dependency_overrides[get_db] = override_get_db_for_odyssey_tests
+    db = TestingSessionLocalOdyssey()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine_odyssey)
+        if original_get_db:
+            app.dependency_overrides[get_db] = original_get_db
+        else:
+            app.dependency_overrides.pop(get_db, None)
+
+client = TestClient(app)
+
+
+def _planning_task(task_id: int, prompt: str) -> SimpleNamespace:
+    """A task in its first (PLANNING) phase; no prompt_hash, so no earlier approved plan is looked up."""
+    return SimpleNamespace(id=task_id, prompt=prompt, prompt_hash=None, task_context_data=None, task_plan_data=None, status=None)
+
+
+def _run_concurrent_plannings(fake_stream, prompts):
+    """Runs _phase_planning for one task per prompt concurrently, with the plan cache and templates out of the way."""
+    async def run_all():
+        plugins = [OdysseyPlugin(db=None, task=_planning_task(i + 1, prompt)) for i, prompt in enumerate(prompts)]
+        results = await asyncio.gather(*(plugin._phase_planning() for plugin in plugins))
+        await asyncio.sleep(0) # Let the in-flight entry's done-callback run
+        return plugins, results, dict(odyssey_plugin._plans_in_flight)
+
+    with patch.object(odyssey_plugin.ollama_service, "generate_json_stream", side_effect=fake_stream), \
+         patch.object(odyssey_plugin._plan_cache, "lookup", MagicMock(return_value=None)), \
+         patch.object(odyssey_plugin._plan_cache, "store", MagicMock()) as cache_store, \
+         patch.object(odyssey_plugin, "_match_plan_template", return_value=None):
+        plugins, results, left_in_flight = asyncio.run(run_all())
+    return plugins, results, left_in_flight, cache_store
+
+
+def test_concurrent_plannings_of_the_same_goal_share_one_llm_call():
+    """Tasks planning the same (normalized) goal at once await one generation and each get their own plan copy."""
+    stream_calls = []
+    async def fake_stream(prompt, *args, **kwargs):
+        stream_calls.append(prompt)
+        await asyncio.sleep(0.05) # Still streaming when the other task reaches planning
+        for i in range(0, len(PLAN_JSON), 32):
+            yield PLAN_JSON[i:i + 32]
+
+    plugins, results, left_in_flight, cache_store = _run_concurrent_plannings(fake_stream, ["Build a scraper", "  build A   scraper "])
+
+    assert len(stream_calls) == 1
+    assert cache_store.call_count == 1 # Only the task that generated the plan stores it
+    assert [result["status"] for result in results] == [models.TaskStatus.AWAITING_REVIEW] * 2
+    assert all(plugin.task_specific_data["current_phase"] == ODYSSEY_PHASE_AWAITING_PLAN_REVIEW for plugin in plugins)
+    assert results[0]["task_plan_data"] == results[1]["task_plan_data"]
+    assert plugins[0].plan is not plugins[1].plan
+    assert plugins[0].plan.milestones[0] is not plugins[1].plan.milestones[0]
+    assert left_in_flight == {}
+
+
+def test_failed_shared_planning_errors_every_waiting_task_and_clears_the_entry():
+    """A failure in the generation is reported to every task awaiting it, and the goal can be planned again afterwards."""
+    stream_calls = []
+    async def failing_stream(prompt, *args, **kwargs):
+        stream_calls.append(prompt)
+        await asyncio.sleep(0.05)
+        raise ValueError("Ollama server returned an error: 500.")
+        yield # Makes this an async generator
+
+    _, results, left_in_flight, cache_store = _run_concurrent_plannings(failing_stream, ["Build a scraper", "Build a scraper"])
+
+    assert len(stream_calls) == 1
+    assert [result["status"] for result in results] == [models.TaskStatus.ERROR] * 2
+    assert all("500" in result["error_message"] for result in results)
+    cache_store.assert_not_called()
+    assert left_in_flight == {}
+
+
+def test_approving_the_final_milestone_applies_the_task_and_makes_its_plan_reusable(test_db_odyssey_session):
+    """The last milestone approval finishes the task without re-running the plugin, so a later task can reuse its plan."""
+    db = test_db_odyssey_session
+    user_email, user_password = "odyssey_admin@example.com", "supersecure123"
+    admin = crud.create_user(db, user=schemas.UserCreate(email=user_email, password=user_password, full_name="Odyssey Admin", role="admin"))
+    response = client.post(f"{settings.API_V1_STR}/auth/token", data={"username": user_email, "password": user_password})
+    assert response.status_code == 200, f"Login failed: {response.text}"
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    task_in = schemas.AgentTaskCreate(prompt="Build a scraper", plugin_id="odyssey_agent")
+    finished_task = crud.create_agent_task(db, task_in=task_in, owner_id=admin.id)
+    plan = json.loads(PLAN_JSON)
+    crud.update_agent_task(db, db_task=finished_task, task_update_data={
+        "status": models.TaskStatus.AWAITING_REVIEW,
+        "task_plan_data": plan,
+        "task_context_data": {"current_phase": ODYSSEY_PHASE_AWAITING_MILESTONE_REVIEW, "current_milestone_index": 0},
+    })
+
+    with patch.object(AgentOrchestrator, "execute_task", AsyncMock()) as execute_task:
+        response = client.post(f"{settings.API_V1_STR}/admin/agent/tasks/{finished_task.id}/approve", headers=headers)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == models.TaskStatus.APPLIED.value
+    execute_task.assert_not_awaited()
+    db.refresh(finished_task)
+    assert finished_task.status == models.TaskStatus.APPLIED
+    assert finished_task.task_context_data["current_phase"] == ODYSSEY_PHASE_FINALIZING
+
+    new_task = crud.create_agent_task(db, task_in=task_in, owner_id=admin.id)
+    assert crud.get_latest_applied_task_plan(
+        db, plugin_id="odyssey_agent", prompt_hash=new_task.prompt_hash, exclude_task_id=new_task.id,
+    ) == plan
+
+
+def test_finished_phases_have_nothing_to_execute():
+    """A run that still reaches a finished task leaves it untouched instead of flagging an unhandled phase."""
+    for phase in (ODYSSEY_PHASE_FINALIZING, ODYSSEY_PHASE_COMPLETED):
+        task = SimpleNamespace(id=1, prompt="Build a scraper", prompt_hash=None, task_context_data={"current_phase": phase},
+                               task_plan_data=json.loads(PLAN_JSON), status=models.TaskStatus.APPLIED)
+        assert asyncio.run(OdysseyPlugin(db=None, task=task).execute()) == {}
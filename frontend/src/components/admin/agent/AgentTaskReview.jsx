@@ -101,12 +101,10 @@ const AgentTaskReview = () => {
 
     let approveButtonText = "Approve & Apply";
     if (task.plugin_id === 'odyssey_agent' && task.task_context_data) {
-        try {
-            const context = JSON.parse(task.task_context_data);
-            if (context.current_phase === 'AWAITING_PLAN_REVIEW') approveButtonText = "Approve Plan & Proceed";
-            else if (context.current_phase === 'AWAITING_MILESTONE_REVIEW') approveButtonText = "Approve Milestone & Continue";
-            else if (context.current_phase === 'AWAITING_FINAL_REVIEW') approveButtonText = "Complete Task";
-        } catch (e) { console.error("Error parsing task context for button text", e); }
+        const context = task.task_context_data; // Already a JSON object from the API
+        if (context.current_phase === 'AWAITING_PLAN_REVIEW') approveButtonText = "Approve Plan & Proceed";
+        else if (context.current_phase === 'AWAITING_MILESTONE_REVIEW') approveButtonText = "Approve Milestone & Continue";
+        else if (context.current_phase === 'AWAITING_FINAL_REVIEW') approveButtonText = "Complete Task";
     }
 
     return (